@@ -1,4 +1,5 @@
-from myapp.models import Charge
+from myapp.models import Appartement, Charge
+from myapp.services.ledger_service import total_balance
 from django.utils import timezone
 
 def explain_charges(user_id):
@@ -32,9 +33,7 @@ def unpaid_charges_summary(user_id):
     if not charges.exists():
         return "You have no unpaid charges. You're all caught up! ✅"
 
-    total = sum(c.amount for c in charges)
-    paid_total = sum(c.paid_amount for c in charges)
-    remaining = total - paid_total
+    remaining = total_balance(Appartement.objects.filter(resident_id=user_id))
     
     # Count overdue
     overdue_count = charges.filter(status='OVERDUE').count()
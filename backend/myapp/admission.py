@@ -0,0 +1,233 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .throttling import throttle_cache
+
+
+# ==========================
+# Admission control
+# ==========================
+#
+# Views tagged @expensive (statistics, exports, bulk writes) run under two
+# concurrency budgets shared by every worker: ADMISSION_TENANT_CONCURRENCY
+# slots per syndic and ADMISSION_TOTAL_CONCURRENCY slots for everyone, so one
+# syndic can never hold every worker. Slots are counters in the shared cache
+# (INCR on admit, DECR on release) with a TTL of ADMISSION_SLOT_TTL seconds,
+# so slots leaked by a killed worker come back on their own. A request over
+# budget waits up to ADMISSION_QUEUE_TIMEOUT seconds for a slot, then is shed:
+# 429 when its own syndic is over budget, 503 when the site is out of slots.
+# Sheds are counted per syndic in the shared cache (see `admission_report`).
+
+SHED_KEY = 'admission:shed:{tenant}:{status}'
+SHED_STATUSES = (429, 503)
+SLOT_KEY = 'admission:slots:{tenant}'
+TOTAL_SLOT_KEY = 'admission:slots'
+
+
+def expensive(view):
+    """Mark a view function or viewset action for admission control"""
+    view.expensive = True
+    return view
+
+
+def is_expensive(request, view_func):
+    if getattr(view_func, 'expensive', False):
+        return True
+    # Viewset routes resolve to as_view(); the action decides
+    actions, cls = getattr(view_func, 'actions', None), getattr(view_func, 'cls', None)
+    if actions and cls:
+        action = actions.get(request.method.lower())
+        return getattr(getattr(cls, action, None), 'expensive', False)
+    return False
+
+
+_jwt = JWTAuthentication()
+
+
+def tenant_id(request):
+    """User id from the bearer token, without loading the user; None when there is no valid token"""
+    header = _jwt.get_header(request)
+    raw_token = _jwt.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        return _jwt.get_validated_token(raw_token)[jwt_settings.USER_ID_CLAIM]
+    except (InvalidToken, TokenError, KeyError):
+        return None
+
+
+def record_shed(tenant, status):
+    cache = throttle_cache()
+    key = SHED_KEY.format(tenant=tenant, status=status)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def shed_counts(tenants):
+    """{tenant: {429: n, 503: n}} for the given tenant ids, across all workers"""
+    keys = {
+        SHED_KEY.format(tenant=tenant, status=status): (tenant, status)
+        for tenant in tenants for status in SHED_STATUSES
+    }
+    counts = {tenant: dict.fromkeys(SHED_STATUSES, 0) for tenant in tenants}
+    for key, value in throttle_cache().get_many(list(keys)).items():
+        tenant, status = keys[key]
+        counts[tenant][status] = value
+    return counts
+
+
+def reset_shed_counts(tenants):
+    throttle_cache().delete_many([
+        SHED_KEY.format(tenant=tenant, status=status) for tenant in tenants for status in SHED_STATUSES
+    ])
+
+
+class AdmissionController:
+    """
+    Per-tenant and total concurrency budgets with a bounded, deadline-limited
+    wait. Slot counts live in the shared cache; the number of waiters is
+    per process, as it bounds this process's blocked threads.
+    """
+
+    # Releases in other workers do not wake our waiters, so they re-check
+    poll_interval = 0.1
+
+    def __init__(self, tenant_limit, total_limit, queue_limit, timeout, slot_ttl=300):
+        self.tenant_limit = tenant_limit
+        self.total_limit = total_limit
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.slot_ttl = slot_ttl
+        self.condition = threading.Condition()
+        self.waiting = Counter()
+
+    @property
+    def total(self):
+        return throttle_cache().get(TOTAL_SLOT_KEY, 0)
+
+    def acquire(self, tenant):
+        """Take a slot; returns None when admitted, else the status to shed with"""
+        deadline = time.monotonic() + self.timeout
+        status = self._try_admit(tenant)
+        if status is None:
+            return None
+
+        with self.condition:
+            if self.waiting[tenant] >= self.queue_limit:
+                return 429
+            self.waiting[tenant] += 1
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return status
+                with self.condition:
+                    self.condition.wait(min(remaining, self.poll_interval))
+                status = self._try_admit(tenant)
+                if status is None:
+                    return None
+        finally:
+            with self.condition:
+                self.waiting[tenant] -= 1
+                if not self.waiting[tenant]:
+                    del self.waiting[tenant]
+
+    def release(self, tenant):
+        cache = throttle_cache()
+        for key in (SLOT_KEY.format(tenant=tenant), TOTAL_SLOT_KEY):
+            self._decr(cache, key)
+        with self.condition:
+            # Waiters of other tenants may be blocked on the total budget
+            self.condition.notify_all()
+
+    def _try_admit(self, tenant):
+        """Count the request in both budgets, backing out when either is over"""
+        cache = throttle_cache()
+        tenant_key = SLOT_KEY.format(tenant=tenant)
+        in_flight = self._incr(cache, tenant_key)
+        total = self._incr(cache, TOTAL_SLOT_KEY)
+        if in_flight <= self.tenant_limit and total <= self.total_limit:
+            return None
+        self._decr(cache, tenant_key)
+        self._decr(cache, TOTAL_SLOT_KEY)
+        return 429 if in_flight > self.tenant_limit else 503
+
+    def _incr(self, cache, key):
+        cache.add(key, 0, self.slot_ttl)
+        try:
+            value = cache.incr(key)
+        except ValueError:  # expired between add() and incr()
+            cache.add(key, 0, self.slot_ttl)
+            value = cache.incr(key)
+        # Busy counters stay alive; a leaked slot expires once traffic stops
+        cache.touch(key, self.slot_ttl)
+        return value
+
+    def _decr(self, cache, key):
+        try:
+            if cache.decr(key) < 0:
+                # The counter expired under running requests: start over
+                cache.delete(key)
+        except ValueError:
+            pass
+
+
+class AdmissionControlMiddleware:
+    """
+    Applies AdmissionController to @expensive views. Requests without a valid
+    bearer token are left to the view's own authentication.
+    """
+
+    MESSAGES = {
+        429: 'Too many expensive requests in progress for your account, please retry shortly',
+        503: 'Server is busy, please retry shortly',
+    }
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.controller = AdmissionController(
+            tenant_limit=getattr(settings, 'ADMISSION_TENANT_CONCURRENCY', 2),
+            total_limit=getattr(settings, 'ADMISSION_TOTAL_CONCURRENCY', 8),
+            queue_limit=getattr(settings, 'ADMISSION_MAX_QUEUE', 4),
+            timeout=getattr(settings, 'ADMISSION_QUEUE_TIMEOUT', 2.0),
+            slot_ttl=getattr(settings, 'ADMISSION_SLOT_TTL', 300),
+        )
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        tenant = getattr(request, '_admission_tenant', None)
+        if tenant is not None:
+            release = lambda: self.controller.release(tenant)
+            if response.streaming:
+                # Hold the slot until the body has been sent
+                response._resource_closers.append(release)
+            else:
+                release()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not is_expensive(request, view_func):
+            return None
+        tenant = tenant_id(request)
+        if tenant is None:
+            return None
+
+        status = self.controller.acquire(tenant)
+        if status is None:
+            request._admission_tenant = tenant
+            return None
+
+        record_shed(tenant, status)
+        response = JsonResponse({'success': False, 'message': self.MESSAGES[status]}, status=status)
+        response['Retry-After'] = str(max(1, round(self.controller.timeout)))
+        return response
@@ -0,0 +1,28 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .models import User
+
+
+class EmailBackend(ModelBackend):
+    """
+    ModelBackend that loads the user together with the syndic subscription
+    the login response and token claims need, so a login reads the user once.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.select_related(
+                'syndic_profile__subscription__plan'
+            ).get(**{User.USERNAME_FIELD: username})
+        except User.DoesNotExist:
+            # Run the password hasher once to keep the timing of unknown and
+            # known emails alike (as ModelBackend does)
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,18 @@
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+from .sharding import sharding_enabled
+from .throttling import throttle_cache
+
+
+@register(Tags.caches, Tags.database)
+def check_shard_cache(app_configs, **kwargs):
+    """The shard map is cached; with a per-process cache, a move is only seen by the worker that made it"""
+    if not sharding_enabled() or not isinstance(throttle_cache(), (LocMemCache, DummyCache)):
+        return []
+    return [Error(
+        'DATABASE_SHARDS is set but the shared cache is per process.',
+        hint='Set REDIS_URL so every worker sees the same shard map.',
+        id='myapp.E001',
+    )]
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from myapp.admission import reset_shed_counts, shed_counts
+from myapp.models import User
+
+
+class Command(BaseCommand):
+    help = "Requests shed by admission control, per syndic (counted across all workers in the shared cache)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also list syndics with nothing shed')
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after reporting')
+
+    def handle(self, *args, **options):
+        syndics = dict(User.objects.filter(role='SYNDIC').values_list('id', 'email'))
+        counts = shed_counts(list(syndics))
+        rows = sorted(
+            ((sum(shed.values()), tenant, shed) for tenant, shed in counts.items()),
+            key=lambda row: (-row[0], row[1])
+        )
+
+        self.stdout.write(f"{'syndic':<40} {'429':>8} {'503':>8} {'total':>8}")
+        for total, tenant, shed in rows:
+            if total or options['all']:
+                self.stdout.write(f"{syndics[tenant]:<40} {shed[429]:>8} {shed[503]:>8} {total:>8}")
+        if options['reset']:
+            reset_shed_counts(list(syndics))
+            self.stdout.write(self.style.SUCCESS("Counters reset"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from myapp.services.archive_service import ARCHIVE_AFTER_MONTHS, ARCHIVE_BATCH_SIZE, archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move charges paid, and reclamations closed, more than --months ago into "
+        "the archive tables, in small batches. Safe to interrupt and rerun "
+        "(e.g. nightly cron)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=ARCHIVE_AFTER_MONTHS)
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        results = archive(months=options['months'], batch_size=options['batch_size'])
+        for alias, moved in results.items():
+            summary = ', '.join(f"{count} {name}" for name, count in moved.items())
+            self.stdout.write(self.style.SUCCESS(f"{alias}: archived {summary}"))
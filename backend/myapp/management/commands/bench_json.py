@@ -0,0 +1,65 @@
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from myapp.models import Appartement, Charge, Immeuble, User
+from myapp.renderers import ORJSONRenderer
+from myapp.serializers import ChargeSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare render time and allocations of DRF's JSONRenderer and the "
+        "orjson renderer on a ChargeSerializer list payload (no database needed)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        data = self._payload(options['rows'])
+        self.stdout.write(f"{options['rows']} charges, best of {options['repeat']} renders")
+
+        for label, renderer in (('JSONRenderer', JSONRenderer()), ('ORJSONRenderer', ORJSONRenderer())):
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                body = renderer.render(data)
+                timings.append(time.perf_counter() - start)
+
+            tracemalloc.start()
+            renderer.render(data)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.stdout.write(
+                f"{label:<16} {min(timings) * 1000:8.1f} ms  peak alloc {peak / 1024 / 1024:6.1f} MiB  "
+                f"body {len(body) / 1024 / 1024:5.1f} MiB"
+            )
+
+    def _payload(self, rows):
+        """Serialized list page for `rows` unsaved charges, like a list action builds it"""
+        syndic = User(id=1, email='syndic@example.com', role='SYNDIC')
+        immeuble = Immeuble(id=1, syndic=syndic, name='Residence Atlas', address='1 Rue A')
+        now = timezone.now()
+        charges = []
+        for i in range(rows):
+            resident = User(id=i + 2, email=f'resident{i}@example.com', first_name='Resident', last_name=str(i))
+            appartement = Appartement(
+                id=i + 1, immeuble=immeuble, resident=resident, number=f'A{i}', floor=i % 10,
+                monthly_charge=Decimal('450.00')
+            )
+            charges.append(Charge(
+                id=i + 1, appartement=appartement, description=f'Charges {i}', amount=Decimal('450.00'),
+                due_date=date(2026, 1, 31) + timedelta(days=i % 90), status='UNPAID',
+                paid_amount=Decimal('0'), created_at=now,
+            ))
+        serializer = ChargeSerializer(charges, many=True)
+        return ReturnDict({'count': rows, 'results': serializer.data}, serializer=serializer)
@@ -0,0 +1,90 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from myapp.models import LoginHistory, Subscription, SubscriptionPlan, SyndicProfile, User
+from myapp.services import login_service
+from myapp.views.authentication import CustomTokenObtainPairView
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure login throughput and queries per login through the real "
+        "endpoint, with login history written in the request and buffered "
+        "(fixture rows are created in a transaction that is rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument(
+            '--fast-hasher', action='store_true',
+            help='Hash with MD5 so the numbers show the request overhead rather than Argon2'
+        )
+
+    def handle(self, *args, **options):
+        overrides = {'ALLOWED_HOSTS': ['testserver']}
+        if options['fast_hasher']:
+            overrides['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        # The login throttle would stop the run after 5 attempts
+        with mock.patch.object(CustomTokenObtainPairView, 'throttle_classes', []), override_settings(**overrides):
+            try:
+                with transaction.atomic():
+                    self._run(self._fixture(), options['logins'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def _run(self, email, logins):
+        client = Client()
+        body = {'email': email, 'password': 'bench-password'}
+
+        with override_settings(LOGIN_HISTORY_FLUSH_INTERVAL=0):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.post('/api/auth/login/', body, content_type='application/json')
+        assert response.status_code == 200, response.content
+        self.stdout.write(f"{len(queries)} queries per login:")
+        for query in queries:
+            self.stdout.write(f"  {query['sql'][:100]}")
+
+        self.stdout.write(f"{logins} logins")
+        # Buffered: the writer thread is never woken inside the run, the
+        # buffer is flushed (in this thread) after the timing
+        modes = (('history in request', 0), ('history buffered', 3600))
+        for label, interval in modes:
+            with override_settings(LOGIN_HISTORY_FLUSH_INTERVAL=interval, LOGIN_HISTORY_BATCH_SIZE=logins + 1):
+                start = time.perf_counter()
+                for _ in range(logins):
+                    client.post('/api/auth/login/', body, content_type='application/json')
+                elapsed = time.perf_counter() - start
+            flush_start = time.perf_counter()
+            login_service.flush()
+            flushed = (time.perf_counter() - flush_start) * 1000
+            self.stdout.write(
+                f"{label:<20} {logins / elapsed:8.1f} logins/s  {elapsed / logins * 1000:6.2f} ms/login"
+                + (f"  (batch flush {flushed:.1f} ms)" if interval else "")
+            )
+        self.stdout.write(f"{LoginHistory.objects.filter(email=email).count()} history rows written")
+
+    def _fixture(self):
+        email = 'bench-login@example.com'
+        user = User.objects.create_user(email=email, password='bench-password', role='SYNDIC')
+        plan = SubscriptionPlan.objects.create(
+            name='Bench', price=Decimal('100.00'), duration_days=365, max_buildings=10, max_apartments=100
+        )
+        today = timezone.now().date()
+        Subscription.objects.create(
+            syndic_profile=SyndicProfile.objects.create(user=user), plan=plan,
+            start_date=today, end_date=today + timedelta(days=365)
+        )
+        return email
@@ -0,0 +1,69 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from myapp.models import Appartement, Charge, Immeuble, User
+from myapp.projections import ChargeProjection
+from myapp.serializers import ChargeSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ChargeSerializer with ChargeProjection on a syndic's charge "
+        "list (fixture rows are created in a transaction that is rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                queryset = self._fixture(options['rows'])
+                self._run(queryset, options['rows'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, queryset, rows, repeat):
+        serializer_qs = queryset.select_related('appartement', 'appartement__immeuble', 'appartement__resident')
+        runs = (
+            ('ChargeSerializer', lambda: ChargeSerializer(serializer_qs, many=True).data),
+            ('ChargeProjection', lambda: ChargeProjection().data(queryset)),
+        )
+        self.stdout.write(f"{rows} charges, best of {repeat}")
+        for label, build in runs:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                build()
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            self.stdout.write(f"{label:<18} {best * 1000:8.1f} ms  {rows / best:10.0f} rows/s")
+
+    def _fixture(self, rows):
+        syndic = User.objects.create_user(email='bench-syndic@example.com', password='x', role='SYNDIC')
+        immeuble = Immeuble.objects.create(syndic=syndic, name='Bench', address='1 Rue A')
+        residents = User.objects.bulk_create([
+            User(email=f'bench-resident{i}@example.com', role='RESIDENT', first_name='Resident', last_name=str(i))
+            for i in range(rows // 10)
+        ])
+        appartements = Appartement.objects.bulk_create([
+            Appartement(immeuble=immeuble, resident=resident, number=f'A{i}', floor=i % 10,
+                        monthly_charge=Decimal('450.00'))
+            for i, resident in enumerate(residents)
+        ])
+        Charge.objects.bulk_create([
+            Charge(appartement=appartements[i % len(appartements)], description=f'Charges {i}',
+                   amount=Decimal('450.00'), due_date=date(2026, 1, 1) + timedelta(days=i % 365))
+            for i in range(rows)
+        ], batch_size=1000)
+        return Charge.objects.filter(appartement__immeuble__syndic=syndic).order_by('-created_at')
@@ -0,0 +1,103 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from myapp.services.token_service import RevokedTokens, purge_expired_tokens
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Revocation check cost (database vs revoked JTI filter) and batched purge "
+        "time over a large token history (rows are inserted in a transaction "
+        "that is rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=10_000_000)
+        parser.add_argument('--expired', type=float, default=0.9, help='Fraction of tokens already expired')
+        parser.add_argument('--checks', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                live = self._fixture(options['tokens'], options['expired'])
+                self._run(live, options['checks'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _timed(self, label, func, count=1):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        per = f"  {elapsed / count * 1e6:9.1f} us/op" if count > 1 else ""
+        self.stdout.write(f"{label:<40} {elapsed:8.2f} s{per}")
+        return result
+
+    def _checks(self, revoked, jtis):
+        return sum(revoked.is_revoked(jti) for jti in jtis)
+
+    def _run(self, live, checks):
+        # Refreshes mostly present the current, non-revoked token
+        sample = random.sample(live, min(checks, len(live)))
+
+        def database_checks():
+            return sum(BlacklistedToken.objects.filter(token__jti=jti).exists() for jti in sample)
+
+        revoked = RevokedTokens()
+        for phase in ('before purge', 'after purge'):
+            self.stdout.write(f"-- {phase}: {OutstandingToken.objects.count()} outstanding, "
+                              f"{BlacklistedToken.objects.count()} blacklisted")
+            self._timed('check via database', database_checks, len(sample))
+            self._timed('filter build', revoked.rebuild)
+            self.stdout.write(f"{'filter size':<40} {len(revoked.filter.bits) / 1024 / 1024:8.1f} MiB  "
+                              f"({revoked.filter.count} JTIs, {revoked.filter.hashes} hashes)")
+            with connection.execute_wrapper(self._count_queries) as _:
+                self.queries = 0
+                self._timed('check via filter', lambda: self._checks(revoked, sample), len(sample))
+            self.stdout.write(f"{'queries for filter checks':<40} {self.queries:8d}  "
+                              f"({self.queries / len(sample):.2%} of checks)")
+            if phase == 'before purge':
+                deleted = self._timed('batched purge', purge_expired_tokens)
+                self.stdout.write(f"{'purged':<40} {deleted:8d} tokens")
+
+    def _count_queries(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def _fixture(self, tokens, expired_fraction):
+        """Token history as rotation leaves it: every token but the newest of each chain blacklisted"""
+        now = timezone.now()
+        outstanding = OutstandingToken._meta.db_table
+        blacklisted = BlacklistedToken._meta.db_table
+        expired = int(tokens * expired_fraction)
+        live = []
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            base = (OutstandingToken.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+            for offset in range(0, tokens, 100_000):
+                rows, revoked = [], []
+                for i in range(offset, min(offset + 100_000, tokens)):
+                    jti = f'{base + i:032x}'
+                    expires_at = now - timedelta(days=1) if i < expired else now + timedelta(days=7)
+                    rows.append((base + i, jti, '', now - timedelta(days=8), expires_at))
+                    if i % 10:
+                        revoked.append((base + i, now))
+                    elif i >= expired:
+                        live.append(jti)
+                cursor.executemany(
+                    f'INSERT INTO {outstanding} (id, jti, token, created_at, expires_at) VALUES (%s, %s, %s, %s, %s)',
+                    rows
+                )
+                cursor.executemany(f'INSERT INTO {blacklisted} (token_id, blacklisted_at) VALUES (%s, %s)', revoked)
+        self.stdout.write(f"{'fixture':<40} {time.perf_counter() - start:8.2f} s  ({tokens} tokens)")
+        return live
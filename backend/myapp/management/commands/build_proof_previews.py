@@ -0,0 +1,40 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from myapp.models import Payment, ResidentPayment
+from myapp.services.preview_service import Image, generate_previews
+
+
+logger = logging.getLogger(__name__)
+
+
+def _previews(proof):
+    # One oversized image must not abort the whole pool.map
+    try:
+        return generate_previews(proof)
+    except Image.DecompressionBombError as e:
+        logger.warning("Skipping preview of %s: %s", proof.name, e)
+        return []
+
+
+class Command(BaseCommand):
+    help = "Build missing thumbnails/review copies for existing payment proofs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        proofs = {}
+        for model in (Payment, ResidentPayment):
+            rows = model.objects.exclude(payment_proof='').exclude(payment_proof__isnull=True).only('id', 'payment_proof')
+            for row in rows.iterator(chunk_size=options['chunk_size']):
+                # Duplicate uploads share one file, so build its previews once
+                proofs.setdefault(row.payment_proof.name, row.payment_proof)
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            built = sum(1 for written in pool.map(_previews, proofs.values()) if written)
+
+        self.stdout.write(self.style.SUCCESS(f"{len(proofs)} proofs checked, {built} previewed"))
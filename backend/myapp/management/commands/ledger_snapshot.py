@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from myapp.models import Appartement
+from myapp.services.ledger_service import take_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot apartment ledger balances so balance reads only replay the "
+        "entries posted since. Meant to run periodically (e.g. hourly cron)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Snapshots inserted per batch')
+        parser.add_argument('--syndic', type=int, help='Only snapshot apartments of this syndic id')
+
+    def handle(self, *args, **options):
+        apartments = Appartement.objects.all()
+        if options['syndic']:
+            apartments = apartments.filter(immeuble__syndic_id=options['syndic'])
+
+        written = take_snapshots(apartments, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{written} balance snapshots written"))
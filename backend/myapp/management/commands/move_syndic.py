@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from myapp.services.shard_service import MOVE_BATCH_SIZE, MOVE_GRACE_SECONDS, move_syndic
+from myapp.sharding import SHARD_CACHE_SECONDS
+
+
+class Command(BaseCommand):
+    help = (
+        "Move a syndic's buildings, apartments, charges, payments, reclamations "
+        "and reunions (with their ledger) to another database shard. The "
+        "syndic is read-only while the rows are copied"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('syndic_id', type=int)
+        parser.add_argument('target', help='Alias from DATABASE_SHARDS')
+        parser.add_argument('--batch-size', type=int, default=MOVE_BATCH_SIZE)
+        parser.add_argument(
+            '--grace', type=float, default=MOVE_GRACE_SECONDS,
+            help='Seconds to wait for in-flight writes once the syndic is read-only'
+        )
+        parser.add_argument(
+            '--source-delay', type=float, default=SHARD_CACHE_SECONDS,
+            help='Seconds to keep the source rows for readers with a cached shard map'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            moved = move_syndic(
+                options['syndic_id'], options['target'],
+                batch_size=options['batch_size'], grace=options['grace'],
+                source_delay=options['source_delay']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        except IntegrityError as e:
+            raise CommandError(f"Copy rolled back, {options['target']} already has some of these ids ({e})")
+        for model, rows in moved.items():
+            self.stdout.write(f"  {model:<26} {rows:>8}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Syndic {options['syndic_id']} moved to {options['target']} in {time.perf_counter() - start:.1f}s"
+        ))
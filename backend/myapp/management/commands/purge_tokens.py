@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from myapp.services.token_service import PURGE_BATCH_SIZE, purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired refresh tokens from the outstanding and blacklist tables, "
+        "in small batches. Meant to run periodically (e.g. hourly cron)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        count = purge_expired_tokens(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{count} expired tokens purged"))
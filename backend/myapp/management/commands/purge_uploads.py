@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from myapp.services.upload_service import purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete resumable upload sessions left unfinished (and their temp files)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Idle time after which a session is dropped')
+
+    def handle(self, *args, **options):
+        count = purge_stale_uploads(timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f"{count} stale upload sessions purged"))
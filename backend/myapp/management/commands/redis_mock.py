@@ -0,0 +1,23 @@
+import threading
+
+from django.core.management.base import BaseCommand
+
+from myapp.mock_redis import start_mock_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local Redis-compatible server (string/counter commands only). "
+        "Start every worker with REDIS_URL=redis://127.0.0.1:<port>/0 to share throttle counters"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=6390)
+
+    def handle(self, *args, **options):
+        server, url = start_mock_server(port=options['port'])
+        self.stdout.write(self.style.SUCCESS(f"Mock Redis listening on {url} (Ctrl+C to stop)"))
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
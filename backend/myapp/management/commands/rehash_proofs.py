@@ -0,0 +1,51 @@
+import re
+
+from django.core.management.base import BaseCommand
+
+from myapp.models import Payment, ResidentPayment
+
+
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Move payment proofs saved before content-addressed storage into the "
+        "sharded layout (identical files collapse into one). Old files are kept "
+        "unless --delete-old is given"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--delete-old', action='store_true')
+
+    def handle(self, *args, **options):
+        for model in (Payment, ResidentPayment):
+            moved = missing = 0
+            batch = []
+            rows = model.objects.exclude(payment_proof='').exclude(payment_proof__isnull=True).only('id', 'payment_proof')
+            for row in rows.iterator(chunk_size=options['chunk_size']):
+                old_name = row.payment_proof.name
+                if HASHED_NAME.search(old_name):
+                    continue
+                storage = row.payment_proof.storage
+                if not storage.exists(old_name):
+                    missing += 1
+                    continue
+                with storage.open(old_name) as f:
+                    row.payment_proof.name = storage.save(old_name, f)
+                batch.append((row, old_name))
+                if len(batch) >= options['chunk_size']:
+                    moved += self._flush(model, batch, options['delete_old'])
+                    batch = []
+            if batch:
+                moved += self._flush(model, batch, options['delete_old'])
+            self.stdout.write(f"{model.__name__}: {moved} proofs moved, {missing} missing on disk")
+
+    def _flush(self, model, batch, delete_old):
+        model.objects.bulk_update([row for row, _ in batch], ['payment_proof'])
+        # Old files only go once the rows point at their new names
+        if delete_old:
+            for row, old_name in batch:
+                row.payment_proof.storage.delete(old_name)
+        return len(batch)
@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from myapp.models import Charge, ResidentPayment
+from myapp.services.settlement_service import recalculate_charges, settled_state
+
+
+CENTS = Decimal('0.01')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare Charge.paid_amount/status/paid_date with the sum of CONFIRMED "
+        "resident payments and optionally repair drifted charges"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Write the corrected values back')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched/updated per batch')
+        parser.add_argument('--syndic', type=int, help='Only check charges of this syndic id')
+        parser.add_argument('--max-report', type=int, default=100, help='Discrepancies printed in full')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        charges = Charge.objects.all()
+        payments = ResidentPayment.objects.filter(status='CONFIRMED')
+        if options['syndic']:
+            charges = charges.filter(appartement__immeuble__syndic_id=options['syndic'])
+            payments = payments.filter(charge__appartement__immeuble__syndic_id=options['syndic'])
+
+        # Both streams are ordered by charge id and merge-joined, so memory stays
+        # at one chunk of each no matter how many charges there are.
+        totals = payments.order_by('charge_id').values_list('charge_id').annotate(
+            total=Sum('amount')
+        ).iterator(chunk_size=chunk_size)
+        rows = charges.order_by('pk').values_list(
+            'pk', 'amount', 'paid_amount', 'status', 'paid_date'
+        ).iterator(chunk_size=chunk_size)
+
+        checked = drifted = repaired = 0
+        batch = []
+        next_total = next(totals, None)
+
+        for pk, amount, paid_amount, current_status, paid_date in rows:
+            checked += 1
+            while next_total is not None and next_total[0] < pk:
+                next_total = next(totals, None)
+            confirmed = next_total[1] if next_total is not None and next_total[0] == pk else 0
+            confirmed = Decimal(confirmed).quantize(CENTS)
+
+            expected_status, expected_date = settled_state(amount, confirmed, paid_date)
+            status_ok = current_status == expected_status or (
+                current_status == 'OVERDUE' and expected_status == 'UNPAID'
+            )
+            if paid_amount == confirmed and status_ok and paid_date == expected_date:
+                continue
+
+            drifted += 1
+            if drifted <= options['max_report']:
+                self.stdout.write(
+                    f"Charge {pk}: stored {paid_amount} ({current_status}, paid {paid_date}), "
+                    f"confirmed {confirmed} ({expected_status}, paid {expected_date})"
+                )
+
+            if options['repair']:
+                batch.append(pk)
+                if len(batch) >= chunk_size:
+                    repaired += self._flush(batch)
+                    batch = []
+
+        if batch:
+            repaired += self._flush(batch)
+
+        if drifted > options['max_report']:
+            self.stdout.write(f"... {drifted - options['max_report']} more not shown")
+
+        summary = f"Checked {checked} charges, {drifted} out of sync"
+        if options['repair']:
+            summary += f", {repaired} repaired"
+        self.stdout.write(self.style.SUCCESS(summary) if not drifted or options['repair'] else self.style.WARNING(summary))
+
+    def _flush(self, batch):
+        # The values above may be stale by now (a payment confirmed meanwhile):
+        # recompute from the payments in the UPDATE itself
+        return recalculate_charges(Charge.objects.filter(pk__in=batch))
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0010_remove_appartement_surface_area_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='appartement',
+            name='surface_area',
+        ),
+        migrations.RemoveField(
+            model_name='syndicprofile',
+            name='address',
+        ),
+        migrations.RemoveField(
+            model_name='syndicprofile',
+            name='company_name',
+        ),
+        migrations.RemoveField(
+            model_name='syndicprofile',
+            name='license_number',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='created_by',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='phone',
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='payment_method',
+            field=models.CharField(choices=[('BANK_TRANSFER', 'Bank Transfer')], default='BANK_TRANSFER', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='residentpayment',
+            name='confirmed_at',
+            field=models.DateTimeField(blank=True, help_text='Date syndic confirmed payment', null=True),
+        ),
+        migrations.AlterField(
+            model_name='residentpayment',
+            name='notes',
+            field=models.TextField(blank=True, default='', help_text='Additional notes about payment'),
+        ),
+        migrations.AlterField(
+            model_name='residentpayment',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, help_text='Date the resident claims payment was made', null=True),
+        ),
+        migrations.AlterField(
+            model_name='residentpayment',
+            name='payment_method',
+            field=models.CharField(choices=[('BANK_TRANSFER', 'Bank Transfer')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_ledger(apps, schema_editor):
+    """Post existing charges and confirmed payments as opening ledger entries"""
+    Charge = apps.get_model('myapp', 'Charge')
+    ResidentPayment = apps.get_model('myapp', 'ResidentPayment')
+    LedgerEntry = apps.get_model('myapp', 'LedgerEntry')
+
+    batch = []
+    charges = Charge.objects.order_by('pk').values_list('pk', 'appartement_id', 'amount', 'description')
+    for pk, appartement_id, amount, description in charges.iterator(chunk_size=2000):
+        batch.append(LedgerEntry(
+            appartement_id=appartement_id, entry_type='CHARGE_POSTED',
+            debit_account='RECEIVABLE', credit_account='INCOME',
+            amount=amount, charge_id=pk, description=(description or '')[:300],
+        ))
+        if len(batch) >= 2000:
+            LedgerEntry.objects.bulk_create(batch)
+            batch = []
+
+    payments = ResidentPayment.objects.filter(status='CONFIRMED').order_by('pk').values_list(
+        'pk', 'appartement_id', 'charge_id', 'amount'
+    )
+    for pk, appartement_id, charge_id, amount in payments.iterator(chunk_size=2000):
+        batch.append(LedgerEntry(
+            appartement_id=appartement_id, entry_type='PAYMENT_CONFIRMED',
+            debit_account='BANK', credit_account='RECEIVABLE',
+            amount=amount, charge_id=charge_id, payment_id=pk,
+        ))
+        if len(batch) >= 2000:
+            LedgerEntry.objects.bulk_create(batch)
+            batch = []
+
+    if batch:
+        LedgerEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0011_sync_model_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_entry_id', models.BigIntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('appartement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='myapp.appartement')),
+            ],
+            options={
+                'verbose_name': 'Balance Snapshot',
+                'verbose_name_plural': 'Balance Snapshots',
+                'ordering': ['-last_entry_id'],
+                'indexes': [models.Index(fields=['appartement', '-last_entry_id'], name='snapshot_apartment_entry_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('CHARGE_POSTED', 'Charge Posted'), ('CHARGE_ADJUSTED', 'Charge Adjusted'), ('PAYMENT_CONFIRMED', 'Payment Confirmed'), ('PAYMENT_REVERSED', 'Payment Reversed')], max_length=20)),
+                ('debit_account', models.CharField(choices=[('RECEIVABLE', 'Resident Receivable'), ('INCOME', 'Charges Income'), ('BANK', 'Bank')], max_length=20)),
+                ('credit_account', models.CharField(choices=[('RECEIVABLE', 'Resident Receivable'), ('INCOME', 'Charges Income'), ('BANK', 'Bank')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('description', models.CharField(blank=True, max_length=300)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('appartement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='myapp.appartement')),
+                ('charge', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='myapp.charge')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='myapp.residentpayment')),
+            ],
+            options={
+                'verbose_name': 'Ledger Entry',
+                'verbose_name_plural': 'Ledger Entries',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['appartement', 'id'], name='ledger_apartment_id_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
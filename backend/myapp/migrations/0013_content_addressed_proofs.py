@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:11
+
+import myapp.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0012_ledger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='payment_proof',
+            field=models.FileField(blank=True, help_text='Upload payment proof (receipt, screenshot, etc.)', max_length=255, null=True, storage=myapp.storage.proof_storage, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='residentpayment',
+            name='payment_proof',
+            field=models.FileField(blank=True, help_text='Upload payment proof (receipt, screenshot, etc.)', max_length=255, null=True, storage=myapp.storage.proof_storage, upload_to='resident_payment_proofs/'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0016_login_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyndicShard',
+            fields=[
+                ('syndic', models.OneToOneField(limit_choices_to={'role': 'SYNDIC'}, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='shard', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('alias', models.CharField(max_length=100)),
+                ('read_only', models.BooleanField(default=False, help_text='Set while the syndic is being moved between shards')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Syndic Shard',
+                'verbose_name_plural': 'Syndic Shards',
+            },
+        ),
+    ]
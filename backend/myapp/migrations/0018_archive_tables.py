@@ -0,0 +1,111 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:13
+
+import django.db.models.deletion
+import myapp.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0017_syndic_shard'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='charge',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='myapp.charge'),
+        ),
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='payment',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='myapp.residentpayment'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedCharge',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('description', models.CharField(max_length=300)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('due_date', models.DateField()),
+                ('status', models.CharField(choices=[('UNPAID', 'Unpaid'), ('PAID', 'Paid'), ('OVERDUE', 'Overdue'), ('PARTIALLY_PAID', 'Partially Paid')], max_length=20)),
+                ('paid_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('paid_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+                ('appartement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_charges', to='myapp.appartement')),
+            ],
+            options={
+                'verbose_name': 'Archived Charge',
+                'verbose_name_plural': 'Archived Charges',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedReclamation',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('content', models.TextField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('IN_PROGRESS', 'In Progress'), ('RESOLVED', 'Resolved'), ('REJECTED', 'Rejected')], max_length=20)),
+                ('priority', models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High'), ('URGENT', 'Urgent')], max_length=10)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('response', models.TextField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField()),
+                ('appartement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reclamations', to='myapp.appartement')),
+                ('resident', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reclamations', to=settings.AUTH_USER_MODEL)),
+                ('syndic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_received_reclamations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived Reclamation',
+                'verbose_name_plural': 'Archived Reclamations',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedReclamationStatusHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('old_status', models.CharField(max_length=20)),
+                ('new_status', models.CharField(max_length=20)),
+                ('comment', models.TextField(blank=True)),
+                ('changed_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+                ('changed_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('reclamation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_history', to='myapp.archivedreclamation')),
+            ],
+            options={
+                'ordering': ['changed_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedResidentPayment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_method', models.CharField(choices=[('BANK_TRANSFER', 'Bank Transfer')], max_length=20)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('CONFIRMED', 'Confirmed'), ('REJECTED', 'Rejected')], max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=100, null=True)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True, default='')),
+                ('rib', models.CharField(blank=True, max_length=34, null=True)),
+                ('payment_proof', models.FileField(blank=True, max_length=255, null=True, storage=myapp.storage.proof_storage, upload_to='resident_payment_proofs/')),
+                ('confirmed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+                ('appartement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_payments', to='myapp.appartement')),
+                ('charge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='myapp.archivedcharge')),
+                ('resident', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_payments', to=settings.AUTH_USER_MODEL)),
+                ('syndic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_validated_payments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived Resident Payment',
+                'verbose_name_plural': 'Archived Resident Payments',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
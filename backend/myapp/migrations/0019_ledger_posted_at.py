@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:47
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Least
+
+
+def backfill_posted_at(apps, schema_editor):
+    """
+    Date entries by when the charge was created or the payment confirmed.
+    Entries written by the 0012 backfill carry the migration time in
+    created_at; the earlier of the two dates is kept, so entries posted live
+    (and repeated confirmations of a reversed payment) keep their own time.
+    """
+    alias = schema_editor.connection.alias
+    LedgerEntry = apps.get_model('myapp', 'LedgerEntry')
+    entries = LedgerEntry.objects.using(alias)
+    entries.update(posted_at=F('created_at'))
+
+    def business_date(model_names, column, key):
+        dates = [
+            Subquery(apps.get_model('myapp', name).objects.using(alias).filter(pk=OuterRef(key)).values(column)[:1])
+            for name in model_names
+        ]
+        return Least(F('created_at'), Coalesce(*dates, F('created_at')))
+
+    entries.filter(entry_type='CHARGE_POSTED').update(
+        posted_at=business_date(('Charge', 'ArchivedCharge'), 'created_at', 'charge_id')
+    )
+    entries.filter(entry_type='PAYMENT_CONFIRMED').update(
+        posted_at=business_date(('ResidentPayment', 'ArchivedResidentPayment'), 'confirmed_at', 'payment_id')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0018_archive_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='posted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_posted_at, migrations.RunPython.noop),
+    ]
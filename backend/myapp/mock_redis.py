@@ -0,0 +1,286 @@
+"""
+Minimal Redis-compatible server for tests and local multi-worker runs.
+
+Speaks RESP2 (and RESP3 after HELLO 3, which redis-py 8 sends by default)
+and implements the string/counter subset (plus MULTI/EXEC) Django's RedisCache
+and the shared throttles use (GET/SET/INCR/EXPIRE/DEL/... with lazy expiry),
+so cross-process behaviour can be exercised without a Redis install. All
+commands run under one lock, like Redis' single command thread.
+"""
+import fnmatch
+import socketserver
+import threading
+import time
+
+
+class CommandError(Exception):
+    pass
+
+
+class RawReply(bytes):
+    """Already RESP-encoded reply"""
+
+
+class MockRedisState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.databases = {}
+        self.commands = 0
+
+    def db(self, index):
+        return self.databases.setdefault(index, {})
+
+
+class MockRedisHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.db_index = 0
+        self.protocol = 2
+        self.queued = None  # commands buffered between MULTI and EXEC
+
+    @property
+    def state(self):
+        return self.server.state
+
+    @property
+    def data(self):
+        return self.state.db(self.db_index)
+
+    # ---- RESP ----
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()  # inline command (redis-cli, telnet)
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def encode(self, value):
+        if isinstance(value, RawReply):
+            return value
+        if value is None:
+            return b'_\r\n' if self.protocol == 3 else b'$-1\r\n'
+        if isinstance(value, bool):
+            return b':1\r\n' if value else b':0\r\n'
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, dict):
+            items = [item for pair in value.items() for item in pair]
+            if self.protocol == 3:
+                return b'%%%d\r\n' % len(value) + b''.join(self.encode(item) for item in items)
+            value = items
+        if isinstance(value, list):
+            return b'*%d\r\n' % len(value) + b''.join(self.encode(item) for item in value)
+        if isinstance(value, str):  # status reply
+            return b'+%s\r\n' % value.encode()
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            if not args:
+                continue
+            name = args[0].decode().upper()
+            if self.queued is not None and name not in ('EXEC', 'DISCARD', 'MULTI'):
+                self.queued.append(args)
+                self.wfile.write(b'+QUEUED\r\n')
+                continue
+            with self.state.lock:
+                reply = self.execute(args)
+            self.wfile.write(reply)
+
+    def execute(self, args):
+        """Run one command (caller holds the state lock); returns the encoded reply"""
+        name = args[0].decode().upper()
+        method = getattr(self, f'cmd_{name.lower()}', None)
+        self.state.commands += 1
+        try:
+            if method is None:
+                raise CommandError(f"unknown command '{name}'")
+            return self.encode(method(*args[1:]))
+        except CommandError as e:
+            return b'-ERR %s\r\n' % str(e).encode()
+        except (TypeError, ValueError):
+            return b"-ERR wrong number of arguments or invalid argument for '%s'\r\n" % name.encode()
+
+    # ---- transactions ----
+
+    def cmd_multi(self):
+        if self.queued is not None:
+            raise CommandError('MULTI calls can not be nested')
+        self.queued = []
+        return 'OK'
+
+    def cmd_exec(self):
+        if self.queued is None:
+            raise CommandError('EXEC without MULTI')
+        # Already under the state lock: the queued commands run atomically
+        queued, self.queued = self.queued, None
+        return RawReply(b'*%d\r\n' % len(queued) + b''.join(self.execute(args) for args in queued))
+
+    def cmd_discard(self):
+        if self.queued is None:
+            raise CommandError('DISCARD without MULTI')
+        self.queued = None
+        return 'OK'
+
+    # ---- keyspace ----
+
+    def _get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def _value(self, key):
+        entry = self._get(key)
+        return entry[0] if entry else None
+
+    def _expire_at(self, key, seconds):
+        entry = self._get(key)
+        if entry is None:
+            return 0
+        if seconds <= 0:
+            del self.data[key]
+        else:
+            self.data[key] = (entry[0], time.monotonic() + seconds)
+        return 1
+
+    def _incr(self, key, amount):
+        entry = self._get(key)
+        try:
+            value = int(entry[0]) + amount if entry else amount
+        except ValueError:
+            raise CommandError('value is not an integer or out of range')
+        # INCR keeps the key's TTL
+        self.data[key] = (str(value).encode(), entry[1] if entry else None)
+        return value
+
+    # ---- connection ----
+
+    def cmd_ping(self, message=None):
+        return message if message is not None else 'PONG'
+
+    def cmd_hello(self, protocol=b'2', *args):
+        if protocol not in (b'2', b'3'):
+            raise CommandError('NOPROTO unsupported protocol version')
+        self.protocol = int(protocol)
+        return {b'server': b'redis', b'version': b'7.0.0', b'proto': self.protocol, b'mode': b'standalone'}
+
+    def cmd_select(self, index):
+        self.db_index = int(index)
+        return 'OK'
+
+    def cmd_client(self, *args):
+        return 'OK'
+
+    def cmd_flushdb(self, *args):
+        self.data.clear()
+        return 'OK'
+
+    def cmd_flushall(self, *args):
+        self.state.databases.clear()
+        return 'OK'
+
+    # ---- strings ----
+
+    def cmd_get(self, key):
+        return self._value(key)
+
+    def cmd_mget(self, *keys):
+        return [self._value(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        ttl = None
+        nx, xx = b'NX' in options, b'XX' in options
+        for unit, scale in ((b'EX', 1), (b'PX', 0.001)):
+            if unit in options:
+                ttl = int(options[options.index(unit) + 1]) * scale
+        exists = self._get(key) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+        self.data[key] = (value, time.monotonic() + ttl if ttl else None)
+        return 'OK'
+
+    def cmd_mset(self, *pairs):
+        for key, value in zip(pairs[::2], pairs[1::2]):
+            self.data[key] = (value, None)
+        return 'OK'
+
+    def cmd_incr(self, key):
+        return self._incr(key, 1)
+
+    def cmd_incrby(self, key, amount):
+        return self._incr(key, int(amount))
+
+    def cmd_decr(self, key):
+        return self._incr(key, -1)
+
+    def cmd_decrby(self, key, amount):
+        return self._incr(key, -int(amount))
+
+    # ---- keys ----
+
+    def cmd_del(self, *keys):
+        return sum(1 for key in keys if self._get(key) is not None and self.data.pop(key))
+
+    cmd_unlink = cmd_del
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._get(key) is not None)
+
+    def cmd_keys(self, pattern):
+        pattern = pattern.decode()
+        return [key for key in list(self.data) if self._get(key) and fnmatch.fnmatchcase(key.decode(), pattern)]
+
+    def cmd_expire(self, key, seconds):
+        return self._expire_at(key, int(seconds))
+
+    def cmd_pexpire(self, key, milliseconds):
+        return self._expire_at(key, int(milliseconds) / 1000)
+
+    def cmd_persist(self, key):
+        entry = self._get(key)
+        if entry is None or entry[1] is None:
+            return 0
+        self.data[key] = (entry[0], None)
+        return 1
+
+    def cmd_pttl(self, key):
+        entry = self._get(key)
+        if entry is None:
+            return -2
+        if entry[1] is None:
+            return -1
+        return int((entry[1] - time.monotonic()) * 1000)
+
+    def cmd_ttl(self, key):
+        ttl = self.cmd_pttl(key)
+        return ttl if ttl < 0 else round(ttl / 1000)
+
+
+class MockRedisServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def start_mock_server(host='127.0.0.1', port=0):
+    """Start the server on a daemon thread; returns (server, redis_url)"""
+    server = MockRedisServer((host, port), MockRedisHandler)
+    server.state = MockRedisState()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'redis://{host}:{server.server_address[1]}/0'
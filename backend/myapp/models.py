@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils import timezone
 from datetime import timedelta
+import uuid
+from .storage import proof_storage
 
 class UserManager(BaseUserManager):
     """
@@ -217,6 +219,8 @@ class Payment(models.Model):
     rib = models.CharField(max_length=34, blank=True, null=True, help_text="RIB for bank transfers")
     payment_proof = models.FileField(
         upload_to='',
+        storage=proof_storage,
+        max_length=255,
         blank=True,
         null=True,
         help_text="Upload payment proof (receipt, screenshot, etc.)"
@@ -272,6 +276,7 @@ class Immeuble(models.Model):
     address = models.CharField(max_length=500)
     floors = models.IntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = 'Immeuble'
@@ -305,6 +310,7 @@ class Appartement(models.Model):
         decimal_places=2,
         help_text="Default monthly charge amount"
     )
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = 'Appartement'
@@ -409,6 +415,7 @@ class Reunion(models.Model):
     location = models.CharField(max_length=300, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='SCHEDULED')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = 'Reunion'
@@ -442,6 +449,7 @@ class Charge(models.Model):
     paid_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     paid_date = models.DateField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = 'Charge'
@@ -541,6 +549,8 @@ class ResidentPayment(models.Model):
 
     payment_proof = models.FileField(
         upload_to='resident_payment_proofs/',
+        storage=proof_storage,
+        max_length=255,
         blank=True,
         null=True,
         help_text="Upload payment proof (receipt, screenshot, etc.)"
@@ -561,3 +571,342 @@ class ResidentPayment(models.Model):
 
     def __str__(self):
         return f"{self.resident.email} - {self.amount} ({self.status})"
+
+
+class LedgerEntry(models.Model):
+    """
+    Append-only double-entry line on an apartment account.
+
+    Every entry moves `amount` from one account to another; the apartment
+    balance is what is owed on its RECEIVABLE account (debits minus credits).
+    Entries are never updated or deleted: corrections are new entries.
+    """
+    ENTRY_TYPES = [
+        ('CHARGE_POSTED', 'Charge Posted'),
+        ('CHARGE_ADJUSTED', 'Charge Adjusted'),
+        ('PAYMENT_CONFIRMED', 'Payment Confirmed'),
+        ('PAYMENT_REVERSED', 'Payment Reversed'),
+    ]
+
+    ACCOUNTS = [
+        ('RECEIVABLE', 'Resident Receivable'),
+        ('INCOME', 'Charges Income'),
+        ('BANK', 'Bank'),
+    ]
+
+    appartement = models.ForeignKey(
+        'Appartement',
+        on_delete=models.CASCADE,
+        related_name='ledger_entries'
+    )
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    debit_account = models.CharField(max_length=20, choices=ACCOUNTS)
+    credit_account = models.CharField(max_length=20, choices=ACCOUNTS)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Entries keep pointing at charges and payments that were deleted or
+    # archived (see ArchivedCharge), so these are not constrained
+    charge = models.ForeignKey(
+        'Charge',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='ledger_entries'
+    )
+    payment = models.ForeignKey(
+        'ResidentPayment',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='ledger_entries'
+    )
+    description = models.CharField(max_length=300, blank=True)
+    # When the movement happened (charge created, payment confirmed);
+    # created_at is when the row was written, which differs for history
+    # posted by the 0012 backfill
+    posted_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Ledger Entry'
+        verbose_name_plural = 'Ledger Entries'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['appartement', 'id'], name='ledger_apartment_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_type} {self.amount} DH - Apt {self.appartement_id}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Ledger entries are append-only')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Ledger entries are append-only')
+
+    @property
+    def balance_delta(self):
+        """Effect of this entry on the apartment balance"""
+        if self.debit_account == 'RECEIVABLE':
+            return self.amount
+        if self.credit_account == 'RECEIVABLE':
+            return -self.amount
+        return 0
+
+
+class BalanceSnapshot(models.Model):
+    """
+    Apartment balance as of ledger entry `last_entry_id`. The current balance
+    is the latest snapshot plus the entries posted after it.
+    """
+    appartement = models.ForeignKey(
+        'Appartement',
+        on_delete=models.CASCADE,
+        related_name='balance_snapshots'
+    )
+    last_entry_id = models.BigIntegerField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Balance Snapshot'
+        verbose_name_plural = 'Balance Snapshots'
+        ordering = ['-last_entry_id']
+        indexes = [
+            models.Index(fields=['appartement', '-last_entry_id'], name='snapshot_apartment_entry_idx'),
+        ]
+
+    def __str__(self):
+        return f"Apt {self.appartement_id}: {self.balance} DH @ entry {self.last_entry_id}"
+
+
+class UploadSession(models.Model):
+    """
+    Resumable chunked upload of a payment proof. Chunks are appended to a
+    temp file at `received`; on completion the file is moved into proof
+    storage and `file_name` is attached to a payment.
+    """
+    STATUS_CHOICES = [
+        ('ACTIVE', 'Active'),
+        ('COMPLETED', 'Completed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE')
+    file_name = models.CharField(max_length=255, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Upload Session'
+        verbose_name_plural = 'Upload Sessions'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.filename} {self.received}/{self.size} ({self.status})"
+
+
+class LoginHistory(models.Model):
+    """
+    One login attempt. Written in batches by services.login_service, so rows
+    can trail the attempt by up to LOGIN_HISTORY_FLUSH_INTERVAL seconds.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='login_history'
+    )
+    email = models.EmailField()
+    success = models.BooleanField()
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    user_agent = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Login History'
+        verbose_name_plural = 'Login History'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.email} {'ok' if self.success else 'failed'} at {self.created_at}"
+
+
+class SyndicShard(models.Model):
+    """
+    Database alias holding a syndic's buildings and everything under them
+    (see myapp.sharding). Syndics without a row live on 'default'.
+    """
+    syndic = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='shard',
+        limit_choices_to={'role': 'SYNDIC'}
+    )
+    alias = models.CharField(max_length=100)
+    read_only = models.BooleanField(default=False, help_text="Set while the syndic is being moved between shards")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Syndic Shard'
+        verbose_name_plural = 'Syndic Shards'
+
+    def __str__(self):
+        return f"{self.syndic_id} -> {self.alias}{' (read-only)' if self.read_only else ''}"
+
+
+# ==========================
+# Archive (cold) tables
+# ==========================
+#
+# Settled charges with their payments, and closed reclamations with their
+# history, are moved here by services.archive_service so the hot tables and
+# their indexes only hold live rows. Rows keep their original ids and
+# timestamps; list APIs read both sides with ?include_archived=true.
+
+class ArchivedCharge(models.Model):
+    """A Charge PAID long enough ago to be archived"""
+    id = models.BigIntegerField(primary_key=True)
+    appartement = models.ForeignKey(
+        Appartement,
+        on_delete=models.CASCADE,
+        related_name='archived_charges'
+    )
+    description = models.CharField(max_length=300)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    due_date = models.DateField()
+    status = models.CharField(max_length=20, choices=Charge.STATUS_CHOICES)
+    paid_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    paid_date = models.DateField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Archived Charge'
+        verbose_name_plural = 'Archived Charges'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.description} - {self.amount} DH (archived)"
+
+
+class ArchivedResidentPayment(models.Model):
+    """A payment of an archived charge"""
+    id = models.BigIntegerField(primary_key=True)
+    resident = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_payments'
+    )
+    syndic = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_validated_payments'
+    )
+    appartement = models.ForeignKey(
+        Appartement,
+        on_delete=models.CASCADE,
+        related_name='archived_payments'
+    )
+    charge = models.ForeignKey(
+        ArchivedCharge,
+        on_delete=models.CASCADE,
+        related_name='payments'
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_method = models.CharField(max_length=20, choices=ResidentPayment.PAYMENT_METHODS)
+    status = models.CharField(max_length=20, choices=ResidentPayment.PAYMENT_STATUS)
+    reference = models.CharField(max_length=100, blank=True, null=True)
+    paid_at = models.DateTimeField(blank=True, null=True)
+    notes = models.TextField(blank=True, default='')
+    rib = models.CharField(max_length=34, blank=True, null=True)
+    payment_proof = models.FileField(
+        upload_to='resident_payment_proofs/',
+        storage=proof_storage,
+        max_length=255,
+        blank=True,
+        null=True
+    )
+    confirmed_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Archived Resident Payment'
+        verbose_name_plural = 'Archived Resident Payments'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.amount} ({self.status}, archived)"
+
+
+class ArchivedReclamation(models.Model):
+    """A RESOLVED or REJECTED reclamation closed long enough ago to be archived"""
+    id = models.BigIntegerField(primary_key=True)
+    resident = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_reclamations'
+    )
+    syndic = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_received_reclamations'
+    )
+    appartement = models.ForeignKey(
+        Appartement,
+        on_delete=models.CASCADE,
+        related_name='archived_reclamations'
+    )
+    title = models.CharField(max_length=200)
+    content = models.TextField()
+    status = models.CharField(max_length=20, choices=Reclamation.STATUS_CHOICES)
+    priority = models.CharField(max_length=10, choices=Reclamation.PRIORITY_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    response = models.TextField(blank=True, null=True)
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Archived Reclamation'
+        verbose_name_plural = 'Archived Reclamations'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.title} ({self.status}, archived)"
+
+
+class ArchivedReclamationStatusHistory(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    reclamation = models.ForeignKey(
+        ArchivedReclamation,
+        on_delete=models.CASCADE,
+        related_name='status_history'
+    )
+    old_status = models.CharField(max_length=20)
+    new_status = models.CharField(max_length=20)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    comment = models.TextField(blank=True)
+    changed_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['changed_at']
@@ -0,0 +1,217 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import BooleanField, Case, CharField, F, Q, Value, When
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .proof_links import signed_proof_url
+from .serializers import (
+    AppartementSerializer, ChargeSerializer, ReclamationSerializer, SyndicPaymentSerializer
+)
+from .services.preview_service import preview_name
+from .storage import proof_storage
+
+
+# ==========================
+# List projections
+# ==========================
+#
+# Read-only fast path for list actions. Instead of building a model instance
+# per row and walking related objects in SerializerMethodFields, a projection
+# selects exactly the serializer's output columns with values_list(): nested
+# names become joins, computed fields become SQL expressions, and each row is
+# zipped into a dict with the serializer's keys, in the serializer's order.
+# Types whose JSON form needs formatting (decimals, dates) reuse the
+# serializer's own field, so the output is identical to `serializer.data`.
+# ?fields=/?exclude= drop keys before the query is built, so the joins and
+# columns of the dropped keys are never selected.
+
+FORMATTED_FIELDS = (
+    serializers.DecimalField, serializers.DateTimeField, serializers.DateField,
+    serializers.TimeField, serializers.DurationField, serializers.UUIDField,
+)
+
+
+def _iso_format(field, default):
+    output_format = getattr(field, 'format', default)
+    return output_format is not None and output_format.lower() == ISO_8601
+
+
+def formatter(field):
+    """
+    field.to_representation, or an equivalent specialised once per list for
+    the common cases (the generic path re-reads settings and the current
+    timezone for every value)
+    """
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if isinstance(field, serializers.DecimalField) and coerce_to_string and not field.localize \
+            and not field.normalize_output and field.decimal_places is not None:
+        exponent = Decimal(1).scaleb(-field.decimal_places)
+        return lambda value: f'{value.quantize(exponent):f}'
+    if isinstance(field, serializers.DateTimeField) and _iso_format(field, api_settings.DATETIME_FORMAT):
+        tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+        def format_datetime(value):
+            if tz is None or not timezone.is_aware(value):
+                return field.to_representation(value)
+            value = value.astimezone(tz).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return format_datetime
+    if type(field) is serializers.DateField and _iso_format(field, api_settings.DATE_FORMAT):
+        return date.isoformat
+    return field.to_representation
+
+
+def display_name(user, fallback_to_email=True):
+    """SQL twin of f"{first_name} {last_name}".strip() [or email], NULL when there is no user"""
+    full_name = Trim(Concat(F(f'{user}__first_name'), Value(' '), F(f'{user}__last_name'), output_field=CharField()))
+    name = Coalesce(NullIf(full_name, Value('')), F(f'{user}__email')) if fallback_to_email else full_name
+    return Case(When(**{f'{user}__isnull': True}, then=Value(None)), default=name, output_field=CharField())
+
+
+def flag(condition):
+    return Case(When(condition, then=Value(True)), default=Value(False), output_field=BooleanField())
+
+
+class Projection:
+    serializer_class = None
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        # Sparse fieldsets are applied by the serializer itself
+        fields = self.serializer_class(context=self.context).fields
+        self.keys = list(fields)
+        self.formatters = {
+            key: formatter(field)
+            for key, field in fields.items()
+            if isinstance(field, FORMATTED_FIELDS)
+        }
+
+    def expressions(self):
+        """Output key -> lookup or expression, for keys that are not plain model fields"""
+        return {}
+
+    def values(self, queryset, *extra):
+        """
+        Lazy values_list queryset (sliceable, so it can be paginated). `extra`
+        columns are selected after the keys (and left out of the rows).
+        """
+        expressions = {
+            key: F(value) if isinstance(value, str) else value
+            for key, value in self.expressions().items()
+            if key in self.keys
+        }
+        extra = [column for column in extra if column not in self.keys]
+        # pk last, for to_row even when ?fields= leaves out 'id'
+        return queryset.select_related(None).annotate(**expressions).values_list(*self.keys, *extra, 'pk')
+
+    def union(self, querysets, ordering=('-created_at',)):
+        """
+        values() of several querysets over tables with the same columns (hot
+        and archived rows) as one UNION ALL, sorted by `ordering`
+        """
+        columns = [field.lstrip('-') for field in ordering]
+        parts = [self.values(queryset.order_by(), *columns) for queryset in querysets]
+        return parts[0].union(*parts[1:], all=True).order_by(*ordering)
+
+    def to_row(self, pk, row):
+        return row
+
+    def rows(self, values):
+        keys, formatters, to_row = self.keys, self.formatters, self.to_row
+        data = []
+        for values_row in values:
+            row = dict(zip(keys, values_row))
+            for key, format_value in formatters.items():
+                if row[key] is not None:
+                    row[key] = format_value(row[key])
+            data.append(to_row(values_row[-1], row))
+        return data
+
+    def data(self, queryset):
+        return self.rows(self.values(queryset))
+
+
+class ChargeProjection(Projection):
+    serializer_class = ChargeSerializer
+
+    def expressions(self):
+        return {
+            'apartment_number': 'appartement__number',
+            'building_name': 'appartement__immeuble__name',
+            'resident_email': 'appartement__resident__email',
+            'resident_name': display_name('appartement__resident'),
+            'is_overdue': flag(Q(status='UNPAID', due_date__lt=timezone.now().date())),
+        }
+
+
+class ReclamationProjection(Projection):
+    serializer_class = ReclamationSerializer
+
+    def expressions(self):
+        return {
+            'resident_email': 'resident__email',
+            'resident_name': display_name('resident'),
+            'apartment_number': 'appartement__number',
+            'building_name': 'appartement__immeuble__name',
+        }
+
+
+class AppartementProjection(Projection):
+    serializer_class = AppartementSerializer
+
+    def expressions(self):
+        return {
+            'building_name': 'immeuble__name',
+            'building_address': 'immeuble__address',
+            'resident_email': 'resident__email',
+            'resident_name': display_name('resident'),
+            'is_occupied': flag(Q(resident__isnull=False)),
+        }
+
+
+class SyndicPaymentProjection(Projection):
+    serializer_class = SyndicPaymentSerializer
+
+    def __init__(self, context=None):
+        super().__init__(context)
+        self.storage = proof_storage()
+        self.request = self.context.get('request')
+
+    def expressions(self):
+        return {
+            'apartment_number': 'appartement__number',
+            'building_name': 'appartement__immeuble__name',
+            'resident_email': 'appartement__resident__email',
+            'resident_name': display_name('appartement__resident', fallback_to_email=False),
+            # Raw file name (like payment_proof), turned into a URL in to_row
+            'payment_proof_thumbnail': 'payment_proof',
+        }
+
+    def values(self, queryset, *extra):
+        # The payment's syndic goes into the signed proof links
+        return super().values(queryset, 'syndic_id', *extra)
+
+    def rows(self, values):
+        values = list(values)
+        self.syndics = {values_row[-1]: values_row[len(self.keys)] for values_row in values}
+        return super().rows(values)
+
+    def _url(self, pk, variant=None):
+        url = signed_proof_url('resident-payment-proof', pk, variant, self.syndics.get(pk))
+        return self.request.build_absolute_uri(url) if self.request else url
+
+    def to_row(self, pk, row):
+        if 'resident_email' in row and row['resident_email'] is None:
+            # The serializer skips this dotted source when the apartment is vacant
+            del row['resident_email']
+        if 'payment_proof' in row:
+            row['payment_proof'] = self._url(pk) if row['payment_proof'] else None
+        if 'payment_proof_thumbnail' in row:
+            name = row['payment_proof_thumbnail']
+            has_thumbnail = name and self.storage.exists(preview_name(name, 'thumb'))
+            row['payment_proof_thumbnail'] = self._url(pk, 'thumb') if has_thumbnail else None
+        return row
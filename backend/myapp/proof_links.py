@@ -0,0 +1,51 @@
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+
+
+# ==========================
+# Signed proof links
+# ==========================
+#
+# Proof URLs in API responses carry a signature, so the frontend can open
+# them with a plain link or <img> (no Bearer header). The signature holds the
+# URL name, the payment id, the variant, the syndic whose shard the payment
+# lives on and an expiry. The expiry is rounded up to PROOF_LINK_WINDOW so a
+# link stays the same, and browser-cacheable, for a few minutes.
+
+SALT = 'myapp.proof-link'
+PROOF_LINK_WINDOW = 300
+
+
+def _signer():
+    return signing.Signer(salt=SALT)
+
+
+def sign_proof(url_name, pk, variant=None, syndic_id=None, now=None):
+    now = int(now or time.time())
+    expires = (now // PROOF_LINK_WINDOW + 1) * PROOF_LINK_WINDOW + getattr(settings, 'PROOF_LINK_MAX_AGE', 3600)
+    return _signer().sign_object({'u': url_name, 'pk': pk, 'v': variant or '', 's': syndic_id, 'e': expires})
+
+
+def signed_proof_url(url_name, pk, variant=None, syndic_id=None):
+    """Path of a proof download that works without authentication until it expires"""
+    params = {'variant': variant} if variant else {}
+    params['signature'] = sign_proof(url_name, pk, variant, syndic_id)
+    return f'{reverse(url_name, args=[pk])}?{urlencode(params)}'
+
+
+def check_proof_signature(signature, url_name, pk, variant=None):
+    """
+    The syndic id held by a valid signature for this proof (None for global
+    rows); raises signing.BadSignature when it is forged, for another proof
+    or expired.
+    """
+    data = _signer().unsign_object(signature)
+    if (data.get('u'), data.get('pk'), data.get('v')) != (url_name, pk, variant or ''):
+        raise signing.BadSignature('Signature is for another proof')
+    if data.get('e', 0) < time.time():
+        raise signing.BadSignature('Signature expired')
+    return data.get('s')
@@ -0,0 +1,53 @@
+import decimal
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # falls back to DRF's json-based rendering
+    orjson = None
+
+
+# Everything orjson does not know natively (lazy strings, querysets,
+# timedelta, ...) is converted the same way DRF's encoder does it
+_drf_encoder = encoders.JSONEncoder()
+
+
+def _decimal_as_string():
+    return getattr(settings, 'JSON_DECIMAL_AS_STRING', False)
+
+
+def _default(obj):
+    if isinstance(obj, decimal.Decimal):
+        return str(obj) if _decimal_as_string() else float(obj)
+    return _drf_encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson. datetime, date, time and UUID are
+    serialized natively; Decimal becomes a float, or a string when
+    JSON_DECIMAL_AS_STRING is set. Non-string dict keys are stringified like
+    json.dumps does. Values orjson rejects (e.g. ints beyond 64 bits) fall
+    back to the stock renderer.
+    """
+
+    OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        options = self.OPTIONS
+        # orjson only indents by 2; any requested indent (browsable API) gets that
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+
+        try:
+            return orjson.dumps(data, default=_default, option=options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
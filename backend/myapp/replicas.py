@@ -0,0 +1,150 @@
+import contextvars
+import functools
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.http import HttpRequest
+from rest_framework.request import Request
+
+from .throttling import throttle_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================
+# Read replicas
+# ==========================
+#
+# Views marked @use_replica run their reads on one of DATABASE_REPLICAS; all
+# writes, and every read outside a marked view, stay on 'default'. A replica
+# is skipped while its replication lag is above REPLICA_MAX_LAG seconds
+# (checked at most every REPLICA_LAG_CHECK_INTERVAL seconds per process).
+# After a user's successful POST/PUT/PATCH/DELETE, ReplicaPinMiddleware pins
+# that user to 'default' for REPLICA_PIN_SECONDS (in the shared cache, so it
+# holds on every worker), which gives them read-your-writes even when the
+# replica lags.
+
+PIN_KEY = 'replica:pin:{user_id}'
+
+_replica_alias = contextvars.ContextVar('replica_alias', default=None)
+_lag_checked = {}  # alias -> (checked at, usable)
+
+
+def _replicas():
+    return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if alias in settings.DATABASES]
+
+
+def replication_lag(alias):
+    """Seconds the replica is behind its primary (0 when the backend cannot tell)"""
+    connection = connections[alias]
+    if connection.vendor not in ('postgresql', 'mysql'):
+        return 0.0
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            )
+            return float(cursor.fetchone()[0] or 0)
+        if connection.vendor == 'mysql':
+            cursor.execute('SHOW REPLICA STATUS')
+            row = cursor.fetchone()
+            if row is None:
+                return 0.0
+            columns = [column[0] for column in cursor.description]
+            lag = dict(zip(columns, row)).get('Seconds_Behind_Source')
+            return float('inf') if lag is None else float(lag)
+
+
+def replica_usable(alias):
+    checked_at, usable = _lag_checked.get(alias, (0.0, False))
+    now = time.monotonic()
+    if now - checked_at < getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5.0):
+        return usable
+    try:
+        lag = replication_lag(alias)
+        usable = lag <= getattr(settings, 'REPLICA_MAX_LAG', 5.0)
+        if not usable:
+            logger.warning("Replica %s is %.1fs behind, reading from default", alias, lag)
+    except DatabaseError:
+        logger.exception("Replica %s unreachable, reading from default", alias)
+        usable = False
+    _lag_checked[alias] = (now, usable)
+    return usable
+
+
+def pin_to_primary(user_id):
+    throttle_cache().set(PIN_KEY.format(user_id=user_id), 1, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(user_id):
+    return user_id is not None and bool(throttle_cache().get(PIN_KEY.format(user_id=user_id)))
+
+
+def choose_replica(user_id=None):
+    """Replica alias for this read, or None for 'default'"""
+    if is_pinned(user_id):
+        return None
+    usable = [alias for alias in _replicas() if replica_usable(alias)]
+    return random.choice(usable) if usable else None
+
+
+def use_replica(view):
+    """
+    Run a view's reads on a replica. Goes directly on the function that
+    receives the request (under @api_view/@permission_classes, under
+    @action), so authentication and permission checks still read 'default'.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        request = next((arg for arg in args if isinstance(arg, (Request, HttpRequest))), None)
+        user = getattr(request, 'user', None)
+        alias = choose_replica(user.pk if user is not None and user.is_authenticated else None)
+        token = _replica_alias.set(alias)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _replica_alias.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Sends reads inside @use_replica views to the chosen replica; everything else to 'default'"""
+
+    def db_for_read(self, model, **hints):
+        return _replica_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return False if db in _replicas() else None
+
+
+class ReplicaPinMiddleware:
+    """Pin a user to 'default' for a few seconds after each successful write request"""
+
+    WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method in self.WRITE_METHODS and response.status_code < 400 and _replicas():
+            # DRF copies the user it authenticated (JWT) onto the Django request
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.pk)
+        return response
@@ -1,22 +1,133 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt import serializers as jwt_serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
-from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from rest_framework.permissions import SAFE_METHODS
 
+from .proof_links import signed_proof_url
 from .models import (
     Immeuble, Appartement, Reclamation, Reunion, 
     Charge, ResidentPayment, 
     ResidentProfile, User
 )
+from .services.preview_service import preview_exists
+from .tokens import RefreshToken
 
 
 User = get_user_model()
 
 
-class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
-    
+def proof_url(serializer, url_name, obj, variant=None):
+    """
+    Signed download URL of a payment proof, or of one of its previews
+    (None until the background worker has built it).
+    """
+    if not obj.payment_proof:
+        return None
+    if variant and not preview_exists(obj.payment_proof, variant):
+        return None
+    url = signed_proof_url(url_name, obj.pk, variant, getattr(obj, 'syndic_id', None))
+    request = serializer.context.get('request')
+    return request.build_absolute_uri(url) if request else url
+
+
+# ============================================
+# SPARSE FIELDSETS
+# ============================================
+
+def sparse_fieldset(request, names):
+    """
+    The subset of `names` selected by ?fields=a,b and/or ?exclude=c on a read
+    request, in their original order; all of them otherwise. Unknown names
+    are ignored.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return list(names)
+    params = getattr(request, 'query_params', request.GET)
+    fields = params.get('fields')
+    exclude = params.get('exclude')
+    selected = list(names)
+    if fields:
+        wanted = {name.strip() for name in fields.split(',')}
+        selected = [name for name in selected if name in wanted]
+    if exclude:
+        unwanted = {name.strip() for name in exclude.split(',')}
+        selected = [name for name in selected if name not in unwanted]
+    return selected
+
+
+class SparseFieldsMixin:
+    """
+    Lets the client pick the fields of the top-level serializer with
+    ?fields= / ?exclude=. `field_dependencies` lists the model lookups that
+    SerializerMethodFields and properties read, so sparse_queryset can load
+    just what the remaining fields need.
+    """
+    field_dependencies = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.root
+        if root is not self and not (isinstance(root, serializers.ListSerializer) and root.child is self):
+            return fields
+        keep = sparse_fieldset(self.context.get('request'), fields)
+        return {name: field for name, field in fields.items() if name in keep}
+
+
+def _lookup_path(model, lookup):
+    """Relations to select_related for a lookup, or None if it is not a chain of model fields"""
+    relations = []
+    parts = lookup.split('__')
+    for i, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if i < len(parts) - 1:
+            if not field.is_relation or field.many_to_many or field.one_to_many:
+                return None
+            relations.append('__'.join(parts[:i + 1]))
+            model = field.related_model
+    return relations
+
+
+def sparse_queryset(queryset, serializer):
+    """
+    Trim select_related()/only() to the fields a sparse serializer still
+    outputs. Without ?fields=/?exclude= (or if a field's reads are unknown)
+    the queryset is returned unchanged.
+    """
+    request = serializer.context.get('request')
+    if request is None or not ({'fields', 'exclude'} & set(getattr(request, 'query_params', request.GET))):
+        return queryset
+
+    lookups, relations = {'pk'}, set()
+    for name, field in serializer.fields.items():
+        if name in serializer.field_dependencies:
+            needed = serializer.field_dependencies[name]
+        elif field.source == '*':
+            return queryset
+        else:
+            needed = ['__'.join(field.source_attrs)]
+        for lookup in needed:
+            path = _lookup_path(queryset.model, lookup)
+            if path is None:
+                return queryset
+            relations.update(path)
+            lookups.add(lookup)
+    # A relation followed by select_related must itself be loaded
+    return queryset.select_related(None).select_related(*relations).only(*lookups | relations)
+
+
+class CustomTokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    """
+    Login. The user comes from EmailBackend with its subscription already
+    joined in, and the claims and response body are built from that one
+    object (inactive accounts are refused by the backend).
+    """
+    token_class = RefreshToken
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
@@ -33,46 +144,41 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return token
     
     def validate(self, attrs):
-        # Check if user is active before authentication
-        email = attrs.get('email')
-        try:
-            user = User.objects.get(email=email)
-            if not user.is_active:
-                raise serializers.ValidationError({
-                    'detail': 'Account is inactive. Please contact administrator.'
-                })
-        except User.DoesNotExist:
-            pass  # Let the parent handle invalid credentials
-        
         data = super().validate(attrs)
+        user = self.user
         
         # Add user data to response
         data['user'] = {
-            'id': self.user.id,
-            'email': self.user.email,
-            'first_name': self.user.first_name,
-            'last_name': self.user.last_name,
-            'role': self.user.role,
-            'is_active': self.user.is_active,
+            'id': user.id,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'role': user.role,
+            'is_active': user.is_active,
         }
         
         # Add subscription info for Syndics
-        if self.user.is_syndic:
-            data['user']['has_valid_subscription'] = self.user.has_valid_subscription
-            try:
-                subscription = self.user.syndic_profile.subscription
-                data['user']['subscription'] = {
-                    'plan_name': subscription.plan.name,
-                    'status': subscription.status,
-                    'days_remaining': subscription.days_remaining,
-                    'end_date': str(subscription.end_date),
-                }
-            except:
-                data['user']['subscription'] = None
+        if user.is_syndic:
+            subscription = getattr(getattr(user, 'syndic_profile', None), 'subscription', None)
+            data['user']['has_valid_subscription'] = bool(subscription and subscription.is_active)
+            data['user']['subscription'] = {
+                'plan_name': subscription.plan.name,
+                'status': subscription.status,
+                'days_remaining': subscription.days_remaining,
+                'end_date': str(subscription.end_date),
+            } if subscription else None
         
         return data
 
 
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """
+    Refresh with the blacklist check served by the revoked JTI filter
+    (SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER'])
+    """
+    token_class = RefreshToken
+
+
 class UserSerializer(serializers.ModelSerializer):
     """
     User serializer for user details
@@ -337,6 +443,9 @@ class PaymentSerializer(serializers.ModelSerializer):
     plan_name = serializers.CharField(source='subscription.plan.name', read_only=True)
     processed_by_email = serializers.EmailField(source='processed_by.email', read_only=True)
     processed_by_name = serializers.SerializerMethodField()
+    # Proofs are only downloadable through the authenticated proof endpoint
+    payment_proof = serializers.SerializerMethodField()
+    payment_proof_thumbnail = serializers.SerializerMethodField()
     
     class Meta:
         model = Payment
@@ -354,6 +463,7 @@ class PaymentSerializer(serializers.ModelSerializer):
             'notes',
             'rib',
             'payment_proof',
+            'payment_proof_thumbnail',
             'processed_by',
             'processed_by_email',
             'processed_by_name'
@@ -364,6 +474,12 @@ class PaymentSerializer(serializers.ModelSerializer):
         user = obj.subscription.syndic_profile.user
         return f"{user.first_name} {user.last_name}".strip() or user.email
     
+    def get_payment_proof(self, obj):
+        return proof_url(self, 'payment-proof', obj)
+    
+    def get_payment_proof_thumbnail(self, obj):
+        return proof_url(self, 'payment-proof', obj, variant='thumb')
+    
     def get_processed_by_name(self, obj):
         if obj.processed_by:
             return f"{obj.processed_by.first_name} {obj.processed_by.last_name}".strip() or obj.processed_by.email
@@ -440,7 +556,7 @@ class ImmeubleDetailSerializer(ImmeubleSerializer):
 # APARTMENT SERIALIZERS
 # ============================================
 
-class AppartementSerializer(serializers.ModelSerializer):
+class AppartementSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for Appartement (Apartment) model
     """
@@ -449,6 +565,10 @@ class AppartementSerializer(serializers.ModelSerializer):
     resident_email = serializers.EmailField(source='resident.email', read_only=True, allow_null=True)
     resident_name = serializers.SerializerMethodField()
     is_occupied = serializers.SerializerMethodField()
+    field_dependencies = {
+        'resident_name': ['resident__first_name', 'resident__last_name', 'resident__email'],
+        'is_occupied': ['resident'],
+    }
     
     class Meta:
         model = Appartement
@@ -623,7 +743,7 @@ class ResidentUpdateSerializer(serializers.ModelSerializer):
 # RECLAMATION SERIALIZERS
 # ============================================
 
-class ReclamationSerializer(serializers.ModelSerializer):
+class ReclamationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for Reclamation model
     """
@@ -631,6 +751,9 @@ class ReclamationSerializer(serializers.ModelSerializer):
     resident_name = serializers.SerializerMethodField()
     apartment_number = serializers.CharField(source='appartement.number', read_only=True)
     building_name = serializers.CharField(source='appartement.immeuble.name', read_only=True)
+    field_dependencies = {
+        'resident_name': ['resident__first_name', 'resident__last_name', 'resident__email'],
+    }
     
     class Meta:
         model = Reclamation
@@ -661,7 +784,7 @@ class ReclamationSerializer(serializers.ModelSerializer):
 # REUNION SERIALIZERS
 # ============================================
 
-class ReunionSerializer(serializers.ModelSerializer):
+class ReunionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for Reunion model
     """
@@ -695,7 +818,7 @@ class ReunionSerializer(serializers.ModelSerializer):
 # CHARGE SERIALIZERS
 # ============================================
 
-class ChargeSerializer(serializers.ModelSerializer):
+class ChargeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for Charge model
     """
@@ -704,6 +827,13 @@ class ChargeSerializer(serializers.ModelSerializer):
     resident_email = serializers.SerializerMethodField()
     resident_name = serializers.SerializerMethodField()
     is_overdue = serializers.ReadOnlyField()
+    field_dependencies = {
+        'resident_email': ['appartement__resident__email'],
+        'resident_name': [
+            'appartement__resident__first_name', 'appartement__resident__last_name', 'appartement__resident__email'
+        ],
+        'is_overdue': ['status', 'due_date'],
+    }
     
     class Meta:
         model = Charge
@@ -723,7 +853,8 @@ class ChargeSerializer(serializers.ModelSerializer):
             'is_overdue',
             'created_at'
         ]
-        read_only_fields = ['id', 'created_at']
+        # Settlement fields are only written by the settlement service
+        read_only_fields = ['id', 'status', 'paid_amount', 'paid_date', 'created_at']
     
     def get_resident_email(self, obj):
         if obj.appartement.resident:
@@ -773,12 +904,19 @@ class ResidentPaymentSerializer(serializers.ModelSerializer):
 
         return data
 
-class SyndicPaymentSerializer(serializers.ModelSerializer):
+class SyndicPaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Detailed serializer for syndic payments with apartment and resident details"""
     apartment_number = serializers.CharField(source='appartement.number', read_only=True)
     building_name = serializers.CharField(source='appartement.immeuble.name', read_only=True)
     resident_email = serializers.EmailField(source='appartement.resident.email', read_only=True)
     resident_name = serializers.SerializerMethodField()
+    payment_proof = serializers.SerializerMethodField()
+    payment_proof_thumbnail = serializers.SerializerMethodField()
+    field_dependencies = {
+        'resident_name': ['appartement__resident__first_name', 'appartement__resident__last_name'],
+        'payment_proof': ['payment_proof'],
+        'payment_proof_thumbnail': ['payment_proof'],
+    }
     
     class Meta:
         model = ResidentPayment
@@ -796,9 +934,17 @@ class SyndicPaymentSerializer(serializers.ModelSerializer):
             'building_name',
             'resident_email',
             'resident_name',
+            'payment_proof',
+            'payment_proof_thumbnail',
         ]
         read_only_fields = ['status', 'created_at']
     
+    def get_payment_proof(self, obj):
+        return proof_url(self, 'resident-payment-proof', obj)
+    
+    def get_payment_proof_thumbnail(self, obj):
+        return proof_url(self, 'resident-payment-proof', obj, variant='thumb')
+    
     def get_resident_name(self, obj):
         if obj.appartement.resident:
             return f"{obj.appartement.resident.first_name} {obj.appartement.resident.last_name}".strip()
@@ -0,0 +1,380 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from time import time_ns
+
+from django.db.models import Case, DateField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from ..models import ArchivedResidentPayment, Charge, LedgerEntry
+from ..projections import display_name
+from ..sharding import fan_out, tenant_db
+from ..throttling import throttle_cache
+from .ledger_service import BALANCE, SNAPSHOT_LAG, ZERO, balance_delta
+
+
+# ==========================
+# Revenue time series
+# ==========================
+#
+# Billed, collected and outstanding amounts per day, week or month, read from
+# the append-only ledger by posting date (LedgerEntry.posted_at): billed is
+# what was posted to INCOME (charges and adjustments), collected what reached
+# BANK (confirmations minus reversals) and outstanding the RECEIVABLE balance
+# at the end of each bucket. Each range is one grouped query (per shard for
+# admins) plus one for the opening balance. Entries are posted at the time
+# they are written and never updated, so a bucket that ended more than
+# SNAPSHOT_LAG ago never changes: its figures are cached for
+# REVENUE_CACHE_SECONDS (finite, as any range can be requested).
+# Deleting an apartment deletes its entries, so it moves the syndic to a new
+# cache generation (see signals.py).
+
+GRANULARITIES = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+GROUP_BY = ('building', 'payment_method')
+DEFAULT_BUCKETS = {'day': 31, 'week': 12, 'month': 12}
+MAX_BUCKETS = 400
+MAX_YEAR = 9999
+REVENUE_CACHE_SECONDS = 30 * 24 * 3600
+
+BUCKET_KEY = 'revenue:posted:{scope}:{generation}:{granularity}:{group_by}:{bucket}'
+OPENING_KEY = 'revenue:posted:{scope}:{generation}:opening:{group_by}:{start}'
+GENERATION_KEY = 'revenue:generation:{scope}'
+
+ZERO_AMOUNT = Decimal('0')
+
+
+def _movement(account, side):
+    """Net amount an entry moves on `account`, positive on `side` ('debit' or 'credit')"""
+    other = 'credit' if side == 'debit' else 'debit'
+    return Sum(Case(
+        When(**{f'{side}_account': account}, then=F('amount')),
+        When(**{f'{other}_account': account}, then=-F('amount')),
+        default=ZERO,
+        output_field=BALANCE,
+    ))
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(bucket, granularity):
+    if granularity == 'week':
+        return bucket + timedelta(days=7)
+    if granularity == 'month':
+        return (bucket.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return bucket + timedelta(days=1)
+
+
+def default_range(granularity, today=None):
+    """The last DEFAULT_BUCKETS buckets up to today"""
+    end = today or timezone.localdate()
+    start = bucket_start(end, granularity)
+    for _ in range(DEFAULT_BUCKETS[granularity] - 1):
+        start = bucket_start(start - timedelta(days=1), granularity)
+    return start, end
+
+
+def _buckets(start, end, granularity):
+    buckets, bucket = [], bucket_start(start, granularity)
+    while bucket <= end:
+        buckets.append(bucket)
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f'At most {MAX_BUCKETS} {granularity} buckets per request')
+        bucket = next_bucket(bucket, granularity)
+    return buckets
+
+
+def _moment(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _closed(day, now):
+    """True once nothing can be posted before `day` any more"""
+    return _moment(day) + SNAPSHOT_LAG <= now
+
+
+def _group_fields(group_by):
+    """Annotations and the values() columns identifying a group"""
+    if group_by == 'building':
+        return {}, ['appartement__immeuble_id', 'appartement__immeuble__name']
+    if group_by == 'payment_method':
+        archived = ArchivedResidentPayment.objects.filter(pk=OuterRef('payment_id')).values('payment_method')[:1]
+        return {'method': Coalesce(F('payment__payment_method'), Subquery(archived))}, ['method']
+    return {}, []
+
+
+def _group_key(row, columns):
+    if not columns:
+        return None
+    values = tuple(row[column] for column in columns)
+    return values if len(values) > 1 else values[0]
+
+
+def _entries(syndic_id, alias):
+    entries = LedgerEntry.objects.using(alias).order_by()
+    if syndic_id is not None:
+        entries = entries.filter(appartement__immeuble__syndic_id=syndic_id)
+    return entries
+
+
+def _run(syndic_id, query):
+    """query(alias) on the syndic's shard, or on every shard (merged by the caller) for all syndics"""
+    return [query(tenant_db(syndic_id))] if syndic_id is not None else fan_out(query)
+
+
+def _bucket_totals(syndic_id, granularity, group_by, start, end):
+    """{bucket: {group key: [billed, collected]}} for [start, end), in one grouped query per database"""
+    annotations, columns = _group_fields(group_by)
+
+    def query(alias):
+        return list(_entries(syndic_id, alias).filter(
+            posted_at__gte=_moment(start), posted_at__lt=_moment(end)
+        ).annotate(
+            bucket=GRANULARITIES[granularity]('posted_at', output_field=DateField()), **annotations
+        ).values('bucket', *columns).annotate(
+            billed=_movement('INCOME', 'credit'), collected=_movement('BANK', 'debit')
+        ).values_list('bucket', *columns, 'billed', 'collected'))
+
+    totals = {}
+    for rows in _run(syndic_id, query):
+        for bucket, *key, billed, collected in rows:
+            key = _group_key(dict(zip(columns, key)), columns)
+            amounts = totals.setdefault(bucket, {}).setdefault(key, [ZERO_AMOUNT, ZERO_AMOUNT])
+            amounts[0] += billed or 0
+            amounts[1] += collected or 0
+    return totals
+
+
+def _opening_balances(syndic_id, group_by, start):
+    """{group key: RECEIVABLE balance} before `start` (per building, or one total)"""
+    columns = _group_fields('building')[1] if group_by == 'building' else []
+
+    def query(alias):
+        return list(_entries(syndic_id, alias).filter(
+            posted_at__lt=_moment(start)
+        ).values(*columns).annotate(balance=Sum(balance_delta())).values_list(*columns, 'balance'))
+
+    balances = {}
+    for rows in _run(syndic_id, query):
+        for *key, balance in rows:
+            key = _group_key(dict(zip(columns, key)), columns)
+            balances[key] = balances.get(key, ZERO_AMOUNT) + (balance or 0)
+    return balances
+
+
+def forget_revenue(syndic_id):
+    """Start new cache generations for a syndic and for the all-syndics series"""
+    generation = time_ns()
+    throttle_cache().set_many({
+        GENERATION_KEY.format(scope=scope): generation for scope in (syndic_id, 'all')
+    }, timeout=None)
+
+
+def revenue_series(syndic_id=None, start=None, end=None, granularity='month', group_by=None, now=None):
+    """
+    Revenue buckets covering [start, end] (dates, widened to whole buckets)
+    for one syndic, or for every syndic when syndic_id is None.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'granularity must be one of {", ".join(GRANULARITIES)}')
+    if group_by is not None and group_by not in GROUP_BY:
+        raise ValueError(f'group_by must be one of {", ".join(GROUP_BY)}')
+    if start is None or end is None:
+        default_start, default_end = default_range(granularity)
+        start, end = start or default_start, end or default_end
+    if start > end:
+        raise ValueError('start must not be after end')
+    if end.year >= MAX_YEAR:
+        # The bucket after the last one must still be a valid date
+        raise ValueError(f'end must be before {MAX_YEAR}')
+
+    now = now or timezone.now()
+    buckets = _buckets(start, end, granularity)
+    range_end = next_bucket(buckets[-1], granularity)
+
+    cache = throttle_cache()
+    scope = syndic_id if syndic_id is not None else 'all'
+    generation = cache.get(GENERATION_KEY.format(scope=scope), 0)
+
+    def bucket_key(bucket):
+        return BUCKET_KEY.format(
+            scope=scope, generation=generation, granularity=granularity, group_by=group_by, bucket=bucket
+        )
+
+    closed = [bucket for bucket in buckets if _closed(next_bucket(bucket, granularity), now)]
+    cached = cache.get_many([bucket_key(bucket) for bucket in closed])
+    totals = {bucket: cached[bucket_key(bucket)] for bucket in closed if bucket_key(bucket) in cached}
+
+    missing = [bucket for bucket in buckets if bucket not in totals]
+    if missing:
+        # Usually just the open buckets at the end of the range
+        found = _bucket_totals(syndic_id, granularity, group_by, missing[0], range_end)
+        fresh = {bucket: found.get(bucket, {}) for bucket in missing}
+        totals.update(fresh)
+        cache.set_many({
+            bucket_key(bucket): fresh[bucket] for bucket in missing if bucket in closed
+        }, timeout=REVENUE_CACHE_SECONDS)
+
+    opening_key = OPENING_KEY.format(scope=scope, generation=generation, group_by=group_by, start=buckets[0])
+    opening = cache.get(opening_key)
+    if opening is None:
+        opening = _opening_balances(syndic_id, group_by, buckets[0])
+        if _closed(buckets[0], now):
+            cache.set(opening_key, opening, timeout=REVENUE_CACHE_SECONDS)
+
+    return _series(buckets, totals, opening, group_by)
+
+
+def _series(buckets, totals, opening, group_by):
+    outstanding = sum(opening.values(), ZERO_AMOUNT)
+    balances = dict(opening)
+    keys = {key for amounts in totals.values() for key in amounts} | set(opening)
+    keys.discard(None)
+    keys = sorted(keys, key=lambda key: (str(key[1]), key[0]) if group_by == 'building' else str(key))
+
+    series = []
+    for bucket in buckets:
+        amounts = totals.get(bucket, {})
+        billed = sum((billed for billed, _ in amounts.values()), ZERO_AMOUNT)
+        collected = sum((collected for _, collected in amounts.values()), ZERO_AMOUNT)
+        outstanding += billed - collected
+        point = {
+            'period': bucket.isoformat(),
+            'billed': billed,
+            'collected': collected,
+            'outstanding': outstanding,
+        }
+        if group_by == 'building':
+            point['groups'] = []
+            for key in keys:
+                group_billed, group_collected = amounts.get(key, (ZERO_AMOUNT, ZERO_AMOUNT))
+                balances[key] = balances.get(key, ZERO_AMOUNT) + group_billed - group_collected
+                point['groups'].append({
+                    'building_id': key[0],
+                    'building_name': key[1],
+                    'billed': group_billed,
+                    'collected': group_collected,
+                    'outstanding': balances[key],
+                })
+        elif group_by == 'payment_method':
+            # Only payments carry a method; billed and outstanding stay per bucket
+            point['groups'] = [
+                {'payment_method': key, 'collected': amounts.get(key, (ZERO_AMOUNT, ZERO_AMOUNT))[1]}
+                for key in keys
+            ]
+        series.append(point)
+    return series
+
+
+# ==========================
+# Receivables aging
+# ==========================
+#
+# What is still owed on each charge (amount - paid_amount), bucketed by days
+# past due_date. One grouped query per syndic gives the buckets per (building,
+# resident) with conditional sums; buildings, residents and the totals are
+# rolled up from those rows. The report is an as-of-today view, cached per
+# syndic until midnight.
+
+AGING_BUCKETS = (
+    # key, first day past due, last day past due
+    ('current', None, 0),
+    ('days_1_30', 1, 30),
+    ('days_31_60', 31, 60),
+    ('days_61_90', 61, 90),
+    ('days_90_plus', 91, None),
+)
+AGING_KEY = 'aging:{syndic_id}:{day}'
+
+
+def _aging_condition(today, first, last):
+    """Charges `first` to `last` days past due (either bound open)"""
+    condition = Q()
+    if first is not None:
+        condition &= Q(due_date__lte=today - timedelta(days=first))
+    if last is not None:
+        condition &= Q(due_date__gte=today - timedelta(days=last))
+    return condition
+
+
+def _aging_row(**fields):
+    return {**fields, **dict.fromkeys((key for key, _, _ in AGING_BUCKETS), ZERO_AMOUNT), 'total': ZERO_AMOUNT}
+
+
+def _add_aging(into, row):
+    for key, _, _ in AGING_BUCKETS:
+        into[key] += row[key]
+    into['total'] += row['total']
+
+
+def aging_rows(syndic_id, today):
+    """Aging buckets per (building, resident), in one grouped query"""
+    outstanding = ExpressionWrapper(F('amount') - F('paid_amount'), output_field=BALANCE)
+    buckets = {
+        key: Sum(Case(When(_aging_condition(today, first, last), then=outstanding), default=ZERO, output_field=BALANCE))
+        for key, first, last in AGING_BUCKETS
+    }
+    rows = Charge.objects.using(tenant_db(syndic_id)).filter(
+        appartement__immeuble__syndic_id=syndic_id,
+        paid_amount__lt=F('amount'),
+    ).order_by().annotate(
+        resident_name=display_name('appartement__resident'),
+    ).values(
+        'appartement__immeuble_id', 'appartement__immeuble__name',
+        'appartement__resident_id', 'resident_name', 'appartement__resident__email',
+    ).annotate(total=Sum(outstanding), **buckets).order_by('appartement__immeuble__name', 'resident_name')
+
+    return [
+        {
+            'building_id': row['appartement__immeuble_id'],
+            'building_name': row['appartement__immeuble__name'],
+            'resident_id': row['appartement__resident_id'],
+            'resident_name': row['resident_name'],
+            'resident_email': row['appartement__resident__email'],
+            **{key: row[key] or ZERO_AMOUNT for key, _, _ in AGING_BUCKETS},
+            'total': row['total'] or ZERO_AMOUNT,
+        }
+        for row in rows
+    ]
+
+
+def aging_report(syndic_id, today=None):
+    """Aging buckets per building, per resident and in total; cached for the day"""
+    today = today or timezone.localdate()
+    cache = throttle_cache()
+    key = AGING_KEY.format(syndic_id=syndic_id, day=today)
+    report = cache.get(key)
+    if report is not None:
+        return report
+
+    rows = aging_rows(syndic_id, today)
+    buildings, residents, totals = {}, {}, _aging_row()
+    for row in rows:
+        building = buildings.setdefault(row['building_id'], _aging_row(
+            building_id=row['building_id'], building_name=row['building_name']
+        ))
+        _add_aging(building, row)
+        # Vacant apartments are left out of the per-resident view
+        if row['resident_id'] is not None:
+            resident = residents.setdefault(row['resident_id'], _aging_row(
+                resident_id=row['resident_id'], resident_name=row['resident_name'],
+                resident_email=row['resident_email'],
+            ))
+            _add_aging(resident, row)
+        _add_aging(totals, row)
+
+    report = {
+        'as_of': today.isoformat(),
+        'totals': totals,
+        'buildings': list(buildings.values()),
+        'residents': sorted(residents.values(), key=lambda resident: resident['total'], reverse=True),
+        'rows': rows,
+    }
+    midnight = _moment(today + timedelta(days=1))
+    cache.set(key, report, max(int((midnight - timezone.now()).total_seconds()), 1))
+    return report
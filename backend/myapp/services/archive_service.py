@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from ..models import (
+    ArchivedCharge, ArchivedReclamation, ArchivedReclamationStatusHistory, ArchivedResidentPayment,
+    Charge, Reclamation, ReclamationStatusHistory, ResidentPayment,
+)
+from ..sharding import shards
+
+
+# ==========================
+# Hot/cold archival
+# ==========================
+#
+# Charges PAID more than ARCHIVE_AFTER_MONTHS ago move to ArchivedCharge
+# together with all their payments, and RESOLVED/REJECTED reclamations last
+# updated that long ago move to ArchivedReclamation with their status
+# history. Each batch is one INSERT ... SELECT per table plus the DELETEs, in
+# its own transaction: an interrupted run leaves whole batches archived and
+# the next run picks up the rest. Charges with a PENDING payment stay hot.
+# The archive tables sit next to the hot ones (on the tenant's shard), so
+# ?include_archived=true reads are a plain UNION ALL.
+
+ARCHIVE_AFTER_MONTHS = 12
+ARCHIVE_BATCH_SIZE = 500
+CLOSED_RECLAMATION_STATUSES = ('RESOLVED', 'REJECTED')
+
+ARCHIVE_MODELS = {
+    Charge: ArchivedCharge,
+    ResidentPayment: ArchivedResidentPayment,
+    Reclamation: ArchivedReclamation,
+    ReclamationStatusHistory: ArchivedReclamationStatusHistory,
+}
+
+
+def archive_cutoff(months=ARCHIVE_AFTER_MONTHS, now=None):
+    return (now or timezone.now()) - timedelta(days=round(months * 365.25 / 12))
+
+
+def archivable_charges(cutoff, using=None):
+    return Charge.objects.using(using).filter(
+        status='PAID', paid_date__lt=cutoff.date()
+    ).exclude(payments__status='PENDING')
+
+
+def archivable_reclamations(cutoff, using=None):
+    return Reclamation.objects.using(using).filter(
+        status__in=CLOSED_RECLAMATION_STATUSES, updated_at__lt=cutoff
+    )
+
+
+def _copy(model, column, ids, connection, archived_at):
+    """INSERT ... SELECT the rows whose `column` is in ids into the archive table"""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in model._meta.concrete_fields)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(ARCHIVE_MODELS[model]._meta.db_table)} ({columns}, {quote("archived_at")}) '
+            f'SELECT {columns}, %s FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(column)} IN ({", ".join(["%s"] * len(ids))})',
+            [archived_at, *ids]
+        )
+        return cursor.rowcount
+
+
+def _delete(model, column, ids, connection):
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} IN ({", ".join(["%s"] * len(ids))})',
+            ids
+        )
+
+
+def _archive_batches(queryset, children, batch_size):
+    """Archive `queryset` and its children ((model, fk column) pairs) batch by batch"""
+    model, using = queryset.model, queryset.db
+    connection = connections[using]
+    archived_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    moved = dict.fromkeys([model.__name__, *(child.__name__ for child, _ in children)], 0)
+    while True:
+        with transaction.atomic(using=using):
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return moved
+            # Archived children point at the archived parent; hot ones at the hot parent
+            moved[model.__name__] += _copy(model, 'id', ids, connection, archived_at)
+            for child, column in children:
+                moved[child.__name__] += _copy(child, column, ids, connection, archived_at)
+                _delete(child, column, ids, connection)
+            _delete(model, 'id', ids, connection)
+
+
+def archive_charges(cutoff, using='default', batch_size=ARCHIVE_BATCH_SIZE):
+    return _archive_batches(
+        archivable_charges(cutoff, using),
+        [(ResidentPayment, 'charge_id')],
+        batch_size,
+    )
+
+
+def archive_reclamations(cutoff, using='default', batch_size=ARCHIVE_BATCH_SIZE):
+    return _archive_batches(
+        archivable_reclamations(cutoff, using),
+        [(ReclamationStatusHistory, 'reclamation_id')],
+        batch_size,
+    )
+
+
+def archive(months=ARCHIVE_AFTER_MONTHS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Archive on every shard; returns {alias: {model name: rows moved}}"""
+    cutoff = archive_cutoff(months)
+    return {
+        alias: {
+            **archive_charges(cutoff, alias, batch_size),
+            **archive_reclamations(cutoff, alias, batch_size),
+        }
+        for alias in shards()
+    }
+
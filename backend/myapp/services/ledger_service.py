@@ -0,0 +1,197 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    Case, DecimalField, F, Max, OuterRef, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import Appartement, BalanceSnapshot, LedgerEntry
+
+
+# ==========================
+# Apartment ledger
+# ==========================
+#
+# Charges and confirmed payments are posted as append-only LedgerEntry rows.
+# BalanceSnapshot rows are taken periodically (see `ledger_snapshot`), so a
+# balance read is the latest snapshot plus the short tail of newer entries.
+
+BALANCE = DecimalField(max_digits=12, decimal_places=2)
+ZERO = Value(Decimal('0'), output_field=BALANCE)
+
+# Entries younger than this are left out of snapshots: their ids may have been
+# allocated by transactions that had not committed when the snapshot was taken.
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+ENTRY_ACCOUNTS = {
+    'CHARGE_POSTED': ('RECEIVABLE', 'INCOME'),
+    'PAYMENT_CONFIRMED': ('BANK', 'RECEIVABLE'),
+    'PAYMENT_REVERSED': ('RECEIVABLE', 'BANK'),
+}
+
+
+def balance_delta():
+    """SQL expression of an entry's effect on the apartment balance"""
+    return Case(
+        When(debit_account='RECEIVABLE', then=F('amount')),
+        When(credit_account='RECEIVABLE', then=-F('amount')),
+        default=ZERO,
+        output_field=BALANCE,
+    )
+
+
+def _entry(entry_type, appartement_id, amount, charge_id=None, payment_id=None, description=''):
+    debit, credit = ENTRY_ACCOUNTS[entry_type]
+    return LedgerEntry(
+        appartement_id=appartement_id,
+        entry_type=entry_type,
+        debit_account=debit,
+        credit_account=credit,
+        amount=amount,
+        charge_id=charge_id,
+        payment_id=payment_id,
+        description=description[:300],
+    )
+
+
+# ==========================
+# Posting
+# ==========================
+
+def post_charges(charges):
+    """Post CHARGE_POSTED entries for newly created charges"""
+    return LedgerEntry.objects.bulk_create([
+        _entry('CHARGE_POSTED', c.appartement_id, c.amount, charge_id=c.pk, description=c.description)
+        for c in charges
+    ])
+
+
+def post_charge_adjustment(charge, old_amount):
+    """Post the difference when a charge amount is edited (or removed: new amount 0)"""
+    delta = charge.amount - old_amount
+    if not delta:
+        return None
+    debit, credit = ('RECEIVABLE', 'INCOME') if delta > 0 else ('INCOME', 'RECEIVABLE')
+    return LedgerEntry.objects.create(
+        appartement_id=charge.appartement_id,
+        entry_type='CHARGE_ADJUSTED',
+        debit_account=debit,
+        credit_account=credit,
+        amount=abs(delta),
+        charge_id=charge.pk,
+        description=charge.description[:300],
+    )
+
+
+def post_payments(entry_type, payments):
+    """
+    Post PAYMENT_CONFIRMED / PAYMENT_REVERSED entries. `payments` are dicts
+    or objects exposing id, appartement_id, charge_id and amount.
+    """
+    def get(p, name):
+        return p[name] if isinstance(p, dict) else getattr(p, name)
+
+    return LedgerEntry.objects.bulk_create([
+        _entry(
+            entry_type,
+            get(p, 'appartement_id'),
+            get(p, 'amount'),
+            charge_id=get(p, 'charge_id'),
+            payment_id=get(p, 'id'),
+        )
+        for p in payments
+    ])
+
+
+# ==========================
+# Balances
+# ==========================
+
+def with_balances(apartments):
+    """
+    Annotate an Appartement queryset with `balance`: the latest snapshot plus
+    the entries posted after it, in a single query.
+    """
+    latest = BalanceSnapshot.objects.filter(
+        appartement=OuterRef('pk')
+    ).order_by('-last_entry_id')
+    tail = LedgerEntry.objects.filter(
+        appartement=OuterRef('pk'),
+        id__gt=OuterRef('snapshot_entry')
+    ).order_by().values('appartement').annotate(total=Sum(balance_delta())).values('total')
+
+    return apartments.annotate(
+        snapshot_entry=Coalesce(Subquery(latest.values('last_entry_id')[:1]), Value(0)),
+        snapshot_balance=Coalesce(Subquery(latest.values('balance')[:1], output_field=BALANCE), ZERO),
+    ).annotate(
+        balance=F('snapshot_balance') + Coalesce(Subquery(tail, output_field=BALANCE), ZERO)
+    )
+
+
+def total_balance(apartments):
+    """Sum of balances over an Appartement queryset"""
+    balances = with_balances(apartments.order_by()).values_list('balance', flat=True)
+    return sum(balances, Decimal('0'))
+
+
+def apartment_balance(appartement_id):
+    return total_balance(Appartement.objects.filter(pk=appartement_id))
+
+
+# ==========================
+# Snapshots and statements
+# ==========================
+
+def take_snapshots(apartments=None, batch_size=1000):
+    """
+    Write a BalanceSnapshot for every apartment with settled entries newer
+    than its latest snapshot. Returns the number of snapshots written.
+    """
+    cutoff = LedgerEntry.objects.filter(
+        created_at__lt=timezone.now() - SNAPSHOT_LAG
+    ).aggregate(last=Max('id'))['last']
+    if cutoff is None:
+        return 0
+
+    newest = LedgerEntry.objects.filter(
+        appartement=OuterRef('pk'),
+        id__lte=cutoff
+    ).order_by('-id').values('id')[:1]
+    latest = BalanceSnapshot.objects.filter(
+        appartement=OuterRef('pk')
+    ).order_by('-last_entry_id')
+    tail = LedgerEntry.objects.filter(
+        appartement=OuterRef('pk'),
+        id__gt=OuterRef('snapshot_entry'),
+        id__lte=cutoff
+    ).order_by().values('appartement').annotate(total=Sum(balance_delta())).values('total')
+
+    apartments = (apartments if apartments is not None else Appartement.objects.all()).order_by('pk')
+    rows = apartments.annotate(
+        newest_entry=Subquery(newest),
+        snapshot_entry=Coalesce(Subquery(latest.values('last_entry_id')[:1]), Value(0)),
+        snapshot_balance=Coalesce(Subquery(latest.values('balance')[:1], output_field=BALANCE), ZERO),
+    ).filter(newest_entry__gt=F('snapshot_entry')).annotate(
+        settled_balance=F('snapshot_balance') + Coalesce(Subquery(tail, output_field=BALANCE), ZERO)
+    ).values_list('pk', 'newest_entry', 'settled_balance')
+
+    written, batch = 0, []
+    for pk, newest_entry, balance in rows.iterator(chunk_size=batch_size):
+        batch.append(BalanceSnapshot(appartement_id=pk, last_entry_id=newest_entry, balance=balance))
+        if len(batch) >= batch_size:
+            written += len(BalanceSnapshot.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        written += len(BalanceSnapshot.objects.bulk_create(batch))
+    return written
+
+
+def iter_statement(appartement_id, chunk_size=2000):
+    """Yield (entry, running_balance) for an apartment in posting order"""
+    running = Decimal('0')
+    entries = LedgerEntry.objects.filter(appartement_id=appartement_id).order_by('id')
+    for entry in entries.iterator(chunk_size=chunk_size):
+        running += entry.balance_delta
+        yield entry, running
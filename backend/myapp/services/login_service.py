@@ -0,0 +1,110 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from ..models import LoginHistory, User
+
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================
+# Login history
+# ==========================
+#
+# record_login() only appends to an in-memory buffer; a daemon thread writes
+# the buffer with one bulk_create (and one last_login bulk_update) every
+# LOGIN_HISTORY_FLUSH_INTERVAL seconds, or as soon as LOGIN_HISTORY_BATCH_SIZE
+# entries are waiting. The login request itself does no history writes. An
+# interval of 0 writes synchronously instead (single-threaded runs, tests).
+
+_buffer = []
+_buffer_lock = threading.Lock()
+_wakeup = threading.Event()
+_writer = None
+
+
+def _flush_interval():
+    return getattr(settings, 'LOGIN_HISTORY_FLUSH_INTERVAL', 2.0)
+
+
+def _batch_size():
+    return getattr(settings, 'LOGIN_HISTORY_BATCH_SIZE', 500)
+
+
+def _client_ip(request):
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded:
+        return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+def record_login(request, user=None, email=''):
+    """Queue a login attempt: successful when `user` is given, failed otherwise"""
+    entry = LoginHistory(
+        user=user,
+        email=(user.email if user else str(email or ''))[:254],
+        success=user is not None,
+        ip_address=_client_ip(request),
+        user_agent=request.META.get('HTTP_USER_AGENT', '')[:255],
+        created_at=timezone.now(),
+    )
+    with _buffer_lock:
+        _buffer.append(entry)
+        pending = len(_buffer)
+
+    if not _flush_interval():
+        flush()
+        return
+    _ensure_writer()
+    if pending >= _batch_size():
+        _wakeup.set()
+
+
+def flush():
+    """Write everything buffered so far; returns the number of entries written"""
+    global _buffer
+    with _buffer_lock:
+        entries, _buffer = _buffer, []
+    if not entries:
+        return 0
+
+    last_login = {}
+    for entry in entries:
+        if entry.success:
+            last_login[entry.user_id] = max(entry.created_at, last_login.get(entry.user_id, entry.created_at))
+    try:
+        LoginHistory.objects.bulk_create(entries)
+        if last_login:
+            User.objects.bulk_update(
+                [User(pk=user_id, last_login=at) for user_id, at in last_login.items()], ['last_login']
+            )
+    except Exception:
+        logger.exception("Dropped %d login history entries", len(entries))
+        return 0
+    return len(entries)
+
+
+def _run():
+    while True:
+        _wakeup.wait(_flush_interval() or None)
+        _wakeup.clear()
+        flush()
+        close_old_connections()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is None:
+        with _buffer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_run, name='login-history-writer', daemon=True)
+                _writer.start()
+
+
+# Daemon threads are killed at exit; write what is left
+atexit.register(flush)
@@ -0,0 +1,148 @@
+import hashlib
+import io
+import logging
+import os
+import posixpath
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # previews are skipped without Pillow
+    Image = None
+
+try:
+    import pymupdf
+except ImportError:  # PDF proofs get no preview without PyMuPDF
+    pymupdf = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================
+# Proof previews
+# ==========================
+#
+# A small thumbnail (lists) and a compressed review copy (detail view) are
+# built off-request for every uploaded proof. Preview names derive from the
+# proof's content hash, so the work is idempotent and shared by duplicates.
+
+PREVIEW_DIR = 'previews'
+VARIANTS = {
+    # variant: (max side in px, format, extension, quality)
+    'thumb': (320, 'WEBP', 'webp', 70),
+    'review': (1600, 'JPEG', 'jpg', 80),
+}
+PDF_RENDER_DPI = 110
+
+CONTENT_HASH = re.compile(r'([0-9a-f]{64})(\.\w+)?$')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _source_key(name):
+    match = CONTENT_HASH.search(name)
+    return match.group(1) if match else hashlib.sha256(name.encode()).hexdigest()
+
+
+def preview_name(proof_name, variant):
+    key = _source_key(proof_name)
+    ext = VARIANTS[variant][2]
+    return posixpath.join(PREVIEW_DIR, key[:2], key[2:4], f'{key}-{variant}.{ext}')
+
+
+def preview_exists(fieldfile, variant):
+    return bool(fieldfile) and fieldfile.storage.exists(preview_name(fieldfile.name, variant))
+
+
+def _load_image(fieldfile):
+    with fieldfile.storage.open(fieldfile.name, 'rb') as f:
+        if fieldfile.name.lower().endswith('.pdf'):
+            if pymupdf is None:
+                return None
+            with pymupdf.open(stream=f.read(), filetype='pdf') as document:
+                if not document.page_count:
+                    return None
+                pixmap = document[0].get_pixmap(dpi=PDF_RENDER_DPI)
+                return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+        image = Image.open(f)
+        image.draft('RGB', (VARIANTS['review'][0], VARIANTS['review'][0]))  # cheap JPEG downscale on decode
+        image = ImageOps.exif_transpose(image)
+        return image.convert('RGB')
+
+
+def _write_atomic(storage, name, data):
+    path = storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def generate_previews(fieldfile):
+    """
+    Build the missing previews of a proof. Returns the variants written;
+    unsupported files (or missing Pillow/PyMuPDF) produce none.
+    """
+    if Image is None or not fieldfile:
+        return []
+    storage = fieldfile.storage
+    missing = [v for v in VARIANTS if not storage.exists(preview_name(fieldfile.name, v))]
+    if not missing:
+        return []
+
+    try:
+        image = _load_image(fieldfile)
+    except (OSError, ValueError, RuntimeError) as e:
+        logger.warning("Cannot build preview for %s: %s", fieldfile.name, e)
+        return []
+    if image is None:
+        return []
+
+    # Largest first, so each smaller variant is resized from the previous one
+    for variant in sorted(missing, key=lambda v: -VARIANTS[v][0]):
+        size, image_format, _, quality = VARIANTS[variant]
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, quality=quality, optimize=True)
+        _write_atomic(storage, preview_name(fieldfile.name, variant), buffer.getvalue())
+    return missing
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PROOF_PREVIEW_WORKERS', 2),
+                    thread_name_prefix='proof-preview',
+                )
+    return _executor
+
+
+def _run(fieldfile):
+    try:
+        generate_previews(fieldfile)
+    except Exception:
+        logger.exception("Preview generation failed for %s", fieldfile.name)
+
+
+def schedule_previews(fieldfile):
+    """Queue preview generation on the worker pool once the transaction commits"""
+    if Image is None or not fieldfile:
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_run, fieldfile))
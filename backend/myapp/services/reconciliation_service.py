@@ -0,0 +1,351 @@
+import csv
+import io
+import re
+from collections import defaultdict, namedtuple
+from decimal import Decimal, InvalidOperation
+from xml.etree.ElementTree import iterparse
+
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .settlement_service import confirm_payments
+
+
+# ==========================
+# Bank statement reconciliation
+# ==========================
+#
+# A statement is streamed line by line (CSV, MT940 or CAMT.053) and every
+# credit is looked up in an in-memory hash index of PENDING payments. Memory
+# is bounded by the number of pending payments, never by the statement size.
+
+StatementLine = namedtuple('StatementLine', ['line_no', 'amount', 'reference', 'rib', 'text'])
+
+CONFIRM_CHUNK_SIZE = 1000
+INDEX_CHUNK_SIZE = 2000
+
+CSV_COLUMNS = {
+    'reference': ('reference', 'ref', 'communication', 'motif'),
+    'text': ('libelle', 'label', 'description', 'details'),
+    'rib': ('rib', 'iban', 'account', 'compte'),
+    'amount': ('amount', 'montant', 'credit'),
+}
+
+RIB_PATTERN = re.compile(r'\b(?:[A-Z]{2}\d{2}[A-Z0-9 ]{10,30}|\d[\d ]{22,})\b')
+TOKEN_SPLIT = re.compile(r'[^A-Z0-9]+')
+MT940_61 = re.compile(r'^:61:\d{6}(?:\d{4})?(R?[CD])[A-Z]?(\d+(?:,\d*)?)(.*)$')
+
+
+def normalize_reference(value):
+    return re.sub(r'[^A-Z0-9]', '', (value or '').upper())
+
+
+def normalize_rib(value):
+    return re.sub(r'[^A-Z0-9]', '', (value or '').upper())
+
+
+def parse_amount(value):
+    """Parse '1 234,50', '1,234.50' or '1234.50' into a 2-decimal Decimal"""
+    value = (value or '').strip().replace(' ', '').replace(' ', '')
+    if not value:
+        return None
+    if ',' in value and '.' in value:
+        value = value.replace(',', '') if value.rfind('.') > value.rfind(',') else value.replace('.', '').replace(',', '.')
+    else:
+        value = value.replace(',', '.')
+    try:
+        return Decimal(value).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def reference_keys(reference, text=''):
+    """
+    Candidate lookup keys for a statement line: the normalized reference plus
+    runs of up to three adjacent tokens of the free text, so 'VIR BMCE-2394023'
+    still finds a payment referenced 'BMCE2394023'. Keys are yielded lazily so
+    an exact hit stops the scan.
+    """
+    seen = set()
+    if reference:
+        key = normalize_reference(reference)
+        seen.add(key)
+        yield key
+    tokens = TOKEN_SPLIT.split(f'{reference or ""} {text or ""}'.upper())
+    tokens = [t for t in tokens if t]
+    count = len(tokens)
+    for i in range(count):
+        key = tokens[i]
+        for j in range(i + 1, min(i + 3, count) + 1):
+            if j > i + 1:
+                key += tokens[j - 1]
+            if len(key) >= 4 and key not in seen:
+                seen.add(key)
+                yield key
+
+
+def find_rib(text):
+    match = RIB_PATTERN.search((text or '').upper())
+    return normalize_rib(match.group(0)) if match else ''
+
+
+# ==========================
+# Statement parsers
+# ==========================
+
+def detect_format(head):
+    head = head.lstrip()
+    if head.startswith(b'<'):
+        return 'camt'
+    if head.startswith(b'{1:') or b':20:' in head or b':61:' in head:
+        return 'mt940'
+    return 'csv'
+
+
+def _decoded_lines(stream):
+    return io.TextIOWrapper(stream, encoding='utf-8', errors='replace', newline='')
+
+
+def parse_csv(stream):
+    lines = _decoded_lines(stream)
+    sample = lines.readline()
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(lines, dialect)
+    header = [h.strip().lower() for h in next(csv.reader([sample], dialect), [])]
+
+    columns = {}
+    for key, aliases in CSV_COLUMNS.items():
+        for position, name in enumerate(header):
+            if name in aliases:
+                columns[key] = position
+                break
+    if 'amount' not in columns:
+        raise ValueError('CSV statement needs an amount/montant/credit column')
+
+    def cell(row, key):
+        position = columns.get(key)
+        return row[position] if position is not None and position < len(row) else ''
+
+    for line_no, row in enumerate(reader, start=2):
+        amount = parse_amount(cell(row, 'amount'))
+        if amount is None or amount <= 0:
+            continue
+        text = cell(row, 'text')
+        yield StatementLine(
+            line_no,
+            amount,
+            cell(row, 'reference'),
+            normalize_rib(cell(row, 'rib')) or find_rib(text),
+            text
+        )
+
+
+def parse_mt940(stream):
+    current = None
+    for line_no, line in enumerate(_decoded_lines(stream), start=1):
+        line = line.rstrip('\r\n')
+        match = MT940_61.match(line)
+        if match or line.startswith(':62') or line.startswith('-}'):
+            if current:
+                yield current
+            current = None
+        if match:
+            mark, amount, rest = match.groups()
+            if mark == 'C':
+                reference = rest.split('//')[0][4:] if len(rest) > 4 else ''
+                current = StatementLine(line_no, parse_amount(amount), reference, '', '')
+        elif current and not (line.startswith(':') and not line.startswith(':86:')):
+            text = f"{current.text} {line[4:] if line.startswith(':86:') else line}".strip()
+            current = current._replace(text=text, rib=current.rib or find_rib(text))
+    if current:
+        yield current
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _find(elem, *path):
+    for name in path:
+        elem = next((child for child in elem if _local(child.tag) == name), None)
+        if elem is None:
+            return None
+    return elem
+
+
+def parse_camt(stream):
+    line_no = 0
+    for _, elem in iterparse(stream, events=('end',)):
+        if _local(elem.tag) != 'Ntry':
+            continue
+        line_no += 1
+        indicator = _find(elem, 'CdtDbtInd')
+        if indicator is not None and indicator.text == 'CRDT':
+            amount = _find(elem, 'Amt')
+            details = _find(elem, 'NtryDtls', 'TxDtls')
+            reference, text, rib = '', '', ''
+            if details is not None:
+                end_to_end = _find(details, 'Refs', 'EndToEndId')
+                reference = end_to_end.text if end_to_end is not None else ''
+                unstructured = _find(details, 'RmtInf', 'Ustrd')
+                text = unstructured.text if unstructured is not None else ''
+                iban = _find(details, 'RltdPties', 'DbtrAcct', 'Id', 'IBAN')
+                rib = normalize_rib(iban.text) if iban is not None else find_rib(text)
+            yield StatementLine(line_no, parse_amount(amount.text if amount is not None else ''), reference, rib, text or '')
+        elem.clear()
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'mt940': parse_mt940,
+    'camt': parse_camt,
+}
+
+
+def parse_statement(stream, statement_format=None):
+    """Lazily yield credit StatementLines from a binary, seekable stream"""
+    if statement_format is None:
+        statement_format = detect_format(stream.read(512))
+        stream.seek(0)
+    if statement_format not in PARSERS:
+        raise ValueError(f"Unsupported statement format '{statement_format}'")
+    return PARSERS[statement_format](stream)
+
+
+# ==========================
+# Pending payment index
+# ==========================
+
+class PendingIndex:
+    """
+    Hash index of pending payments by normalized reference and by
+    (RIB, amount). Each candidate is [kind, id, amount, reference, rib, open].
+    """
+
+    def __init__(self):
+        self.by_reference = defaultdict(list)
+        self.by_rib_amount = defaultdict(list)
+        self.size = 0
+
+    def add(self, kind, pk, amount, reference, rib):
+        candidate = [kind, pk, amount, normalize_reference(reference), normalize_rib(rib), True]
+        if candidate[3]:
+            self.by_reference[candidate[3]].append(candidate)
+        if candidate[4]:
+            self.by_rib_amount[(candidate[4], amount)].append(candidate)
+        self.size += 1
+
+    def match(self, line):
+        """
+        Return ('exact', candidate), ('reference' | 'rib_amount', candidate)
+        for a fuzzy suggestion, or (None, None). Exact matches are consumed so
+        a payment is never confirmed twice.
+        """
+        fuzzy = None
+        for key in reference_keys(line.reference, line.text):
+            for candidate in self.by_reference.get(key, ()):
+                if not candidate[5]:
+                    continue
+                if candidate[2] == line.amount and not (line.rib and candidate[4] and line.rib != candidate[4]):
+                    candidate[5] = False
+                    return 'exact', candidate
+                fuzzy = fuzzy or ('reference', candidate)
+        if fuzzy:
+            return fuzzy
+        if line.rib:
+            for candidate in self.by_rib_amount.get((line.rib, line.amount), ()):
+                if candidate[5]:
+                    return 'rib_amount', candidate
+        return None, None
+
+
+def build_index(resident_payments=None, payments=None):
+    index = PendingIndex()
+    if resident_payments is not None:
+        rows = resident_payments.filter(status='PENDING').values_list('id', 'amount', 'reference', 'rib')
+        for pk, amount, reference, rib in rows.iterator(chunk_size=INDEX_CHUNK_SIZE):
+            index.add('resident_payment', pk, amount, reference, rib)
+    if payments is not None:
+        rows = payments.filter(status='PENDING').values_list('id', 'amount', 'reference', 'rib')
+        for pk, amount, reference, rib in rows.iterator(chunk_size=INDEX_CHUNK_SIZE):
+            index.add('payment', pk, amount, reference, rib)
+    return index
+
+
+# ==========================
+# Reconciliation
+# ==========================
+
+def _chunks(ids, size):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def _line_summary(line):
+    return {
+        'line': line.line_no,
+        'amount': str(line.amount),
+        'reference': line.reference,
+        'rib': line.rib,
+        'text': line.text[:200],
+    }
+
+
+def reconcile_statement(stream, resident_payments=None, payments=None,
+                        statement_format=None, auto_confirm=True, review_limit=500):
+    """
+    Match a bank statement against pending payments in one pass.
+
+    Exact matches (reference and amount, RIB agreeing when both are known)
+    are confirmed: resident payments through the settlement service, syndic
+    subscription payments by marking them COMPLETED. Fuzzy matches are
+    returned for manual review and left untouched.
+    """
+    index = build_index(resident_payments, payments)
+    exact = {'resident_payment': [], 'payment': []}
+    review = []
+    counts = {'lines': 0, 'exact': 0, 'review': 0, 'unmatched': 0}
+
+    for line in parse_statement(stream, statement_format):
+        counts['lines'] += 1
+        if line.amount is None:
+            counts['unmatched'] += 1
+            continue
+        kind, candidate = index.match(line)
+        if kind == 'exact':
+            counts['exact'] += 1
+            exact[candidate[0]].append(candidate[1])
+        elif kind:
+            counts['review'] += 1
+            if len(review) < review_limit:
+                review.append({
+                    **_line_summary(line),
+                    'match': kind,
+                    'payment_type': candidate[0],
+                    'payment_id': candidate[1],
+                    'expected_amount': str(candidate[2]),
+                })
+        else:
+            counts['unmatched'] += 1
+
+    if auto_confirm:
+        if exact['resident_payment']:
+            for ids in _chunks(exact['resident_payment'], CONFIRM_CHUNK_SIZE):
+                confirm_payments(resident_payments, ids)
+        if exact['payment']:
+            note = f"\nReconciled from bank statement on {timezone.now().date()}"
+            for ids in _chunks(exact['payment'], CONFIRM_CHUNK_SIZE):
+                payments.filter(pk__in=ids, status='PENDING').update(
+                    status='COMPLETED',
+                    notes=Concat(F('notes'), Value(note))
+                )
+
+    return {
+        'summary': {**counts, 'pending_indexed': index.size, 'confirmed': auto_confirm},
+        'matched': exact,
+        'review': review,
+    }
@@ -0,0 +1,257 @@
+from decimal import Decimal
+
+from django.db import router, transaction
+from django.db.models import (
+    Case, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from ..models import Charge, ResidentPayment
+from .ledger_service import post_payments
+
+
+# ==========================
+# Charge settlement
+# ==========================
+#
+# Every write to Charge.paid_amount / status / paid_date goes through this
+# module. paid_amount only ever reflects CONFIRMED payments; PENDING ones are
+# tracked on ResidentPayment until the syndic confirms them.
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+
+def _settlement_fields(paid):
+    """
+    UPDATE kwargs deriving status and paid_date from a paid-amount expression.
+    All expressions are evaluated against the row's pre-update values, so the
+    three columns are always written consistently in a single statement.
+    """
+    today = timezone.now().date()
+    return {
+        'paid_amount': paid,
+        'status': Case(
+            When(amount__lte=paid, then=Value('PAID')),
+            When(GreaterThan(paid, Value(Decimal('0'))), then=Value('PARTIALLY_PAID')),
+            # Nothing paid: a charge flagged overdue stays so while past due
+            When(status='OVERDUE', due_date__lt=today, then=Value('OVERDUE')),
+            default=Value('UNPAID'),
+        ),
+        'paid_date': Case(
+            When(amount__lte=paid, then=Coalesce(F('paid_date'), Value(today))),
+            default=Value(None),
+        ),
+        # queryset.update() skips auto_now; list ETags rely on it
+        'updated_at': timezone.now(),
+    }
+
+
+def settled_state(amount, paid, paid_date=None):
+    """Python mirror of _settlement_fields: (status, paid_date) for a paid amount"""
+    if paid >= amount:
+        return 'PAID', paid_date or timezone.now().date()
+    if paid > 0:
+        return 'PARTIALLY_PAID', None
+    return 'UNPAID', None
+
+
+def confirmed_total_subquery():
+    """Correlated subquery: sum of CONFIRMED payments for the outer charge"""
+    totals = ResidentPayment.objects.filter(
+        charge=OuterRef('pk'),
+        status='CONFIRMED'
+    ).order_by().values('charge').annotate(total=Sum('amount')).values('total')
+    return Coalesce(Subquery(totals, output_field=MONEY), Value(Decimal('0')), output_field=MONEY)
+
+
+def pending_total(charge):
+    return ResidentPayment.objects.filter(
+        charge=charge,
+        status='PENDING'
+    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+
+
+def submit_payment(charge_id, resident, payment_method, reference=None):
+    """
+    Record a PENDING payment for the remaining balance of a charge.
+
+    The charge row is locked so two concurrent submissions cannot both claim
+    the same remaining amount. paid_amount is left untouched until confirmation.
+    """
+    with transaction.atomic(using=router.db_for_write(Charge)):
+        charge = Charge.objects.select_for_update().select_related(
+            'appartement__immeuble'
+        ).get(pk=charge_id)
+
+        if charge.status == 'PAID':
+            raise ValueError('This charge is already paid')
+
+        amount = charge.amount - charge.paid_amount - pending_total(charge)
+        if amount <= 0:
+            raise ValueError('No remaining amount to pay')
+
+        return ResidentPayment.objects.create(
+            resident=resident,
+            syndic=charge.appartement.immeuble.syndic,
+            appartement=charge.appartement,
+            charge=charge,
+            amount=amount,
+            payment_method=payment_method,
+            reference=reference,
+            paid_at=timezone.now(),
+            status='PENDING',
+            notes=''
+        )
+
+
+def confirm_payment(payment):
+    """
+    Confirm a PENDING payment and apply its amount to the charge.
+
+    The status flip is a conditional UPDATE, so a payment can only ever be
+    applied once; the charge is then adjusted with F() arithmetic in a single
+    UPDATE. Returns the refreshed charge.
+    """
+    with transaction.atomic(using=router.db_for_write(Charge)):
+        updated = ResidentPayment.objects.filter(
+            pk=payment.pk,
+            status='PENDING'
+        ).update(status='CONFIRMED', confirmed_at=timezone.now())
+        if not updated:
+            raise ValueError('Only pending payments can be confirmed')
+
+        paid = ExpressionWrapper(F('paid_amount') + Value(payment.amount), output_field=MONEY)
+        Charge.objects.filter(pk=payment.charge_id).update(**_settlement_fields(paid))
+        post_payments('PAYMENT_CONFIRMED', [payment])
+
+    payment.refresh_from_db(fields=['status', 'confirmed_at'])
+    return Charge.objects.get(pk=payment.charge_id)
+
+
+def reverse_payment(payment):
+    """
+    Reverse a CONFIRMED payment (e.g. a bounced transfer): the payment goes
+    back to REJECTED, its amount is taken off the charge and a reversal is
+    posted to the ledger. Returns the refreshed charge.
+    """
+    with transaction.atomic(using=router.db_for_write(Charge)):
+        updated = ResidentPayment.objects.filter(
+            pk=payment.pk,
+            status='CONFIRMED'
+        ).update(status='REJECTED')
+        if not updated:
+            raise ValueError('Only confirmed payments can be reversed')
+
+        paid = ExpressionWrapper(F('paid_amount') - Value(payment.amount), output_field=MONEY)
+        Charge.objects.filter(pk=payment.charge_id).update(**_settlement_fields(paid))
+        post_payments('PAYMENT_REVERSED', [payment])
+
+    payment.refresh_from_db(fields=['status'])
+    return Charge.objects.get(pk=payment.charge_id)
+
+
+def reject_payment(payment):
+    """
+    Reject a PENDING payment. Pending amounts are never counted in
+    paid_amount, so the charge itself does not change.
+    """
+    updated = ResidentPayment.objects.filter(
+        pk=payment.pk,
+        status='PENDING'
+    ).update(status='REJECTED', confirmed_at=timezone.now())
+    if not updated:
+        raise ValueError('Only pending payments can be rejected')
+
+    payment.refresh_from_db(fields=['status', 'confirmed_at'])
+    return payment
+
+
+def recalculate_charges(charges):
+    """
+    Recompute paid_amount/status/paid_date from CONFIRMED payments for every
+    charge in the queryset, in one UPDATE.
+    """
+    return charges.update(**_settlement_fields(confirmed_total_subquery()))
+
+
+# ==========================
+# Bulk settlement
+# ==========================
+
+BULK_STATUS_MESSAGES = {
+    'CONFIRMED': ('Payment confirmed', 'Only pending payments can be confirmed'),
+    'REJECTED': ('Payment rejected', 'Only pending payments can be rejected'),
+}
+
+
+def _settle_payments(payments, payment_ids, new_status):
+    """
+    Move many PENDING payments to new_status at once.
+
+    The rows are locked with one SELECT ... FOR UPDATE, flipped with one
+    UPDATE ... WHERE id IN, and (for confirmations) every affected charge is
+    recomputed once by recalculate_charges and the ledger entries are
+    bulk-inserted. Returns one result per requested id.
+    """
+    success_message, pending_message = BULK_STATUS_MESSAGES[new_status]
+
+    with transaction.atomic(using=router.db_for_write(Charge)):
+        rows = {
+            row['id']: row
+            for row in payments.select_for_update().filter(
+                pk__in=payment_ids
+            ).values('id', 'status', 'charge_id', 'appartement_id', 'amount')
+        }
+        pending_ids = [pk for pk, row in rows.items() if row['status'] == 'PENDING']
+
+        if pending_ids:
+            ResidentPayment.objects.filter(pk__in=pending_ids).update(
+                status=new_status,
+                confirmed_at=timezone.now()
+            )
+
+        charge_ids = {rows[pk]['charge_id'] for pk in pending_ids}
+        charge_statuses = {}
+        if charge_ids and new_status == 'CONFIRMED':
+            charges = Charge.objects.filter(pk__in=charge_ids)
+            recalculate_charges(charges)
+            post_payments('PAYMENT_CONFIRMED', [rows[pk] for pk in pending_ids])
+            charge_statuses = dict(charges.values_list('id', 'status'))
+
+    pending = set(pending_ids)
+    results = []
+    for pk in payment_ids:
+        row = rows.get(pk)
+        if row is None:
+            results.append({'payment_id': pk, 'success': False, 'message': 'Payment not found'})
+        elif pk not in pending:
+            results.append({
+                'payment_id': pk,
+                'success': False,
+                'payment_status': row['status'],
+                'message': pending_message,
+            })
+        else:
+            result = {
+                'payment_id': pk,
+                'success': True,
+                'payment_status': new_status,
+                'charge_id': row['charge_id'],
+                'message': success_message,
+            }
+            if new_status == 'CONFIRMED':
+                result['charge_status'] = charge_statuses.get(row['charge_id'])
+            results.append(result)
+    return results
+
+
+def confirm_payments(payments, payment_ids):
+    """Bulk confirm the given ids, restricted to the `payments` queryset"""
+    return _settle_payments(payments, payment_ids, 'CONFIRMED')
+
+
+def reject_payments(payments, payment_ids):
+    """Bulk reject the given ids, restricted to the `payments` queryset"""
+    return _settle_payments(payments, payment_ids, 'REJECTED')
@@ -0,0 +1,220 @@
+import time
+
+from django.db import connections, transaction
+from django.db.models import Max
+
+from ..models import (
+    Appartement, ArchivedCharge, ArchivedReclamation, ArchivedReclamationStatusHistory,
+    ArchivedResidentPayment, BalanceSnapshot, Charge, Immeuble, LedgerEntry, Reclamation,
+    ReclamationStatusHistory, ResidentPayment, Reunion, SyndicShard, User,
+)
+from ..sharding import SHARD_CACHE_SECONDS, forget_tenant, id_range, shards
+
+
+# ==========================
+# Moving syndics between shards
+# ==========================
+#
+# move_syndic() makes the syndic read-only (ShardMiddleware answers writes
+# with 503), waits for in-flight writes, copies every row with plain
+# multi-row INSERTs that keep primary keys and timestamps, switches the shard
+# map and finally deletes the rows from the source. The copy runs in one
+# transaction on the target, so a failed move leaves the target untouched.
+#
+# Primary keys are kept, so each shard allocates tenant ids in its own block
+# (sharding.id_range): the target's counters are moved into its block before
+# the copy and are not touched by it. SQLite and MySQL continue counting
+# after the largest id in a table, so there rows from a higher block cannot
+# be moved onto a lower shard; PostgreSQL sequences ignore copied ids.
+#
+# Reads may use a shard map cached before the switch for up to
+# SHARD_CACHE_SECONDS (writes always check the database), so the source rows
+# are kept, read-only in effect, for that long before being deleted.
+
+MOVE_BATCH_SIZE = 1000
+MOVE_GRACE_SECONDS = 2.0
+
+
+def tenant_querysets(syndic_id, alias):
+    """Every row of a syndic's data on `alias`, parents first"""
+    rows = {'appartement__immeuble__syndic_id': syndic_id}
+    return [
+        Immeuble.objects.using(alias).filter(syndic_id=syndic_id),
+        Appartement.objects.using(alias).filter(immeuble__syndic_id=syndic_id),
+        Reunion.objects.using(alias).filter(immeuble__syndic_id=syndic_id),
+        Charge.objects.using(alias).filter(**rows),
+        ResidentPayment.objects.using(alias).filter(**rows),
+        Reclamation.objects.using(alias).filter(**rows),
+        ReclamationStatusHistory.objects.using(alias).filter(reclamation__appartement__immeuble__syndic_id=syndic_id),
+        LedgerEntry.objects.using(alias).filter(**rows),
+        BalanceSnapshot.objects.using(alias).filter(**rows),
+        ArchivedCharge.objects.using(alias).filter(**rows),
+        ArchivedResidentPayment.objects.using(alias).filter(**rows),
+        ArchivedReclamation.objects.using(alias).filter(**rows),
+        ArchivedReclamationStatusHistory.objects.using(alias).filter(
+            reclamation__appartement__immeuble__syndic_id=syndic_id
+        ),
+    ]
+
+
+def insert_rows(model, objs, alias):
+    """INSERT model instances into `alias` as they are (primary keys and auto_now fields kept)"""
+    connection = connections[alias]
+    fields = model._meta.concrete_fields
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    rows = [[field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields] for obj in objs]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def copy_rows(queryset, alias, batch_size=MOVE_BATCH_SIZE):
+    """Copy every row of `queryset` into `alias`; returns the number of rows"""
+    copied, batch = 0, []
+    for obj in queryset.order_by('pk').iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) == batch_size:
+            insert_rows(queryset.model, batch, alias)
+            copied, batch = copied + len(batch), []
+    if batch:
+        insert_rows(queryset.model, batch, alias)
+        copied += len(batch)
+    return copied
+
+
+def mirror_users(alias, user_ids, batch_size=MOVE_BATCH_SIZE):
+    """Copy (or refresh) users from 'default' onto a shard, with the syndics that created them"""
+    user_ids = set(user_ids)
+    users = list(User.objects.using('default').filter(pk__in=user_ids))
+    creators = {user.created_by_syndic_id for user in users} - user_ids - {None}
+    users += User.objects.using('default').filter(pk__in=creators)
+
+    connection = connections[alias]
+    table = connection.ops.quote_name(User._meta.db_table)
+    with transaction.atomic(using=alias):
+        for start in range(0, len(users), batch_size):
+            batch = users[start:start + batch_size]
+            ids = [user.pk for user in batch]
+            # Foreign keys are checked at commit, so rows pointing at these
+            # users are fine while they are replaced
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(ids))})', ids)
+            insert_rows(User, batch, alias)
+
+
+def _referenced_users(syndic_id, querysets):
+    user_ids = {syndic_id}
+    user_ids.update(User.objects.using('default').filter(created_by_syndic_id=syndic_id).values_list('pk', flat=True))
+    columns = {
+        Appartement: ['resident_id'],
+        Reunion: ['syndic_id'],
+        ResidentPayment: ['resident_id', 'syndic_id'],
+        Reclamation: ['resident_id', 'syndic_id'],
+        ReclamationStatusHistory: ['changed_by_id'],
+        ArchivedResidentPayment: ['resident_id', 'syndic_id'],
+        ArchivedReclamation: ['resident_id', 'syndic_id'],
+        ArchivedReclamationStatusHistory: ['changed_by_id'],
+    }
+    for queryset in querysets:
+        fields = columns.get(queryset.model)
+        if fields:
+            for row in queryset.order_by().values_list(*fields).distinct():
+                user_ids.update(row)
+    user_ids.discard(None)
+    return user_ids
+
+
+def reserve_id_range(alias, models):
+    """
+    Make the tables of `models` on `alias` allocate ids inside its
+    id_range(). Idempotent: counters already in (or past) the block are left
+    alone.
+    """
+    first, _ = id_range(alias)
+    connection = connections[alias]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model in models:
+            table = model._meta.db_table
+            if connection.vendor == 'sqlite':
+                # Tables declared AUTOINCREMENT count from sqlite_sequence
+                cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, first])
+                elif row[0] < first:
+                    cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [first, table])
+            elif connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, model._meta.pk.column])
+                sequence = cursor.fetchone()[0]
+                cursor.execute(f'SELECT last_value FROM {sequence}')
+                if cursor.fetchone()[0] < first:
+                    cursor.execute('SELECT setval(%s, %s)', [sequence, first])
+            elif connection.vendor == 'mysql':
+                # Ignored by MySQL when the table already holds larger ids
+                cursor.execute(f'ALTER TABLE {quote(table)} AUTO_INCREMENT = {first + 1}')
+
+
+def _check_id_range(querysets, target):
+    """Refuse rows whose ids would push the target's counters out of its block"""
+    if connections[target].vendor == 'postgresql':
+        return
+    _, end = id_range(target)
+    for queryset in querysets:
+        largest = queryset.aggregate(largest=Max('pk'))['largest']
+        if largest is not None and largest >= end:
+            raise ValueError(
+                f'{queryset.model.__name__} {largest} is past the id range of {target}; '
+                f'{connections[target].vendor} would allocate new ids after it'
+            )
+
+
+def _set_shard(syndic_id, alias, read_only):
+    SyndicShard.objects.using('default').update_or_create(
+        syndic_id=syndic_id, defaults={'alias': alias, 'read_only': read_only}
+    )
+    forget_tenant(syndic_id)
+
+
+def move_syndic(syndic_id, target, batch_size=MOVE_BATCH_SIZE, grace=MOVE_GRACE_SECONDS,
+                source_delay=SHARD_CACHE_SECONDS):
+    """
+    Move a syndic's buildings and everything under them to the `target`
+    shard. Returns {model name: rows moved}.
+    """
+    if target not in shards():
+        raise ValueError(f'{target} is not one of DATABASE_SHARDS ({", ".join(shards())})')
+    if not User.objects.using('default').filter(pk=syndic_id, role='SYNDIC').exists():
+        raise ValueError(f'No syndic with id {syndic_id}')
+    source = SyndicShard.objects.using('default').filter(
+        syndic_id=syndic_id
+    ).values_list('alias', flat=True).first() or 'default'
+    if source == target:
+        raise ValueError(f'Syndic {syndic_id} is already on {target}')
+
+    _set_shard(syndic_id, source, read_only=True)
+    # Let writes admitted before the flag was set finish
+    time.sleep(grace)
+
+    sources = tenant_querysets(syndic_id, source)
+    try:
+        _check_id_range(sources, target)
+        with transaction.atomic(using=target):
+            reserve_id_range(target, [queryset.model for queryset in sources])
+            mirror_users(target, _referenced_users(syndic_id, sources), batch_size)
+            moved = {queryset.model.__name__: copy_rows(queryset, target, batch_size) for queryset in sources}
+    except Exception:
+        _set_shard(syndic_id, source, read_only=False)
+        raise
+
+    _set_shard(syndic_id, target, read_only=False)
+    # Let cached shard map entries pointing at the source expire
+    time.sleep(source_delay)
+    # Deleting the buildings cascades to everything else
+    with transaction.atomic(using=source):
+        Immeuble.objects.using(source).filter(syndic_id=syndic_id).delete()
+    return moved
@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================
+# Token blacklist maintenance
+# ==========================
+#
+# Every refresh rotates the refresh token and blacklists the old one, so the
+# token_blacklist tables grow by two rows per refresh. purge_expired_tokens()
+# deletes expired outstanding tokens (and their blacklist rows) in small
+# batches; run it periodically (`manage.py purge_tokens`, e.g. hourly cron).
+#
+# Revocation checks go through a per-process Bloom filter of the revoked,
+# unexpired JTIs. A JTI the filter has never seen is not revoked and needs no
+# query; only filter hits (revoked tokens and ~1% false positives) are
+# confirmed against the database. The filter picks up new blacklist rows
+# every TOKEN_REVOCATION_SYNC_INTERVAL seconds (one indexed id > last query),
+# so a token revoked by another worker may still refresh within that window;
+# revocations made by this process are visible immediately. The full filter
+# is rebuilt off-request every TOKEN_REVOCATION_REBUILD_INTERVAL seconds to
+# drop expired JTIs; until the first build is ready, checks use the database.
+
+PURGE_BATCH_SIZE = 5000
+# Blacklist ids are not always committed in id order (concurrent inserts);
+# each sync re-reads this many ids below the last one seen
+SYNC_OVERLAP = 200
+
+
+def purge_expired_tokens(batch_size=PURGE_BATCH_SIZE, now=None):
+    """Delete expired outstanding tokens and their blacklist entries; returns the number of tokens deleted"""
+    now = now or timezone.now()
+    expired = OutstandingToken.objects.filter(expires_at__lte=now).order_by('pk').values_list('pk', flat=True)
+    table = connection.ops.quote_name(OutstandingToken._meta.db_table)
+    deleted = 0
+    while True:
+        # One short transaction per batch, so logins and refreshes are never
+        # blocked behind the whole purge
+        with transaction.atomic():
+            ids = list(expired[:batch_size])
+            if not ids:
+                return deleted
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            # QuerySet.delete() would first load every token (JWT text
+            # included) to collect cascades; the blacklist rows are gone already
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(ids))})', ids)
+        deleted += len(ids)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1024)
+        self.size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevokedTokens:
+    """Bloom filter of revoked, unexpired JTIs, synced incrementally from BlacklistedToken"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.filter = None
+        self.last_id = 0
+        self.synced_at = 0.0
+        self.built_at = 0.0
+        self.rebuilding = False
+
+    def _sync_interval(self):
+        return getattr(settings, 'TOKEN_REVOCATION_SYNC_INTERVAL', 1.0)
+
+    def _rebuild_interval(self):
+        return getattr(settings, 'TOKEN_REVOCATION_REBUILD_INTERVAL', 3600.0)
+
+    def rebuild(self):
+        """Build a filter sized for the current blacklist (expired entries are left out)"""
+        revoked = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        last_id = BlacklistedToken.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        # Room to grow until the next rebuild
+        bloom = BloomFilter(capacity=revoked.count() * 2)
+        for jti in revoked.filter(pk__lte=last_id).values_list('token__jti', flat=True).iterator(chunk_size=10000):
+            bloom.add(jti)
+        with self.lock:
+            self.filter, self.last_id = bloom, last_id
+            self.built_at = time.monotonic()
+            # Catch up right away with what was revoked during the build
+            self.synced_at = 0.0
+
+    def sync(self):
+        """Add blacklist rows created since the last sync"""
+        rows = BlacklistedToken.objects.filter(
+            pk__gt=self.last_id - SYNC_OVERLAP
+        ).order_by('pk').values_list('pk', 'token__jti')
+        for pk, jti in rows.iterator(chunk_size=10000):
+            if jti not in self.filter:
+                self.filter.add(jti)
+            self.last_id = max(self.last_id, pk)
+        self.synced_at = time.monotonic()
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Revoked token filter rebuild failed")
+        finally:
+            self.rebuilding = False
+            close_old_connections()
+
+    def _refresh(self):
+        now = time.monotonic()
+        stale = self.filter is None or now - self.built_at >= self._rebuild_interval() \
+            or self.filter.count > self.filter.capacity
+        if stale and not self.rebuilding:
+            # Built off-request: it reads every unexpired blacklist row
+            with self.lock:
+                start, self.rebuilding = not self.rebuilding, True
+            if start:
+                threading.Thread(target=self._rebuild_in_background, name='revoked-tokens', daemon=True).start()
+
+        if self.filter is not None and now - self.synced_at >= self._sync_interval():
+            with self.lock:
+                if time.monotonic() - self.synced_at >= self._sync_interval():
+                    self.sync()
+
+    def add(self, jti):
+        with self.lock:
+            if self.filter is not None:
+                self.filter.add(jti)
+
+    def is_revoked(self, jti):
+        self._refresh()
+        bloom = self.filter
+        if bloom is not None and jti not in bloom:
+            return False
+        # Filter hit, or no filter yet
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    def reset(self):
+        with self.lock:
+            self.filter = None
+            self.last_id = 0
+
+
+revoked_tokens = RevokedTokens()
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import tempfile
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Payment, ResidentPayment, UploadSession
+from ..storage import proof_storage
+
+
+# ==========================
+# Resumable proof uploads
+# ==========================
+#
+# A chunk is first streamed to its own temp file (no DB lock held while the
+# client is sending), then appended to the session file under a row lock if
+# its offset is the session's current `received`. A retry after a dropped
+# connection simply resends from the offset returned by the server.
+
+COPY_BUFFER = 64 * 1024
+UPLOAD_TARGETS = {
+    'payment': (Payment, ''),
+    'resident_payment': (ResidentPayment, 'resident_payment_proofs/'),
+}
+
+# Running SHA-256 per session, so completing does not re-read the file.
+# Process-local: another worker (or a restart) rebuilds it from the file.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class OffsetMismatch(ValueError):
+    def __init__(self, expected):
+        super().__init__(f'Chunk must start at offset {expected}')
+        self.expected = expected
+
+
+def max_upload_size():
+    return getattr(settings, 'PROOF_UPLOAD_MAX_SIZE', 50 * 1024 * 1024)
+
+
+def max_chunk_size():
+    return getattr(settings, 'PROOF_UPLOAD_MAX_CHUNK', 8 * 1024 * 1024)
+
+
+def _part_path(session):
+    return os.path.join(proof_storage().tmp_dir(), f'upload-{session.pk}.part')
+
+
+def _hasher_at(session, offset):
+    with _hashers_lock:
+        cached = _hashers.get(session.pk)
+    if cached and cached[0] == offset:
+        # A copy: a failed append must not leave the cached state advanced
+        return cached[1].copy()
+
+    hasher = hashlib.sha256()
+    remaining = offset
+    with open(_part_path(session), 'rb') as f:
+        while remaining:
+            data = f.read(min(COPY_BUFFER, remaining))
+            if not data:
+                break
+            hasher.update(data)
+            remaining -= len(data)
+    return hasher
+
+
+def start_upload(user, filename, size):
+    if size <= 0:
+        raise ValueError('Upload size must be positive')
+    if size > max_upload_size():
+        raise ValueError(f'File too large (max {max_upload_size()} bytes)')
+
+    session = UploadSession.objects.create(user=user, filename=os.path.basename(filename)[:255], size=size)
+    open(_part_path(session), 'wb').close()
+    return session
+
+
+def append_chunk(session_id, user, offset, stream, length):
+    """
+    Append `length` bytes read from `stream` at `offset`. Raises OffsetMismatch
+    when the offset is not where the session currently stands (duplicate or
+    out-of-order chunk). Returns the updated session.
+    """
+    if length <= 0 or length > max_chunk_size():
+        raise ValueError(f'Chunk size must be between 1 and {max_chunk_size()} bytes')
+
+    fd, chunk_path = tempfile.mkstemp(dir=proof_storage().tmp_dir())
+    try:
+        with os.fdopen(fd, 'wb') as chunk:
+            remaining = length
+            while remaining:
+                data = stream.read(min(COPY_BUFFER, remaining))
+                if not data:
+                    raise ValueError('Chunk body is shorter than its Content-Length')
+                chunk.write(data)
+                remaining -= len(data)
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session_id, user=user)
+            if session.status != 'ACTIVE':
+                raise ValueError('Upload already completed')
+            if offset != session.received:
+                raise OffsetMismatch(session.received)
+            if offset + length > session.size:
+                raise ValueError('Chunk goes past the declared upload size')
+
+            hasher = _hasher_at(session, offset)
+            with open(chunk_path, 'rb') as chunk, open(_part_path(session), 'r+b') as part:
+                part.seek(offset)
+                for data in iter(lambda: chunk.read(COPY_BUFFER), b''):
+                    hasher.update(data)
+                    part.write(data)
+                part.truncate()
+
+            session.received = offset + length
+            session.save(update_fields=['received', 'updated_at'])
+            with _hashers_lock:
+                _hashers[session.pk] = (session.received, hasher)
+        return session
+    finally:
+        os.remove(chunk_path)
+
+
+def _target_queryset(user, target):
+    model = UPLOAD_TARGETS[target][0]
+    payments = model.objects.all()
+    if user.is_admin:
+        return payments
+    # Owners may only swap the proof of a payment that is still being reviewed
+    payments = payments.filter(status='PENDING')
+    if model is Payment:
+        return payments.filter(subscription__syndic_profile__user=user)
+    return payments.filter(resident=user) | payments.filter(syndic=user)
+
+
+def complete_upload(session_id, user, target=None, payment_id=None, sha256=None):
+    """
+    Move the finished upload into proof storage and, when a target payment
+    is given, attach it as that payment's proof. Returns (session, payment).
+    """
+    if target is not None and target not in UPLOAD_TARGETS:
+        raise ValueError(f"Unknown upload target '{target}'")
+
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session_id, user=user)
+
+        payment = None
+        if target and payment_id is not None:
+            payment = _target_queryset(user, target).filter(pk=payment_id).first()
+            if payment is None:
+                raise ValueError('Payment not found')
+
+        if session.status == 'ACTIVE':
+            if session.received != session.size:
+                raise OffsetMismatch(session.received)
+
+            digest = _hasher_at(session, session.received).hexdigest()
+            if sha256 and sha256.lower() != digest:
+                raise ValueError('Checksum mismatch: upload is corrupted, start again')
+
+            prefix = UPLOAD_TARGETS[target][1] if target else ''
+            session.file_name = proof_storage().commit_hashed(
+                prefix + session.filename, _part_path(session), digest
+            )
+            session.sha256 = digest
+            session.status = 'COMPLETED'
+            session.save(update_fields=['file_name', 'sha256', 'status', 'updated_at'])
+            with _hashers_lock:
+                _hashers.pop(session.pk, None)
+
+        if payment is not None:
+            payment.payment_proof.name = session.file_name
+            payment.save(update_fields=['payment_proof'])
+
+    return session, payment
+
+
+def purge_stale_uploads(max_age=timedelta(hours=24)):
+    """Delete unfinished sessions (and their temp files) older than max_age"""
+    stale = UploadSession.objects.filter(status='ACTIVE', updated_at__lt=timezone.now() - max_age)
+    count = 0
+    for session in stale.iterator():
+        try:
+            os.remove(_part_path(session))
+        except FileNotFoundError:
+            pass
+        with _hashers_lock:
+            _hashers.pop(session.pk, None)
+        count += 1
+    stale.delete()
+    return count
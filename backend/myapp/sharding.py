@@ -0,0 +1,272 @@
+import contextlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from rest_framework.permissions import SAFE_METHODS
+
+from .admission import tenant_id
+from .throttling import throttle_cache
+
+
+# ==========================
+# Tenant shards
+# ==========================
+#
+# A syndic's data (buildings and everything under them) lives on one of
+# DATABASE_SHARDS, as recorded in SyndicShard; syndics without a row live on
+# 'default'. Users, profiles, subscriptions, plans and tokens are global and
+# stay on 'default'. ShardMiddleware resolves the shard of the requesting user
+# (the syndic, or the syndic who created the resident) and ShardRouter sends
+# the tenant models there for the rest of the request; transactions around
+# tenant writes use `router.db_for_write(<tenant model>)`.
+#
+# Each shard keeps a copy of the users its rows point at, refreshed on every
+# save (see signals.py), so foreign keys and joins to users work on the shard.
+# Global rows reached from a shard row (charge.appartement.resident) are still
+# read from 'default'. `move_syndic` moves a syndic between shards; admin-wide
+# aggregates run on every shard at once with fan_out() and are merged.
+#
+# Reads use the shard map cached in the shared cache for SHARD_CACHE_SECONDS,
+# which must therefore be shared by every worker (see checks.py); writes look
+# the map up in the database, so they never land on a shard being moved away.
+
+TENANT_MODELS = {
+    'immeuble', 'appartement', 'reunion', 'charge', 'residentpayment',
+    'reclamation', 'reclamationstatushistory', 'ledgerentry', 'balancesnapshot',
+    'archivedcharge', 'archivedresidentpayment', 'archivedreclamation', 'archivedreclamationstatushistory',
+}
+SHARD_KEY = 'shard:user:{user_id}'
+SHARD_CACHE_SECONDS = 300
+SHARD_ID_BLOCK = 10 ** 12
+
+_shard_alias = contextvars.ContextVar('shard_alias', default=None)
+
+
+def shards():
+    return getattr(settings, 'DATABASE_SHARDS', None) or ['default']
+
+
+def sharding_enabled():
+    return len(shards()) > 1
+
+
+def is_tenant_model(model):
+    return model._meta.app_label == 'myapp' and model._meta.model_name in TENANT_MODELS
+
+
+def tenant_syndic_id(user_id):
+    """Syndic whose data the user works on: itself for a syndic, its creator for a resident"""
+    from .models import User
+
+    row = User.objects.using('default').filter(pk=user_id).values('role', 'created_by_syndic_id').first()
+    if row is None:
+        return None
+    if row['role'] == 'SYNDIC':
+        return user_id
+    if row['role'] == 'RESIDENT':
+        return row['created_by_syndic_id']
+    return None
+
+
+def resolve_shard(user_id):
+    """(alias, read_only) of the user's tenant, from the database; refreshes the cached entry"""
+    from .models import SyndicShard
+
+    syndic_id = tenant_syndic_id(user_id)
+    entry = None
+    if syndic_id is not None:
+        entry = SyndicShard.objects.using('default').filter(
+            syndic_id=syndic_id
+        ).values_list('alias', 'read_only').first()
+    shard = tuple(entry) if entry else ('default', False)
+    throttle_cache().set(SHARD_KEY.format(user_id=user_id), shard, SHARD_CACHE_SECONDS)
+    return shard
+
+
+def shard_for_user(user_id):
+    """(alias, read_only) of the user's tenant, cached in the shared cache"""
+    cached = throttle_cache().get(SHARD_KEY.format(user_id=user_id))
+    if cached is not None:
+        return tuple(cached)
+    return resolve_shard(user_id)
+
+
+def forget_tenant(syndic_id):
+    """Drop the cached shard of a syndic and of its residents"""
+    from .models import User
+
+    user_ids = [syndic_id, *User.objects.using('default').filter(
+        created_by_syndic_id=syndic_id
+    ).values_list('pk', flat=True)]
+    throttle_cache().delete_many([SHARD_KEY.format(user_id=user_id) for user_id in user_ids])
+
+
+def tenant_db(syndic_id):
+    """Alias for .using() on a syndic's data; None on 'default', so the usual routing applies"""
+    if not sharding_enabled():
+        return None
+    alias, _ = shard_for_user(syndic_id)
+    return None if alias == 'default' else alias
+
+
+@contextlib.contextmanager
+def using_shard(alias):
+    """Route tenant models to `alias` inside the block (scripts, commands)"""
+    token = _shard_alias.set(alias)
+    try:
+        yield
+    finally:
+        _shard_alias.reset(token)
+
+
+def fan_out(query):
+    """
+    Run query(alias) on every shard concurrently; returns the results in
+    DATABASE_SHARDS order. Unsharded, query(None) runs inline so replica
+    routing still applies.
+    """
+    aliases = shards()
+    if len(aliases) == 1:
+        return [query(None)]
+
+    def run(alias):
+        try:
+            return query(alias)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=len(aliases), thread_name_prefix='shard-fan-out') as pool:
+        return list(pool.map(run, aliases))
+
+
+def id_range(alias):
+    """
+    [first, end) of the ids `alias` allocates for tenant rows. Rows keep their
+    ids when they move, so every shard counts in its own block of
+    SHARD_ID_BLOCK ids, chosen by its position in DATABASE_SHARDS (add new
+    shards at the end). See shard_service.reserve_id_range.
+    """
+    block = getattr(settings, 'SHARD_ID_BLOCK', SHARD_ID_BLOCK)
+    index = shards().index(alias)
+    return index * block, (index + 1) * block
+
+
+def shards_of(model, pks):
+    """
+    {pk: alias} of the shard holding each tenant row found. For admin
+    requests, which are routed to 'default'. Raises ValueError for a pk
+    found on several shards, which disjoint id ranges rule out.
+    """
+    found = fan_out(lambda alias: list(model.objects.using(alias).filter(pk__in=pks).values_list('pk', flat=True)))
+    located = {}
+    for alias, rows in zip(shards(), found):
+        for pk in rows:
+            if pk in located:
+                raise ValueError(f'{model.__name__} {pk} exists on both {located[pk]} and {alias}')
+            located[pk] = alias
+    return located
+
+
+def shard_of(model, pk):
+    """
+    Alias for .using() / using_shard() on the shard holding tenant row `pk`;
+    None when it is on 'default' or nowhere (see shards_of).
+    """
+    if not sharding_enabled():
+        return None
+    alias = next(iter(shards_of(model, [pk]).values()), None)
+    return None if alias == 'default' else alias
+
+
+def merge_counts(results):
+    """Sum dicts of numbers key by key"""
+    merged = {}
+    for result in results:
+        for key, value in result.items():
+            merged[key] = merged.get(key, 0) + (value or 0)
+    return merged
+
+
+class ShardRouter:
+    """
+    Sends tenant models to the request's shard. Anything else falls through
+    to the next router (ReplicaRouter), except global rows reached from a
+    shard row, which are read from 'default' rather than the shard's copy.
+    """
+
+    def db_for_read(self, model, **hints):
+        if is_tenant_model(model):
+            return self._tenant_alias()
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db not in (None, 'default') and instance._state.db in shards():
+            return 'default'
+        return None
+
+    def db_for_write(self, model, **hints):
+        return self._tenant_alias() if is_tenant_model(model) else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = set(shards())
+        databases = {obj1._state.db, obj2._state.db}
+        if not databases <= aliases:
+            return None
+        # Tenant rows never point across shards; users exist on every shard
+        return len(databases) == 1 or not (is_tenant_model(type(obj1)) and is_tenant_model(type(obj2)))
+
+    def _tenant_alias(self):
+        alias = _shard_alias.get()
+        return alias if alias and alias != 'default' else None
+
+
+def _in_shard(alias, content):
+    # Streaming bodies are read after the view returns
+    iterator = iter(content)
+    while True:
+        token = _shard_alias.set(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _shard_alias.reset(token)
+        yield chunk
+
+
+class ShardMiddleware:
+    """Routes the request's tenant data to its shard; refuses writes while the tenant is being moved"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sharding_enabled():
+            return self.get_response(request)
+
+        user_id = tenant_id(request)
+        if user_id is None:
+            user = getattr(request, 'user', None)
+            user_id = user.pk if user is not None and user.is_authenticated else None
+        if user_id is None:
+            alias, read_only = 'default', False
+        elif request.method in SAFE_METHODS:
+            alias, read_only = shard_for_user(user_id)
+        else:
+            # Writes must see a move as soon as it starts: no cached entry
+            alias, read_only = resolve_shard(user_id)
+
+        if read_only and request.method not in SAFE_METHODS:
+            response = JsonResponse({
+                'success': False,
+                'message': 'Your account is being moved, please retry in a few seconds'
+            }, status=503)
+            response['Retry-After'] = '5'
+            return response
+
+        with using_shard(alias):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = _in_shard(alias, response.streaming_content)
+        return response
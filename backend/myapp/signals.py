@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Appartement, Immeuble, Payment, ResidentPayment, User
+from .services.analytics_service import forget_revenue
+from .services.preview_service import schedule_previews
+from .services.shard_service import mirror_users
+from .sharding import resolve_shard, sharding_enabled, tenant_db
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=ResidentPayment)
+def build_proof_previews(sender, instance, update_fields=None, **kwargs):
+    """Queue thumbnail/review previews whenever a proof is saved"""
+    if update_fields is not None and 'payment_proof' not in update_fields:
+        return
+    if instance.payment_proof:
+        schedule_previews(instance.payment_proof)
+
+
+@receiver(post_save, sender=User)
+def mirror_user_to_shard(sender, instance, raw=False, using=None, **kwargs):
+    """Keep the shard's copy of a tenant user current (see myapp.sharding)"""
+    if raw or using != 'default' or not sharding_enabled():
+        return
+    # Not the cached lookup: a new resident gets its syndic on a second save
+    alias, _ = resolve_shard(instance.pk)
+    if alias != 'default':
+        mirror_users(alias, [instance.pk])
+
+
+@receiver(pre_delete, sender=User)
+def find_user_shard(sender, instance, using=None, **kwargs):
+    if using == 'default' and sharding_enabled():
+        instance._shard = tenant_db(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def delete_user_from_shard(sender, instance, **kwargs):
+    """Deleting the shard's copy cascades to the tenant rows there"""
+    alias = getattr(instance, '_shard', None)
+    if alias:
+        User.objects.using(alias).filter(pk=instance.pk).delete()
+
+
+@receiver(pre_delete, sender=Appartement)
+def find_apartment_syndic(sender, instance, using=None, **kwargs):
+    instance._syndic_id = Immeuble.objects.using(using).filter(
+        pk=instance.immeuble_id
+    ).values_list('syndic_id', flat=True).first()
+
+
+@receiver(post_delete, sender=Appartement)
+def forget_apartment_revenue(sender, instance, using=None, **kwargs):
+    """The apartment's ledger entries are gone, so cached revenue buckets are stale"""
+    syndic_id = getattr(instance, '_syndic_id', None)
+    if syndic_id is not None:
+        transaction.on_commit(lambda: forget_revenue(syndic_id), using=using)
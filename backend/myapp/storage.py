@@ -0,0 +1,81 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that names files after the SHA-256 of their content:
+
+        <upload_to>/ab/cd/abcd1234...<ext>
+
+    The two-level shard keeps every directory small (65,536 leaves), and an
+    identical upload resolves to the file already on disk instead of a new
+    copy. The upload is hashed while it is streamed chunk by chunk into a
+    temp file next to its destination, then atomically renamed into place,
+    so it is never held in memory.
+
+    Since one file can back several rows, files must not be deleted when a
+    row is; remove orphans with a separate sweep instead.
+    """
+
+    TMP_DIR = '.incoming'
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed in _save
+        return name
+
+    def tmp_dir(self):
+        path = os.path.join(self.location, self.TMP_DIR)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def hashed_name(self, name, digest):
+        directory = posixpath.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        return posixpath.join(directory, digest[:2], digest[2:4], f'{digest}{ext}')
+
+    def _save(self, name, content):
+        tmp_dir = self.tmp_dir()
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            return self.commit_hashed(name, tmp_path, digest.hexdigest())
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def commit_hashed(self, name, tmp_path, hexdigest):
+        """
+        Move an already hashed temp file (on the storage's filesystem) to its
+        content-addressed name, or drop it if that content is already stored.
+        """
+        final_name = self.hashed_name(name, hexdigest)
+        final_path = self.path(final_name)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+            return final_name
+
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(tmp_path, self.file_permissions_mode)
+        os.replace(tmp_path, final_path)
+        return final_name
+
+
+def proof_storage():
+    """Storage for payment proofs (callable so migrations do not pin an instance)"""
+    return ContentAddressedStorage()
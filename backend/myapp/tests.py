@@ -1,3 +1,1782 @@
-from django.test import TestCase
+import hashlib
+import importlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.signals import request_finished
+from django.db import close_old_connections, connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .admission import AdmissionController, shed_counts
+from .models import (
+    User, Immeuble, Appartement, Charge, Reclamation, Reunion, ResidentPayment, LedgerEntry, BalanceSnapshot,
+    SyndicProfile, SubscriptionPlan, Subscription, LoginHistory, SyndicShard, ReclamationStatusHistory,
+    ArchivedCharge, ArchivedResidentPayment, ArchivedReclamation, ArchivedReclamationStatusHistory
+)
+from .mock_redis import start_mock_server
+from .parsers import ORJSONParser
+from .proof_links import sign_proof
+from . import replicas
+from .checks import check_shard_cache
+from .sharding import SHARD_KEY, forget_tenant, id_range, using_shard
+from .renderers import ORJSONRenderer
+from .projections import AppartementProjection, ChargeProjection, ReclamationProjection, SyndicPaymentProjection
+from .serializers import (
+    AppartementSerializer, ChargeSerializer, ReclamationSerializer, SyndicPaymentSerializer, sparse_queryset
+)
+from .storage import ContentAddressedStorage
+from .throttling import SharedAnonRateThrottle
+from .services.preview_service import Image, generate_previews, preview_name, pymupdf
+from .services import login_service
+from .services.analytics_service import REVENUE_CACHE_SECONDS, aging_report, revenue_series
+from .services.archive_service import archive
+from .services.ledger_service import (
+    post_charges, apartment_balance, take_snapshots, iter_statement, SNAPSHOT_LAG
+)
+from .services.reconciliation_service import parse_statement, reconcile_statement
+from .services.settlement_service import (
+    submit_payment, confirm_payment, reject_payment, reverse_payment, recalculate_charges,
+    confirm_payments, reject_payments
+)
+from .services.shard_service import mirror_users, move_syndic
+from .services.token_service import BloomFilter, purge_expired_tokens, revoked_tokens
+
+
+def make_charge(amount='1000.00'):
+    syndic = User.objects.create_user(email='syndic@example.com', password='x', role='SYNDIC')
+    resident = User.objects.create_user(email='resident@example.com', password='x', role='RESIDENT')
+    immeuble = Immeuble.objects.create(syndic=syndic, name='Atlas', address='1 Rue A')
+    appartement = Appartement.objects.create(
+        immeuble=immeuble, resident=resident, number='A1', floor=1, monthly_charge=Decimal(amount)
+    )
+    charge = Charge.objects.create(
+        appartement=appartement, description='January', amount=Decimal(amount), due_date=date(2026, 1, 31)
+    )
+    return charge, resident
+
+
+def make_payment(charge, resident, amount, status='PENDING'):
+    return ResidentPayment.objects.create(
+        resident=resident,
+        syndic=charge.appartement.immeuble.syndic,
+        appartement=charge.appartement,
+        charge=charge,
+        amount=Decimal(amount),
+        payment_method='BANK_TRANSFER',
+        status=status
+    )
+
+
+def subscribe(syndic):
+    """Give a syndic the active subscription IsSyndic requires"""
+    plan = SubscriptionPlan.objects.create(
+        name='Pro', price=Decimal('100.00'), duration_days=365, max_buildings=10, max_apartments=100
+    )
+    today = timezone.now().date()
+    Subscription.objects.create(
+        syndic_profile=SyndicProfile.objects.create(user=syndic),
+        plan=plan, start_date=today - timedelta(days=1), end_date=today + timedelta(days=30)
+    )
+    return syndic
+
+
+def run_concurrently(target, args_list):
+    """Start one thread per args tuple behind a barrier and collect results/errors"""
+    barrier = threading.Barrier(len(args_list))
+    results, errors = [], []
+
+    def worker(*args):
+        try:
+            barrier.wait()
+            results.append(target(*args))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=args) for args in args_list]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+class SettlementServiceTests(TestCase):
+
+    def setUp(self):
+        self.charge, self.resident = make_charge()
+
+    def test_submit_does_not_touch_paid_amount(self):
+        payment = submit_payment(self.charge.id, self.resident, 'BANK_TRANSFER', 'REF-1')
+        self.charge.refresh_from_db()
+        self.assertEqual(payment.amount, Decimal('1000.00'))
+        self.assertEqual(payment.status, 'PENDING')
+        self.assertEqual(self.charge.paid_amount, Decimal('0'))
+
+    def test_submit_refuses_when_remaining_is_pending(self):
+        submit_payment(self.charge.id, self.resident, 'BANK_TRANSFER')
+        with self.assertRaises(ValueError):
+            submit_payment(self.charge.id, self.resident, 'BANK_TRANSFER')
+
+    def test_confirm_updates_amount_status_and_paid_date(self):
+        partial = make_payment(self.charge, self.resident, '400.00')
+        charge = confirm_payment(partial)
+        self.assertEqual(charge.paid_amount, Decimal('400.00'))
+        self.assertEqual(charge.status, 'PARTIALLY_PAID')
+        self.assertIsNone(charge.paid_date)
+
+        rest = make_payment(self.charge, self.resident, '600.00')
+        charge = confirm_payment(rest)
+        self.assertEqual(charge.paid_amount, Decimal('1000.00'))
+        self.assertEqual(charge.status, 'PAID')
+        self.assertIsNotNone(charge.paid_date)
+
+    def test_confirm_twice_is_rejected(self):
+        payment = make_payment(self.charge, self.resident, '400.00')
+        confirm_payment(payment)
+        with self.assertRaises(ValueError):
+            confirm_payment(payment)
+        self.charge.refresh_from_db()
+        self.assertEqual(self.charge.paid_amount, Decimal('400.00'))
+
+    def test_reject_leaves_charge_untouched(self):
+        payment = make_payment(self.charge, self.resident, '400.00')
+        reject_payment(payment)
+        self.charge.refresh_from_db()
+        self.assertEqual(payment.status, 'REJECTED')
+        self.assertEqual(self.charge.paid_amount, Decimal('0'))
+        self.assertEqual(self.charge.status, 'UNPAID')
+
+    def test_recalculate_repairs_drift(self):
+        make_payment(self.charge, self.resident, '250.00', status='CONFIRMED')
+        make_payment(self.charge, self.resident, '500.00', status='PENDING')
+        Charge.objects.filter(pk=self.charge.pk).update(paid_amount=Decimal('750.00'), status='PAID')
+
+        recalculate_charges(Charge.objects.filter(pk=self.charge.pk))
+        self.charge.refresh_from_db()
+        self.assertEqual(self.charge.paid_amount, Decimal('250.00'))
+        self.assertEqual(self.charge.status, 'PARTIALLY_PAID')
+
+
+class BulkSettlementTests(TestCase):
+
+    def setUp(self):
+        self.charge, self.resident = make_charge()
+        self.other = Charge.objects.create(
+            appartement=self.charge.appartement, description='February',
+            amount=Decimal('300.00'), due_date=date(2026, 2, 28)
+        )
+
+    def test_bulk_confirm_recomputes_each_charge(self):
+        payments = [make_payment(self.charge, self.resident, '100.00') for _ in range(5)]
+        payments += [make_payment(self.other, self.resident, '100.00') for _ in range(3)]
+        ids = [p.id for p in payments]
+
+        with CaptureQueriesContext(connection) as ctx:
+            results = confirm_payments(ResidentPayment.objects.all(), ids)
+
+        self.assertLessEqual(len(ctx.captured_queries), 7)
+        self.assertTrue(all(r['success'] for r in results))
+        self.charge.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.charge.paid_amount, Decimal('500.00'))
+        self.assertEqual(self.charge.status, 'PARTIALLY_PAID')
+        self.assertEqual(self.other.status, 'PAID')
+        self.assertEqual(results[-1]['charge_status'], 'PAID')
+
+    def test_bulk_query_count_does_not_grow(self):
+        few = [make_payment(self.charge, self.resident, '1.00').id for _ in range(2)]
+        many = [make_payment(self.charge, self.resident, '1.00').id for _ in range(200)]
+
+        with CaptureQueriesContext(connection) as small:
+            confirm_payments(ResidentPayment.objects.all(), few)
+        with CaptureQueriesContext(connection) as large:
+            confirm_payments(ResidentPayment.objects.all(), many)
+
+        # The ledger INSERT is split by the backend's bind-parameter limit only
+        def settlement_queries(ctx):
+            return [q for q in ctx.captured_queries if 'myapp_ledgerentry' not in q['sql']]
+
+        self.assertEqual(len(settlement_queries(small)), len(settlement_queries(large)))
+
+    def test_bulk_reports_per_item_failures(self):
+        done = make_payment(self.charge, self.resident, '100.00', status='CONFIRMED')
+        pending = make_payment(self.charge, self.resident, '100.00')
+
+        results = reject_payments(ResidentPayment.objects.all(), [done.id, pending.id, 999999])
+
+        self.assertEqual([r['success'] for r in results], [False, True, False])
+        self.assertEqual(results[0]['payment_status'], 'CONFIRMED')
+        self.assertEqual(results[2]['message'], 'Payment not found')
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'REJECTED')
+
+    def test_bulk_is_scoped_to_queryset(self):
+        payment = make_payment(self.charge, self.resident, '100.00')
+
+        results = confirm_payments(ResidentPayment.objects.none(), [payment.id])
+
+        self.assertFalse(results[0]['success'])
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'PENDING')
+
+
+class ReconciliationTests(TestCase):
+
+    RIB = '011780000012345678901234'
+
+    def setUp(self):
+        self.charge, self.resident = make_charge()
+        self.exact = make_payment(self.charge, self.resident, '400.00')
+        self.exact.reference = 'BMCE-2394023'
+        self.exact.save()
+        self.fuzzy = make_payment(self.charge, self.resident, '250.00')
+        self.fuzzy.reference = 'CIH-777001'
+        self.fuzzy.rib = self.RIB
+        self.fuzzy.save()
+
+    def test_csv_exact_match_is_confirmed_and_fuzzy_left_for_review(self):
+        statement = io.BytesIO(
+            b"date;libelle;montant\n"
+            b"2026-01-10;VIR BMCE-2394023 LOYER;400,00\n"
+            b"2026-01-11;VIR CIH-777001;200,00\n"
+            b"2026-01-12;FRAIS TENUE DE COMPTE;-15,00\n"
+            b"2026-01-13;VIR INCONNU;99,00\n"
+        )
+
+        result = reconcile_statement(statement, resident_payments=ResidentPayment.objects.all())
+
+        self.assertEqual(result['summary']['exact'], 1)
+        self.assertEqual(result['summary']['review'], 1)
+        self.assertEqual(result['summary']['unmatched'], 1)
+        self.assertEqual(result['review'][0]['payment_id'], self.fuzzy.id)
+        self.exact.refresh_from_db()
+        self.fuzzy.refresh_from_db()
+        self.charge.refresh_from_db()
+        self.assertEqual(self.exact.status, 'CONFIRMED')
+        self.assertEqual(self.fuzzy.status, 'PENDING')
+        self.assertEqual(self.charge.paid_amount, Decimal('400.00'))
+
+    def test_mt940_rib_and_amount_is_a_review_match(self):
+        statement = io.BytesIO((
+            ":20:STMT\n:25:011780000099999999999999\n"
+            ":61:2601150115C250,00NTRFNONREF//X1\n"
+            f":86:VIREMENT DE {self.RIB}\n"
+            ":61:2601160116D80,00NTRFNONREF\n"
+            ":62F:C260131MAD1000,00\n"
+        ).encode())
+
+        result = reconcile_statement(statement, resident_payments=ResidentPayment.objects.all())
+
+        self.assertEqual(result['summary']['lines'], 1)
+        self.assertEqual(result['review'][0]['match'], 'rib_amount')
+        self.assertEqual(result['review'][0]['payment_id'], self.fuzzy.id)
+
+    def test_camt_entries_are_streamed(self):
+        statement = io.BytesIO(b"""<?xml version="1.0"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>
+<Ntry><Amt Ccy="MAD">400.00</Amt><CdtDbtInd>CRDT</CdtDbtInd><NtryDtls><TxDtls>
+<Refs><EndToEndId>BMCE2394023</EndToEndId></Refs></TxDtls></NtryDtls></Ntry>
+<Ntry><Amt Ccy="MAD">10.00</Amt><CdtDbtInd>DBIT</CdtDbtInd></Ntry>
+</Stmt></BkToCstmrStmt></Document>""")
+
+        lines = list(parse_statement(statement))
+
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0].amount, Decimal('400.00'))
+        self.assertEqual(lines[0].reference, 'BMCE2394023')
+
+    def test_dry_run_confirms_nothing(self):
+        statement = io.BytesIO(b"reference,amount\nBMCE2394023,400.00\n")
+
+        result = reconcile_statement(
+            statement, resident_payments=ResidentPayment.objects.all(), auto_confirm=False
+        )
+
+        self.assertEqual(result['matched']['resident_payment'], [self.exact.id])
+        self.exact.refresh_from_db()
+        self.assertEqual(self.exact.status, 'PENDING')
+
+    def test_payment_is_matched_at_most_once(self):
+        statement = io.BytesIO(b"reference,amount\nBMCE2394023,400.00\nBMCE2394023,400.00\n")
+
+        result = reconcile_statement(statement, resident_payments=ResidentPayment.objects.all())
+
+        self.assertEqual(result['summary']['exact'], 1)
+        self.charge.refresh_from_db()
+        self.assertEqual(self.charge.paid_amount, Decimal('400.00'))
+
+
+class VerifyLedgerTests(TestCase):
+
+    def setUp(self):
+        self.charge, self.resident = make_charge()
+        self.clean = Charge.objects.create(
+            appartement=self.charge.appartement, description='February',
+            amount=Decimal('300.00'), due_date=date(2026, 2, 28)
+        )
+        make_payment(self.charge, self.resident, '400.00', status='CONFIRMED')
+        make_payment(self.charge, self.resident, '600.00', status='PENDING')
+        # Legacy pay() added the pending amount to paid_amount
+        Charge.objects.filter(pk=self.charge.pk).update(paid_amount=Decimal('1000.00'), status='UNPAID')
+
+    def run_command(self, *args):
+        out = io.StringIO()
+        call_command('verify_ledger', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reports_without_writing(self):
+        output = self.run_command('--chunk-size', '1')
+
+        self.assertIn(
+            f'Charge {self.charge.pk}: stored 1000.00 (UNPAID, paid None), confirmed 400.00 (PARTIALLY_PAID, paid None)',
+            output
+        )
+        self.assertIn('Checked 2 charges, 1 out of sync', output)
+        self.charge.refresh_from_db()
+        self.assertEqual(self.charge.paid_amount, Decimal('1000.00'))
+
+    def test_repair_writes_confirmed_totals(self):
+        output = self.run_command('--repair')
+
+        self.assertIn('1 repaired', output)
+        self.charge.refresh_from_db()
+        self.assertEqual(self.charge.paid_amount, Decimal('400.00'))
+        self.assertEqual(self.charge.status, 'PARTIALLY_PAID')
+        self.assertIn('0 out of sync', self.run_command())
+
+    def test_detects_paid_date_drift(self):
+        Charge.objects.filter(pk=self.clean.pk).update(paid_date=date(2026, 2, 1))
+        self.assertIn('2 out of sync', self.run_command())
+
+        self.run_command('--repair')
+        self.clean.refresh_from_db()
+        self.assertIsNone(self.clean.paid_date)
+
+    def test_repair_keeps_overdue_charges_overdue(self):
+        Charge.objects.filter(pk=self.clean.pk).update(status='OVERDUE', paid_date=date(2026, 2, 1))
+
+        self.run_command('--repair')
+        self.clean.refresh_from_db()
+        self.assertEqual((self.clean.status, self.clean.paid_date), ('OVERDUE', None))
+
+    def test_repair_uses_current_payments(self):
+        # A payment confirmed between the check and the repair is not overwritten
+        original = recalculate_charges
+
+        def confirm_meanwhile(charges):
+            make_payment(self.charge, self.resident, '100.00', status='CONFIRMED')
+            return original(charges)
+
+        with mock.patch('myapp.management.commands.verify_ledger.recalculate_charges', confirm_meanwhile):
+            self.run_command('--repair')
+        self.charge.refresh_from_db()
+        self.assertEqual(self.charge.paid_amount, Decimal('500.00'))
+
+
+class LedgerTests(TestCase):
+
+    def setUp(self):
+        self.charge, self.resident = make_charge()
+        post_charges([self.charge])
+        self.apartment_id = self.charge.appartement_id
+
+    def test_balance_follows_confirm_and_reverse(self):
+        self.assertEqual(apartment_balance(self.apartment_id), Decimal('1000.00'))
+
+        payment = make_payment(self.charge, self.resident, '400.00')
+        confirm_payment(payment)
+        self.assertEqual(apartment_balance(self.apartment_id), Decimal('600.00'))
+
+        charge = reverse_payment(payment)
+        self.assertEqual(apartment_balance(self.apartment_id), Decimal('1000.00'))
+        self.assertEqual(charge.paid_amount, Decimal('0'))
+        self.assertEqual(charge.status, 'UNPAID')
+        with self.assertRaises(ValueError):
+            reverse_payment(payment)
+
+    def test_bulk_confirm_posts_entries(self):
+        payments = [make_payment(self.charge, self.resident, '250.00') for _ in range(2)]
+        confirm_payments(ResidentPayment.objects.all(), [p.id for p in payments])
+
+        self.assertEqual(
+            LedgerEntry.objects.filter(entry_type='PAYMENT_CONFIRMED').count(), 2
+        )
+        self.assertEqual(apartment_balance(self.apartment_id), Decimal('500.00'))
+
+    def test_entries_are_append_only(self):
+        entry = LedgerEntry.objects.get()
+        entry.amount = Decimal('1.00')
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+
+    def test_snapshot_plus_tail(self):
+        # Entries inside the lag window are left for the next snapshot
+        self.assertEqual(take_snapshots(), 0)
+
+        LedgerEntry.objects.update(created_at=timezone.now() - SNAPSHOT_LAG * 2)
+        self.assertEqual(take_snapshots(), 1)
+        self.assertEqual(take_snapshots(), 0)
+        snapshot = BalanceSnapshot.objects.get()
+        self.assertEqual(snapshot.balance, Decimal('1000.00'))
+
+        confirm_payment(make_payment(self.charge, self.resident, '300.00'))
+        self.assertEqual(apartment_balance(self.apartment_id), Decimal('700.00'))
+
+    def test_statement_running_balance(self):
+        confirm_payment(make_payment(self.charge, self.resident, '400.00'))
+        rows = [(entry.entry_type, running) for entry, running in iter_statement(self.apartment_id)]
+        self.assertEqual(rows, [
+            ('CHARGE_POSTED', Decimal('1000.00')),
+            ('PAYMENT_CONFIRMED', Decimal('600.00')),
+        ])
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = ContentAddressedStorage(location=self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_name_is_sharded_content_hash(self):
+        data = b'receipt-bytes'
+        digest = hashlib.sha256(data).hexdigest()
+
+        name = self.storage.save('resident_payment_proofs/Receipt.PNG', ContentFile(data))
+
+        self.assertEqual(name, f'resident_payment_proofs/{digest[:2]}/{digest[2:4]}/{digest}.png')
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), data)
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.storage.save('a.jpg', ContentFile(b'same'))
+        second = self.storage.save('b.jpg', ContentFile(b'same'))
+        other = self.storage.save('c.jpg', ContentFile(b'different'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        stored = [f for _, _, files in os.walk(self.tmp.name) for f in files]
+        self.assertEqual(len(stored), 2)
+
+    def test_large_upload_is_streamed_in_chunks(self):
+        upload = ContentFile(b'x' * (3 * 1024 * 1024))
+        chunks = []
+        original = upload.chunks
+        upload.chunks = lambda chunk_size=None: (chunks.append(len(c)) or c for c in original(64 * 1024))
+
+        name = self.storage.save('big.pdf', upload)
+
+        self.assertEqual(self.storage.size(name), 3 * 1024 * 1024)
+        self.assertEqual(max(chunks), 64 * 1024)
+
+
+class ProofDownloadTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.media = override_settings(MEDIA_ROOT=self.tmp.name, PROTECTED_MEDIA_SERVER='')
+        self.media.enable()
+        self.charge, self.resident = make_charge()
+        self.payment = make_payment(self.charge, self.resident, '100.00')
+        self.payment.payment_proof.save('scan.pdf', ContentFile(b'0123456789'))
+        self.url = f'/api/proofs/resident-payments/{self.payment.pk}/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.resident)
+
+    def tearDown(self):
+        self.media.disable()
+        self.tmp.cleanup()
+
+    def test_owner_downloads_with_etag(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(b"0123456789").hexdigest()}"')
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_range_request(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=-3').status_code, 206)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=20-').status_code, 416)
+
+    def test_other_users_get_404(self):
+        stranger = User.objects.create_user(email='other@example.com', password='x', role='RESIDENT')
+        self.client.force_authenticate(stranger)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_authenticate(self.charge.appartement.immeuble.syndic)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_signed_link_needs_no_authentication(self):
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get(self.url).status_code, 401)
+
+        link = SyndicPaymentSerializer(self.payment).data['payment_proof']
+        response = anonymous.get(link)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+        other = make_payment(self.charge, self.resident, '50.00')
+        self.assertEqual(anonymous.get(link.replace(self.url, f'/api/proofs/resident-payments/{other.pk}/')).status_code, 403)
+        self.assertEqual(anonymous.get(link + 'x').status_code, 403)
+        self.assertEqual(anonymous.get(link.replace('?', '?variant=review&')).status_code, 403)
+
+        expired = sign_proof('resident-payment-proof', self.payment.pk, now=time.time() - 7200)
+        self.assertEqual(anonymous.get(self.url, {'signature': expired}).status_code, 403)
+
+    @override_settings(PROTECTED_MEDIA_SERVER='nginx', PROTECTED_MEDIA_PREFIX='/protected-proofs/')
+    def test_nginx_offload(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-proofs/{self.payment.payment_proof.name}')
+        self.assertEqual(response.content, b'')
+
+
+@skipIf(Image is None, 'Pillow not installed')
+class ProofPreviewTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.media = override_settings(MEDIA_ROOT=self.tmp.name)
+        self.media.enable()
+        self.charge, self.resident = make_charge()
+        self.payment = make_payment(self.charge, self.resident, '100.00')
+
+    def tearDown(self):
+        self.media.disable()
+        self.tmp.cleanup()
+
+    def save_proof(self, name, data):
+        self.payment.payment_proof.save(name, ContentFile(data), save=False)
+        return self.payment.payment_proof
+
+    def test_photo_gets_small_thumbnail_and_review_copy(self):
+        photo = io.BytesIO()
+        Image.new('RGB', (3000, 2000), 'white').save(photo, 'JPEG', quality=95)
+        proof = self.save_proof('photo.jpg', photo.getvalue())
+
+        self.assertEqual(sorted(generate_previews(proof)), ['review', 'thumb'])
+        self.assertEqual(generate_previews(proof), [])
+
+        with proof.storage.open(preview_name(proof.name, 'thumb')) as f:
+            thumb = Image.open(f)
+            self.assertEqual(thumb.format, 'WEBP')
+            self.assertEqual(max(thumb.size), 320)
+        with proof.storage.open(preview_name(proof.name, 'review')) as f:
+            self.assertEqual(max(Image.open(f).size), 1600)
+
+    @skipIf(pymupdf is None, 'PyMuPDF not installed')
+    def test_pdf_first_page_is_rasterized(self):
+        document = pymupdf.open()
+        document.new_page()
+        proof = self.save_proof('receipt.pdf', document.tobytes())
+
+        self.assertEqual(sorted(generate_previews(proof)), ['review', 'thumb'])
+
+    def test_command_skips_decompression_bombs(self):
+        for size, payment in (((3000, 2000), self.payment), ((10, 10), make_payment(self.charge, self.resident, '5.00'))):
+            photo = io.BytesIO()
+            Image.new('RGB', size, 'white').save(photo, 'PNG')
+            payment.payment_proof.save(f'{size[0]}.png', ContentFile(photo.getvalue()))
+
+        out = io.StringIO()
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            call_command('build_proof_previews', workers=1, stdout=out)
+        self.assertIn('2 proofs checked, 1 previewed', out.getvalue())
+
+    def test_serializer_exposes_thumbnail_once_built(self):
+        photo = io.BytesIO()
+        Image.new('RGB', (800, 600), 'white').save(photo, 'PNG')
+        self.save_proof('scan.png', photo.getvalue())
+        self.payment.save()
+
+        data = SyndicPaymentSerializer(self.payment).data
+        self.assertIsNone(data['payment_proof_thumbnail'])
+
+        generate_previews(self.payment.payment_proof)
+        data = SyndicPaymentSerializer(self.payment).data
+        self.assertTrue(data['payment_proof_thumbnail'].startswith(
+            f'/api/proofs/resident-payments/{self.payment.pk}/?variant=thumb&signature='
+        ))
+
+        # Opened by an <img> tag, without the Bearer header
+        response = APIClient().get(data['payment_proof_thumbnail'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+
+
+class ChunkedUploadTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.media = override_settings(MEDIA_ROOT=self.tmp.name)
+        self.media.enable()
+        self.charge, self.resident = make_charge()
+        self.payment = make_payment(self.charge, self.resident, '100.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.resident)
+        self.data = os.urandom(3000)
+
+    def tearDown(self):
+        self.media.disable()
+        self.tmp.cleanup()
+
+    def start(self):
+        response = self.client.post('/api/uploads/', {'filename': 'scan.pdf', 'size': len(self.data)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return f"/api/uploads/{response.data['data']['id']}/"
+
+    def put(self, url, offset, chunk):
+        return self.client.put(
+            url, data=chunk, content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_resume_after_duplicate_chunk_and_attach(self):
+        url = self.start()
+        self.assertEqual(self.put(url, 0, self.data[:1000]).data['data']['offset'], 1000)
+
+        # A retried chunk the server already has is refused with the resume point
+        duplicate = self.put(url, 0, self.data[:1000])
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertEqual(duplicate['Upload-Offset'], '1000')
+        self.assertEqual(self.client.get(url).data['data']['offset'], 1000)
+
+        self.assertEqual(self.put(url, 1000, self.data[1000:]).status_code, 200)
+        response = self.client.post(url + 'complete/', {
+            'target': 'resident_payment',
+            'payment_id': self.payment.pk,
+            'sha256': hashlib.sha256(self.data).hexdigest(),
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.payment.refresh_from_db()
+        with self.payment.payment_proof.open('rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertIn(hashlib.sha256(self.data).hexdigest(), self.payment.payment_proof.name)
+
+    def test_incomplete_or_corrupted_upload_is_refused(self):
+        url = self.start()
+        self.put(url, 0, self.data[:1000])
+        self.assertEqual(self.client.post(url + 'complete/', {}, format='json').status_code, 409)
+
+        self.put(url, 1000, self.data[1000:])
+        response = self.client.post(url + 'complete/', {'sha256': '0' * 64}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cannot_attach_to_reviewed_payment(self):
+        ResidentPayment.objects.filter(pk=self.payment.pk).update(status='CONFIRMED')
+        url = self.start()
+        self.put(url, 0, self.data)
+        response = self.client.post(url + 'complete/', {
+            'target': 'resident_payment', 'payment_id': self.payment.pk,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.payment.refresh_from_db()
+        self.assertFalse(self.payment.payment_proof)
+
+    def test_sessions_are_private(self):
+        url = self.start()
+        self.client.force_authenticate(self.charge.appartement.immeuble.syndic)
+        self.assertEqual(self.put(url, 0, self.data[:10]).status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.charge, self.resident = make_charge()
+        self.syndic = subscribe(self.charge.appartement.immeuble.syndic)
+        self.client = APIClient()
+        self.client.force_authenticate(self.resident)
+
+    def assertRevalidates(self, url, change):
+        """Unchanged -> 304 without serializing; after `change` -> 200 with a new ETag"""
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+        self.assertEqual(len(queries), 1)
+
+        change()
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], etag)
+
+    def test_resident_charges_follow_settlement_updates(self):
+        payment = make_payment(self.charge, self.resident, '1000.00')
+        self.assertRevalidates('/api/resident/charges/', lambda: confirm_payment(payment))
+
+    def test_resident_charges_follow_related_building_name(self):
+        immeuble = self.charge.appartement.immeuble
+
+        def rename():
+            immeuble.name = 'Atlas II'
+            immeuble.save()
+        self.assertRevalidates('/api/resident/charges/', rename)
+
+    def test_resident_charges_follow_deletes(self):
+        Charge.objects.create(
+            appartement=self.charge.appartement, description='February',
+            amount=Decimal('10.00'), due_date=date(2026, 2, 28)
+        )
+        self.assertRevalidates('/api/resident/charges/', self.charge.delete)
+
+    def test_upcoming_reunions_follow_status_changes(self):
+        reunion = Reunion.objects.create(
+            syndic=self.syndic, immeuble=self.charge.appartement.immeuble, title='AG', topic='Budget',
+            date_time=timezone.now() + timedelta(days=3)
+        )
+
+        def cancel():
+            reunion.status = 'CANCELLED'
+            reunion.save()
+        self.assertRevalidates('/api/resident/reunions/', cancel)
+
+    def test_etag_depends_on_query_string(self):
+        etag = self.client.get('/api/resident/reclamations/')['ETag']
+        response = self.client.get('/api/resident/reclamations/?status=PENDING', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_syndic_dashboard(self):
+        self.client.force_authenticate(self.syndic)
+        self.assertRevalidates('/api/syndic/dashboard/', lambda: Appartement.objects.create(
+            immeuble=self.charge.appartement.immeuble, number='A2', floor=2, monthly_charge=Decimal('500.00')
+        ))
+
+
+class ORJSONRendererTests(TestCase):
+
+    def test_same_document_as_drf_renderer(self):
+        charge, _ = make_charge()
+        data = {'count': 1, 'results': ChargeSerializer([charge], many=True).data, 'errors': {7: 'x'}}
+
+        self.assertEqual(
+            json.loads(ORJSONRenderer().render(data)),
+            json.loads(JSONRenderer().render(data))
+        )
+
+    def test_native_types(self):
+        value = uuid.uuid4()
+        body = ORJSONRenderer().render({
+            'amount': Decimal('12.50'),
+            'id': value,
+            'at': datetime(2026, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+            'due': date(2026, 1, 31),
+        })
+        self.assertEqual(json.loads(body), {
+            'amount': 12.5, 'id': str(value), 'at': '2026-01-02T03:04:05Z', 'due': '2026-01-31'
+        })
+
+        with override_settings(JSON_DECIMAL_AS_STRING=True):
+            self.assertEqual(json.loads(ORJSONRenderer().render({'amount': Decimal('12.50')})), {'amount': '12.50'})
+
+    def test_out_of_range_int_falls_back(self):
+        self.assertEqual(json.loads(ORJSONRenderer().render({'n': 2 ** 70})), {'n': 2 ** 70})
+
+    def test_parser(self):
+        self.assertEqual(ORJSONParser().parse(io.BytesIO('{"a": [1, "é"]}'.encode())), {'a': [1, 'é']})
+
+        client = APIClient()
+        client.force_authenticate(make_charge()[1])
+        response = client.post('/api/uploads/', data='{"size": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ProjectionParityTests(TestCase):
+    """List projections must produce exactly what the serializers produce"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.media = override_settings(MEDIA_ROOT=self.tmp.name)
+        self.media.enable()
+
+        self.charge, self.resident = make_charge()
+        self.resident.first_name = ' Salma'
+        self.resident.save()
+        immeuble = self.charge.appartement.immeuble
+        nameless = User.objects.create_user(email='nameless@example.com', password='x', role='RESIDENT')
+        occupied = Appartement.objects.create(
+            immeuble=immeuble, resident=nameless, number='B1', floor=2, monthly_charge=Decimal('99.90')
+        )
+        vacant = Appartement.objects.create(immeuble=immeuble, number='C1', floor=3, monthly_charge=Decimal('0'))
+        for appartement, due in ((occupied, date(2020, 1, 1)), (vacant, date(2099, 1, 1))):
+            Charge.objects.create(appartement=appartement, description='Works', amount=Decimal('12.34'), due_date=due)
+        Reclamation.objects.create(
+            resident=self.resident, syndic=immeuble.syndic, appartement=self.charge.appartement,
+            title='Leak', content='Kitchen'
+        )
+        Reclamation.objects.create(
+            resident=nameless, syndic=immeuble.syndic, appartement=occupied, title='Noise', content='Night'
+        )
+
+        with_proof = make_payment(self.charge, self.resident, '100.00', status='CONFIRMED')
+        with_proof.payment_proof.save('scan.pdf', ContentFile(b'proof'))
+        vacated = make_payment(self.charge, self.resident, '50.00')
+        vacated.appartement = vacant
+        vacated.save()
+
+    def tearDown(self):
+        self.media.disable()
+        self.tmp.cleanup()
+
+    def assertParity(self, projection_class, serializer_class, queryset):
+        request = APIRequestFactory().get('/')
+        context = {'request': request}
+        expected = [list(row.items()) for row in serializer_class(queryset, many=True, context=context).data]
+        actual = [list(row.items()) for row in projection_class(context).data(queryset)]
+        self.assertTrue(expected)
+        self.assertEqual(actual, expected)
+
+    def test_charges(self):
+        self.assertParity(ChargeProjection, ChargeSerializer, Charge.objects.order_by('pk'))
+
+    def test_reclamations(self):
+        self.assertParity(ReclamationProjection, ReclamationSerializer, Reclamation.objects.order_by('pk'))
+
+    def test_appartements(self):
+        self.assertParity(AppartementProjection, AppartementSerializer, Appartement.objects.order_by('pk'))
+
+    def test_syndic_payments(self):
+        self.assertParity(SyndicPaymentProjection, SyndicPaymentSerializer, ResidentPayment.objects.order_by('pk'))
+
+    def test_list_endpoint_query_count_is_constant(self):
+        client = APIClient()
+        client.force_authenticate(subscribe(self.charge.appartement.immeuble.syndic))
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/syndic/charges/')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len([q for q in queries if 'myapp_charge' in q['sql']]), 1)
+
+
+class SparseFieldsetTests(TestCase):
+
+    def setUp(self):
+        self.charge, self.resident = make_charge()
+        self.syndic = subscribe(self.charge.appartement.immeuble.syndic)
+        self.client = APIClient()
+        self.client.force_authenticate(self.syndic)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in queries]
+
+    def test_projection_skips_joins_of_dropped_fields(self):
+        response, queries = self.get('/api/syndic/charges/?fields=id,description,amount,status,due_date')
+
+        self.assertEqual(list(response.data['data'][0]), ['id', 'description', 'amount', 'due_date', 'status'])
+        listing = [sql for sql in queries if 'FROM "myapp_charge"' in sql][-1]
+        self.assertNotIn('"myapp_user"', listing)
+        self.assertNotIn('"myapp_immeuble"."name"', listing)
+
+    def test_exclude(self):
+        response, _ = self.get('/api/syndic/apartments/?exclude=resident_name,resident_email,building_address')
+        self.assertNotIn('resident_name', response.data['data'][0])
+        self.assertIn('is_occupied', response.data['data'][0])
+
+    def test_serializer_path_trims_queryset(self):
+        Reunion.objects.create(
+            syndic=self.syndic, immeuble=self.charge.appartement.immeuble, title='AG', topic='Budget',
+            date_time=timezone.now()
+        )
+        response, queries = self.get('/api/syndic/reunions/?fields=id,title,building_name')
+
+        self.assertEqual(list(response.data['data'][0]), ['id', 'building_name', 'title'])
+        listing = [sql for sql in queries if 'FROM "myapp_reunion"' in sql and 'COUNT' not in sql][-1]
+        self.assertNotIn('"topic"', listing)
+        self.assertIn('"myapp_immeuble"."name"', listing)
+
+    def test_sparse_queryset_matches_projection(self):
+        request = Request(APIRequestFactory().get('/', {'fields': 'id,resident_name,is_overdue,amount'}))
+        serializer = ChargeSerializer(context={'request': request})
+        queryset = sparse_queryset(Charge.objects.all(), serializer)
+
+        with CaptureQueriesContext(connection) as queries:
+            data = ChargeSerializer(queryset, many=True, context={'request': request}).data
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(data, ChargeProjection({'request': request}).data(Charge.objects.all()))
+
+    def test_writes_ignore_fields(self):
+        request = Request(APIRequestFactory().post('/?fields=id'))
+        self.assertIn('description', ChargeSerializer(context={'request': request}).fields)
+
+
+class SharedThrottleTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.redis, cls.redis_url = start_mock_server()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.redis.shutdown()
+        cls.redis.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['shared'].clear()
+
+    def throttle(self, cache, rate='4/minute', now=None):
+        attrs = {'rate': rate, 'cache': cache}
+        if now is not None:
+            attrs['timer'] = lambda self: now
+        return type('Throttle', (SharedAnonRateThrottle,), attrs)()
+
+    def allowed(self, throttle, ip='10.0.0.1'):
+        request = Request(APIRequestFactory().get('/', REMOTE_ADDR=ip))
+        return throttle.allow_request(request, None)
+
+    def test_limit_is_shared_between_workers(self):
+        # Two cache clients, as two worker processes would have
+        workers = [RedisCache(self.redis_url, {'KEY_PREFIX': 'test'}) for _ in range(2)]
+        results = [self.allowed(self.throttle(workers[i % 2], now=600)) for i in range(6)]
+
+        self.assertEqual(results, [True] * 4 + [False] * 2)
+        # Other clients keep their own budget
+        self.assertTrue(self.allowed(self.throttle(workers[0], now=600), ip='10.0.0.2'))
+
+    def test_refused_requests_do_not_use_quota(self):
+        cache = RedisCache(self.redis_url, {'KEY_PREFIX': 'test'})
+        for _ in range(10):
+            self.allowed(self.throttle(cache, now=600))
+        # Next window: 4 from the previous one weigh 4 * 0.5 at half time
+        allowed = [self.allowed(self.throttle(cache, now=690)) for _ in range(4)]
+        self.assertEqual(allowed, [True, True, False, False])
+
+    def test_sliding_estimate_and_wait(self):
+        cache = caches['shared']
+        for _ in range(4):
+            self.assertTrue(self.allowed(self.throttle(cache, now=600)))
+
+        # A quarter into the next window the previous 4 still weigh 3
+        throttle = self.throttle(cache, now=675)
+        self.assertTrue(self.allowed(throttle))
+        refused = self.throttle(cache, now=675)
+        self.assertFalse(self.allowed(refused))
+        # Room for one more once the previous window weighs 2 (half time)
+        self.assertEqual(refused.wait(), 15)
+        self.assertTrue(self.allowed(self.throttle(cache, now=690)))
+
+    @override_settings(LOGIN_HISTORY_FLUSH_INTERVAL=0)
+    def test_login_throttled_after_five_attempts(self):
+        client = APIClient()
+        statuses = [
+            client.post('/api/auth/login/', {'email': 'nobody@example.com', 'password': 'x'}, format='json').status_code
+            for _ in range(6)
+        ]
+        self.assertNotIn(429, statuses[:5])
+        self.assertEqual(statuses[5], 429)
+
+
+class AdmissionControlTests(TestCase):
+
+    def setUp(self):
+        caches['shared'].clear()
+
+    def test_tenant_budget_and_total_budget(self):
+        controller = AdmissionController(tenant_limit=2, total_limit=3, queue_limit=4, timeout=0)
+
+        self.assertEqual([controller.acquire('a') for _ in range(3)], [None, None, 429])
+        self.assertIsNone(controller.acquire('b'))
+        # 'c' is within its own budget but the process is full
+        self.assertEqual(controller.acquire('c'), 503)
+
+        controller.release('a')
+        self.assertIsNone(controller.acquire('c'))
+        self.assertEqual(controller.total, 3)
+
+    def test_budgets_are_shared_between_workers(self):
+        workers = [AdmissionController(tenant_limit=1, total_limit=8, queue_limit=4, timeout=0) for _ in range(2)]
+
+        self.assertIsNone(workers[0].acquire('a'))
+        self.assertEqual(workers[1].acquire('a'), 429)
+        workers[0].release('a')
+        self.assertIsNone(workers[1].acquire('a'))
+
+    def test_waiter_sees_release_from_another_worker(self):
+        first, second = (AdmissionController(tenant_limit=1, total_limit=8, queue_limit=4, timeout=5) for _ in range(2))
+        first.acquire('a')
+        threading.Timer(0.05, first.release, args=['a']).start()
+
+        self.assertIsNone(second.acquire('a'))
+
+    def test_waiter_admitted_when_slot_frees_before_deadline(self):
+        controller = AdmissionController(tenant_limit=1, total_limit=8, queue_limit=4, timeout=5)
+        controller.acquire('a')
+        threading.Timer(0.05, controller.release, args=['a']).start()
+
+        self.assertIsNone(controller.acquire('a'))
+
+    def test_full_queue_sheds_without_waiting(self):
+        controller = AdmissionController(tenant_limit=1, total_limit=8, queue_limit=0, timeout=5)
+        controller.acquire('a')
+        self.assertEqual(controller.acquire('a'), 429)
+
+    def test_middleware_sheds_expensive_views_only(self):
+        charge, _ = make_charge()
+        syndic = subscribe(charge.appartement.immeuble.syndic)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(syndic).access_token}')
+
+        with override_settings(ADMISSION_TENANT_CONCURRENCY=0, ADMISSION_QUEUE_TIMEOUT=0):
+            shed = client.get('/api/syndic/charges/statistics/')
+            listing = client.get('/api/syndic/charges/')
+
+        self.assertEqual(shed.status_code, 429)
+        self.assertFalse(shed.json()['success'])
+        self.assertIn('Retry-After', shed)
+        self.assertEqual(listing.status_code, 200)
+        self.assertEqual(shed_counts([syndic.id])[syndic.id], {429: 1, 503: 0})
+
+    def test_slot_released_after_response(self):
+        charge, _ = make_charge()
+        syndic = subscribe(charge.appartement.immeuble.syndic)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(syndic).access_token}')
+
+        with override_settings(ADMISSION_TENANT_CONCURRENCY=1, ADMISSION_QUEUE_TIMEOUT=0):
+            statuses = [client.get('/api/syndic/charges/statistics/').status_code for _ in range(3)]
+            statement = client.get(f'/api/syndic/apartments/{charge.appartement_id}/statement/')
+            b''.join(statement.streaming_content)
+            # Closing fires request_finished, which would close the test database connection
+            request_finished.disconnect(close_old_connections)
+            try:
+                statement.close()
+            finally:
+                request_finished.connect(close_old_connections)
+            after = client.get('/api/syndic/charges/statistics/')
+
+        self.assertEqual(statuses, [200] * 3)
+        self.assertEqual(statement.status_code, 200)
+        self.assertEqual(after.status_code, 200)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], LOGIN_HISTORY_FLUSH_INTERVAL=0)
+class LoginTests(TestCase):
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.syndic = subscribe(User.objects.create_user(email='syndic@example.com', password='secret', role='SYNDIC'))
+        self.client = APIClient()
+
+    def login(self, email='syndic@example.com', password='secret'):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': password}, format='json')
+
+    def test_single_user_load(self):
+        # user + subscription, outstanding token, history row, last_login
+        with self.assertNumQueries(4):
+            response = self.login()
+
+        self.assertEqual(response.status_code, 200)
+        user = response.data['user']
+        self.assertTrue(user['has_valid_subscription'])
+        self.assertEqual(user['subscription']['plan_name'], 'Pro')
+        access = AccessToken(response.data['access'])
+        self.assertEqual(access['role'], 'SYNDIC')
+        self.assertTrue(access['has_valid_subscription'])
+        self.syndic.refresh_from_db()
+        self.assertIsNotNone(self.syndic.last_login)
+
+    def test_syndic_without_subscription(self):
+        User.objects.create_user(email='new@example.com', password='secret', role='SYNDIC')
+        response = self.login('new@example.com')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['user']['has_valid_subscription'])
+        self.assertIsNone(response.data['user']['subscription'])
+
+    def test_failed_and_inactive_logins_recorded(self):
+        User.objects.filter(pk=self.syndic.pk).update(is_active=False)
+
+        self.assertEqual(self.login().status_code, 401)
+        self.assertEqual(self.login('nobody@example.com').status_code, 401)
+        history = LoginHistory.objects.order_by('created_at')
+        self.assertEqual([(h.email, h.success, h.user_id) for h in history], [
+            ('syndic@example.com', False, None), ('nobody@example.com', False, None),
+        ])
+
+    def test_history_is_buffered(self):
+        with override_settings(LOGIN_HISTORY_FLUSH_INTERVAL=3600), \
+                mock.patch.object(login_service, '_ensure_writer'):
+            self.assertEqual(self.login().status_code, 200)
+            self.assertEqual(self.login().status_code, 200)
+            self.assertFalse(LoginHistory.objects.exists())
+
+        with self.assertNumQueries(2):
+            self.assertEqual(login_service.flush(), 2)
+        self.assertEqual(LoginHistory.objects.filter(user=self.syndic, success=True).count(), 2)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], LOGIN_HISTORY_FLUSH_INTERVAL=0)
+class TokenRevocationTests(TestCase):
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.user = User.objects.create_user(email='resident@example.com', password='secret', role='RESIDENT')
+        self.client = APIClient()
+        # Built here, in the test transaction, instead of on a background thread
+        revoked_tokens.reset()
+        revoked_tokens.rebuild()
+        self.addCleanup(revoked_tokens.reset)
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/refresh/', {'refresh': token}, format='json')
+
+    def test_rotated_token_is_refused(self):
+        old = str(RefreshToken.for_user(self.user))
+
+        response = self.refresh(old)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh(old).status_code, 401)
+        self.assertEqual(self.refresh(response.data['refresh']).status_code, 200)
+
+    def test_unrevoked_check_needs_no_query(self):
+        revoked_tokens.is_revoked('warm-up')  # first incremental sync
+        with self.assertNumQueries(0):
+            self.assertFalse(revoked_tokens.is_revoked(uuid.uuid4().hex))
+
+    def test_revocation_by_another_worker_seen_after_sync(self):
+        token = RefreshToken.for_user(self.user)
+        revoked_tokens.is_revoked('warm-up')
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token['jti']))
+
+        with override_settings(TOKEN_REVOCATION_SYNC_INTERVAL=3600):
+            self.assertFalse(revoked_tokens.is_revoked(token['jti']))
+        with override_settings(TOKEN_REVOCATION_SYNC_INTERVAL=0):
+            self.assertTrue(revoked_tokens.is_revoked(token['jti']))
+
+    def test_purge_expired_tokens(self):
+        now = timezone.now()
+        tokens = OutstandingToken.objects.bulk_create([
+            OutstandingToken(jti=f'jti-{i}', token='', expires_at=now + timedelta(days=-1 if i < 5 else 1))
+            for i in range(8)
+        ])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in tokens[::2]])
+
+        self.assertEqual(purge_expired_tokens(batch_size=2), 5)
+        self.assertEqual(sorted(OutstandingToken.objects.values_list('jti', flat=True)), ['jti-5', 'jti-6', 'jti-7'])
+        self.assertEqual(list(BlacklistedToken.objects.values_list('token__jti', flat=True)), ['jti-6'])
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(capacity=2000)
+        members = [uuid.uuid4().hex for _ in range(2000)]
+        for jti in members:
+            bloom.add(jti)
+
+        self.assertTrue(all(jti in bloom for jti in members))
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(2000))
+        self.assertLess(false_positives, 60)
+
+
+class AgingReportTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.charge, self.resident = make_charge()
+        self.syndic = subscribe(self.charge.appartement.immeuble.syndic)
+        self.today = timezone.localdate()
+        apartment = self.charge.appartement
+        Charge.objects.filter(pk=self.charge.pk).update(due_date=self.today - timedelta(days=45))
+        confirm_payment(make_payment(self.charge, self.resident, '400.00'))
+        for days, amount in ((-5, '100.00'), (0, '50.00'), (1, '10.00'), (90, '20.00'), (91, '30.00')):
+            Charge.objects.create(
+                appartement=apartment, description=f'{days} days', amount=Decimal(amount),
+                due_date=self.today - timedelta(days=days)
+            )
+        Charge.objects.create(
+            appartement=apartment, description='Settled', amount=Decimal('999.00'), paid_amount=Decimal('999.00'),
+            status='PAID', due_date=self.today - timedelta(days=200)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.syndic)
+
+    def test_buckets(self):
+        report = aging_report(self.syndic.pk)
+
+        expected = {
+            'current': Decimal('150.00'), 'days_1_30': Decimal('10.00'), 'days_31_60': Decimal('600.00'),
+            'days_61_90': Decimal('20.00'), 'days_90_plus': Decimal('30.00'), 'total': Decimal('810.00'),
+        }
+        self.assertEqual({key: report['totals'][key] for key in expected}, expected)
+        self.assertEqual(report['buildings'][0]['building_name'], 'Atlas')
+        self.assertEqual(report['buildings'][0]['total'], Decimal('810.00'))
+        self.assertEqual(report['residents'][0]['resident_email'], 'resident@example.com')
+        self.assertEqual(report['residents'][0]['days_31_60'], Decimal('600.00'))
+
+    def test_one_query_then_cached_for_the_day(self):
+        with self.assertNumQueries(1):
+            aging_report(self.syndic.pk)
+        Charge.objects.create(
+            appartement=self.charge.appartement, description='Later', amount=Decimal('5.00'), due_date=self.today
+        )
+        with self.assertNumQueries(0):
+            report = aging_report(self.syndic.pk)
+        self.assertEqual(report['totals']['total'], Decimal('810.00'))
+        self.assertEqual(aging_report(self.syndic.pk, self.today + timedelta(days=1))['totals']['total'],
+                         Decimal('815.00'))
+
+    def test_endpoint_json_and_csv(self):
+        response = self.client.get('/api/analytics/aging/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['as_of'], self.today.isoformat())
+
+        response = self.client.get('/api/analytics/aging/', {'output': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'building,resident,email,current,days_1_30,days_31_60,days_61_90,days_90_plus,total')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('Atlas,resident@example.com,resident@example.com,'))
+
+
+class RevenueAnalyticsTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.charge, self.resident = make_charge()
+        self.syndic = subscribe(self.charge.appartement.immeuble.syndic)
+        post_charges([self.charge])
+        confirm_payment(make_payment(self.charge, self.resident, '400.00'))
+        self.backdate('CHARGE_POSTED', datetime(2026, 1, 10, 12, tzinfo=dt_timezone.utc))
+        self.backdate('PAYMENT_CONFIRMED', datetime(2026, 2, 3, 12, tzinfo=dt_timezone.utc))
+        self.client = APIClient()
+        self.client.force_authenticate(self.syndic)
+
+    def backdate(self, entry_type, moment):
+        LedgerEntry.objects.filter(entry_type=entry_type).update(posted_at=moment)
+
+    def series(self, **params):
+        response = self.client.get('/api/analytics/revenue/', {'start': '2026-01-01', 'end': '2026-03-31', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']['series']
+
+    def test_monthly_buckets(self):
+        series = self.series()
+
+        self.assertEqual([point['period'] for point in series], ['2026-01-01', '2026-02-01', '2026-03-01'])
+        self.assertEqual(
+            [(point['billed'], point['collected'], point['outstanding']) for point in series],
+            [(Decimal('1000.00'), 0, Decimal('1000.00')), (0, Decimal('400.00'), Decimal('600.00')),
+             (0, 0, Decimal('600.00'))]
+        )
+        weeks = self.series(granularity='week', start='2026-02-01', end='2026-02-10')
+        self.assertEqual([point['period'] for point in weeks], ['2026-01-26', '2026-02-02', '2026-02-09'])
+        self.assertEqual(weeks[0]['outstanding'], Decimal('1000.00'))
+        self.assertEqual(weeks[1]['collected'], Decimal('400.00'))
+
+    def test_group_by(self):
+        buildings = self.series(group_by='building')
+        self.assertEqual(buildings[1]['groups'], [{
+            'building_id': self.charge.appartement.immeuble_id, 'building_name': 'Atlas',
+            'billed': 0, 'collected': Decimal('400.00'), 'outstanding': Decimal('600.00'),
+        }])
+
+        methods = self.series(group_by='payment_method')
+        self.assertEqual(methods[1]['groups'], [{'payment_method': 'BANK_TRANSFER', 'collected': Decimal('400.00')}])
+
+    def test_closed_buckets_are_cached(self):
+        start, end = date(2026, 1, 1), date(2026, 3, 31)
+        revenue_series(self.syndic.pk, start, end)
+        with self.assertNumQueries(0):
+            series = revenue_series(self.syndic.pk, start, end)
+        self.assertEqual(series[0]['billed'], Decimal('1000.00'))
+
+        # The open month is read again; the closed ones come from the cache
+        today = timezone.localdate()
+        with self.assertNumQueries(1):
+            revenue_series(self.syndic.pk, start, today)
+
+    def test_cached_buckets_expire(self):
+        with mock.patch.object(caches['shared'], 'set_many', wraps=caches['shared'].set_many) as set_many:
+            revenue_series(self.syndic.pk, date(1990, 1, 1), date(2010, 12, 31))
+        self.assertEqual(set_many.call_args.kwargs['timeout'], REVENUE_CACHE_SECONDS)
+
+    def test_admins_see_every_syndic(self):
+        admin = User.objects.create_user(email='admin@example.com', password='x', role='ADMIN')
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.series()[0]['billed'], Decimal('1000.00'))
+        self.assertEqual(self.series(syndic_id=self.syndic.pk + 100)[0]['billed'], 0)
+
+    def test_invalid_parameters(self):
+        for params in ({'granularity': 'year'}, {'group_by': 'resident'}, {'start': '2026-13-01'},
+                       {'start': '2026-04-01'}, {'granularity': 'day', 'start': '2020-01-01'}):
+            response = self.client.get('/api/analytics/revenue/', {'end': '2026-03-31', **params})
+            self.assertEqual(response.status_code, 400, params)
+            self.assertFalse(response.data['success'])
+        response = self.client.get('/api/analytics/revenue/', {'start': '9999-12-01', 'end': '9999-12-31'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_history_posted_by_the_ledger_backfill(self):
+        # The 0012 backfill wrote every entry at migration time; 0019 dates
+        # them by when the charge was created and the payment confirmed
+        migrated = datetime(2026, 10, 19, 2, tzinfo=dt_timezone.utc)
+        LedgerEntry.objects.update(created_at=migrated, posted_at=migrated)
+        Charge.objects.filter(pk=self.charge.pk).update(created_at=datetime(2026, 1, 10, 12, tzinfo=dt_timezone.utc))
+        ResidentPayment.objects.update(confirmed_at=datetime(2026, 2, 3, 12, tzinfo=dt_timezone.utc))
+
+        migration = importlib.import_module('myapp.migrations.0019_ledger_posted_at')
+        migration.backfill_posted_at(django_apps, mock.Mock(connection=connection))
+
+        self.assertEqual(
+            [(point['billed'], point['collected']) for point in self.series()],
+            [(Decimal('1000.00'), 0), (0, Decimal('400.00')), (0, 0)]
+        )
+
+    def test_admin_revenue_stats_by_valid_methods(self):
+        admin = User.objects.create_user(email='admin@example.com', password='x', role='ADMIN')
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/admin/payments/revenue_stats/')
+        self.assertEqual(list(response.data['data']['by_method']), ['BANK_TRANSFER'])
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.charge, self.resident = make_charge()
+        self.syndic = subscribe(self.charge.appartement.immeuble.syndic)
+        confirm_payment(make_payment(self.charge, self.resident, '1000.00'))
+        long_ago = timezone.now() - timedelta(days=500)
+        Charge.objects.filter(pk=self.charge.pk).update(paid_date=long_ago.date())
+
+        self.open_charge = Charge.objects.create(
+            appartement=self.charge.appartement, description='February',
+            amount=Decimal('1000.00'), due_date=date(2026, 2, 28)
+        )
+        self.reclamation = Reclamation.objects.create(
+            resident=self.resident, syndic=self.syndic, appartement=self.charge.appartement,
+            title='Leak', content='Water in the hall', status='RESOLVED'
+        )
+        ReclamationStatusHistory.objects.create(
+            reclamation=self.reclamation, old_status='PENDING', new_status='RESOLVED', changed_by=self.syndic
+        )
+        Reclamation.objects.filter(pk=self.reclamation.pk).update(updated_at=long_ago)
+        self.client = APIClient()
+        self.client.force_authenticate(self.syndic)
+
+    def test_moves_settled_rows(self):
+        moved = archive()['default']
+
+        self.assertEqual(moved['Charge'], 1)
+        self.assertEqual(moved['ResidentPayment'], 1)
+        self.assertEqual(moved['Reclamation'], 1)
+        self.assertEqual(moved['ReclamationStatusHistory'], 1)
+        self.assertEqual(list(Charge.objects.values_list('pk', flat=True)), [self.open_charge.pk])
+        archived = ArchivedCharge.objects.get(pk=self.charge.pk)
+        self.assertEqual(archived.paid_amount, Decimal('1000.00'))
+        self.assertEqual(archived.payments.get().status, 'CONFIRMED')
+        self.assertFalse(Reclamation.objects.exists())
+        self.assertEqual(ArchivedReclamationStatusHistory.objects.get().reclamation_id, self.reclamation.pk)
+        # The ledger keeps pointing at the archived charge
+        self.assertTrue(LedgerEntry.objects.filter(charge_id=self.charge.pk).exists())
+
+    def test_pending_payment_keeps_charge_hot(self):
+        make_payment(self.charge, self.resident, '10.00')
+        moved = archive()['default']
+
+        self.assertEqual(moved['Charge'], 0)
+        self.assertTrue(Charge.objects.filter(pk=self.charge.pk).exists())
+
+    def test_rerun_is_idempotent(self):
+        archive()
+        moved = archive(batch_size=1)['default']
+
+        self.assertEqual(set(moved.values()), {0})
+        self.assertEqual(ArchivedCharge.objects.count(), 1)
+        self.assertEqual(ArchivedResidentPayment.objects.count(), 1)
+
+    def test_lists_include_archived(self):
+        call_command('archive_settled', stdout=io.StringIO())
+
+        self.assertEqual(self.client.get('/api/syndic/charges/').data['count'], 1)
+        response = self.client.get('/api/syndic/charges/', {'include_archived': 'true'})
+        self.assertEqual([row['id'] for row in response.data['data']], [self.open_charge.pk, self.charge.pk])
+        self.assertEqual(response.data['data'][1]['status'], 'PAID')
+
+        response = self.client.get('/api/syndic/reclamations/', {'include_archived': 'true', 'status': 'RESOLVED'})
+        self.assertEqual([row['id'] for row in response.data['data']], [self.reclamation.pk])
+
+        stats = self.client.get('/api/syndic/charges/statistics/', {'include_archived': 'true'}).data['data']
+        self.assertEqual(stats['total_charges'], 2)
+        self.assertEqual(stats['paid'], 1)
+
+        resident = APIClient()
+        resident.force_authenticate(self.resident)
+        self.assertEqual(resident.get('/api/resident/charges/', {'include_archived': 'true'}).data['count'], 2)
+
+
+    def test_reclamation_list_includes_archived(self):
+        archive()
+        self.assertTrue(ArchivedReclamation.objects.filter(pk=self.reclamation.pk).exists())
+
+        response = self.client.get('/api/syndic/reclamations/')
+        self.assertEqual(response.data['data'], [])
+        response = self.client.get('/api/syndic/reclamations/', {'include_archived': 'true'})
+        self.assertEqual([row['id'] for row in response.data['data']], [self.reclamation.pk])
+        self.assertEqual(response.data['data'][0]['title'], 'Leak')
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    # The replica mirrors the test database on its own connection, so it only
+    # sees committed rows
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        caches['shared'].clear()
+        replicas._lag_checked.clear()
+        self.charge, _ = make_charge()
+        self.syndic = subscribe(self.charge.appartement.immeuble.syndic)
+        self.client = APIClient()
+        self.client.force_authenticate(self.syndic)
+
+    def statistics(self):
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = self.client.get('/api/syndic/charges/statistics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['total_charges'], 1)
+        return len(replica_queries)
+
+    def test_marked_view_reads_replica(self):
+        self.assertGreater(self.statistics(), 0)
+
+    def test_unmarked_view_reads_default(self):
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            self.client.get('/api/syndic/charges/')
+        self.assertEqual(len(replica_queries), 0)
+
+    def test_read_your_writes_after_write(self):
+        response = self.client.patch(f'/api/syndic/charges/{self.charge.pk}/', {'description': 'Updated'}, format='json')
+        self.assertLess(response.status_code, 400)
+        self.assertEqual(self.statistics(), 0)
+
+        caches['shared'].clear()  # pin expired
+        self.assertGreater(self.statistics(), 0)
+
+    def test_lagging_replica_skipped(self):
+        with mock.patch.object(replicas, 'replication_lag', return_value=60.0):
+            self.assertEqual(self.statistics(), 0)
+
+    def test_writes_stay_on_default(self):
+        token = replicas._replica_alias.set('replica')
+        try:
+            self.assertEqual(Charge.objects.db, 'replica')
+            charge = Charge.objects.get(pk=self.charge.pk)
+            charge.description = 'Updated'
+            with CaptureQueriesContext(connections['replica']) as replica_queries:
+                charge.save()
+        finally:
+            replicas._replica_alias.reset(token)
+        self.assertEqual(len(replica_queries), 0)
+
+
+@override_settings(DATABASE_SHARDS=['default', 'shard_1'])
+class ShardingTests(TransactionTestCase):
+    databases = {'default', 'shard_1'}
+
+    TENANT_MODELS = (Immeuble, Appartement, Reunion, Charge, ResidentPayment, Reclamation, LedgerEntry)
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.charge, self.resident = make_charge()
+        self.syndic = subscribe(self.charge.appartement.immeuble.syndic)
+        self.resident.created_by_syndic = self.syndic
+        self.resident.save()
+        confirm_payment(make_payment(self.charge, self.resident, '400.00'))
+        Reclamation.objects.create(
+            resident=self.resident, syndic=self.syndic, appartement=self.charge.appartement,
+            title='Leak', content='Water in the hall'
+        )
+        Reunion.objects.create(
+            syndic=self.syndic, immeuble=self.charge.appartement.immeuble, title='AG',
+            topic='Budget', date_time=timezone.now() + timedelta(days=7)
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.syndic)}')
+
+    def move(self):
+        call_command('move_syndic', self.syndic.pk, 'shard_1', grace=0, source_delay=0, stdout=io.StringIO())
+
+    def test_move_copies_every_row(self):
+        counts = {model: model.objects.using('default').count() for model in self.TENANT_MODELS}
+        charge = Charge.objects.get(pk=self.charge.pk)
+        self.move()
+
+        for model, rows in counts.items():
+            self.assertEqual(model.objects.using('shard_1').count(), rows, model.__name__)
+            self.assertEqual(model.objects.using('default').count(), 0, model.__name__)
+        moved = Charge.objects.using('shard_1').get(pk=charge.pk)
+        self.assertEqual(moved.created_at, charge.created_at)
+        self.assertEqual(moved.updated_at, charge.updated_at)
+        self.assertEqual(moved.paid_amount, Decimal('400.00'))
+        self.assertEqual(
+            set(User.objects.using('shard_1').values_list('pk', flat=True)), {self.syndic.pk, self.resident.pk}
+        )
+        self.assertEqual(SyndicShard.objects.get(syndic=self.syndic).alias, 'shard_1')
+
+    def test_requests_use_the_tenant_shard(self):
+        self.move()
+
+        response = self.client.get('/api/syndic/charges/')
+        self.assertEqual(response.data['count'], 1)
+        response = self.client.patch(f'/api/syndic/charges/{self.charge.pk}/', {'amount': '600.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Charge.objects.using('shard_1').get(pk=self.charge.pk).amount, Decimal('600.00'))
+
+        response = self.client.get('/api/syndic/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['overview']['total_residents'], 1)
+
+        resident = APIClient()
+        resident.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.resident)}')
+        self.assertEqual(resident.get('/api/resident/charges/').data['count'], 1)
+
+    def test_writes_refused_while_moving(self):
+        SyndicShard.objects.create(syndic=self.syndic, alias='default', read_only=True)
+        forget_tenant(self.syndic.pk)
+
+        response = self.client.patch(f'/api/syndic/charges/{self.charge.pk}/', {'amount': '600.00'}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.client.get('/api/syndic/charges/').status_code, 200)
+
+    def test_writes_ignore_a_stale_cached_shard_map(self):
+        # Another worker cached the entry just before the move started
+        caches['shared'].set(SHARD_KEY.format(user_id=self.syndic.pk), ('default', False))
+        SyndicShard.objects.create(syndic=self.syndic, alias='default', read_only=True)
+
+        response = self.client.patch(f'/api/syndic/charges/{self.charge.pk}/', {'amount': '600.00'}, format='json')
+        self.assertEqual(response.status_code, 503)
+
+    def test_source_rows_kept_while_cached_maps_expire(self):
+        remaining = []
+        sleep = lambda seconds: remaining.append((seconds, Charge.objects.using('default').count()))
+        with mock.patch('myapp.services.shard_service.time.sleep', side_effect=sleep):
+            move_syndic(self.syndic.pk, 'shard_1', grace=0, source_delay=30)
+
+        self.assertEqual(remaining, [(0, 1), (30, 1)])
+        self.assertEqual(Charge.objects.using('default').count(), 0)
+
+    def test_shared_cache_required(self):
+        self.assertEqual([error.id for error in check_shard_cache(None)], ['myapp.E001'])
+        with override_settings(DATABASE_SHARDS=[]):
+            self.assertEqual(check_shard_cache(None), [])
+
+    def test_shards_allocate_disjoint_ids(self):
+        self.move()
+        other = User.objects.create_user(email='other@example.com', password='x', role='SYNDIC')
+        immeuble = Immeuble.objects.create(syndic=other, name='Rif', address='3 Rue C')
+        appartement = Appartement.objects.create(immeuble=immeuble, number='B1', floor=1, monthly_charge=Decimal('500'))
+        local = Charge.objects.create(appartement=appartement, description='March', amount=Decimal('500'), due_date=date(2026, 3, 31))
+        moved_charge = Charge.objects.using('shard_1').get(pk=self.charge.pk)
+        with using_shard('shard_1'):
+            moved = make_payment(moved_charge, self.resident, '100.00')
+        here = ResidentPayment.objects.using('default').create(
+            resident=self.resident, syndic=other, appartement=appartement, charge=local,
+            amount=Decimal('100.00'), payment_method='BANK_TRANSFER'
+        )
+
+        self.assertGreaterEqual(moved.pk, id_range('shard_1')[0])
+        self.assertLess(here.pk, id_range('shard_1')[0])
+        admin = User.objects.create_user(email='admin@example.com', password='x', role='ADMIN')
+        client = APIClient()
+        client.force_authenticate(admin)
+        self.assertEqual(client.post(f'/api/syndic/payments/{moved.pk}/confirm/').status_code, 200)
+        self.assertEqual(ResidentPayment.objects.using('shard_1').get(pk=moved.pk).status, 'CONFIRMED')
+        self.assertEqual(ResidentPayment.objects.using('default').get(pk=here.pk).status, 'PENDING')
+
+    def test_admin_refuses_ids_found_on_two_shards(self):
+        self.move()
+        other = User.objects.create_user(email='other@example.com', password='x', role='SYNDIC')
+        immeuble = Immeuble.objects.create(syndic=other, name='Rif', address='3 Rue C')
+        appartement = Appartement.objects.create(immeuble=immeuble, number='B1', floor=1, monthly_charge=Decimal('500'))
+        local = Charge.objects.create(appartement=appartement, description='March', amount=Decimal('500'), due_date=date(2026, 3, 31))
+        payment = ResidentPayment.objects.using('shard_1').filter(charge_id=self.charge.pk).first()
+        # Ids handed out before the shards had their own ranges
+        ResidentPayment.objects.using('default').create(
+            pk=payment.pk, resident=self.resident, syndic=other, appartement=appartement, charge=local,
+            amount=Decimal('100.00'), payment_method='BANK_TRANSFER'
+        )
+        ResidentPayment.objects.using('shard_1').filter(pk=payment.pk).update(status='PENDING')
+        admin = User.objects.create_user(email='admin@example.com', password='x', role='ADMIN')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        self.assertEqual(client.post(f'/api/syndic/payments/{payment.pk}/confirm/').status_code, 400)
+        response = client.post('/api/syndic/payments/bulk_confirm/', {'payment_ids': [payment.pk]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ResidentPayment.objects.using('default').get(pk=payment.pk).status, 'PENDING')
+        self.assertEqual(ResidentPayment.objects.using('shard_1').get(pk=payment.pk).status, 'PENDING')
+
+    def test_sqlite_shard_refuses_ids_past_its_range(self):
+        self.move()
+        with using_shard('shard_1'):
+            make_payment(Charge.objects.using('shard_1').get(pk=self.charge.pk), self.resident, '100.00')
+
+        with self.assertRaises(CommandError):
+            call_command('move_syndic', self.syndic.pk, 'default', grace=0, source_delay=0, stdout=io.StringIO())
+        self.assertEqual(SyndicShard.objects.get(syndic=self.syndic).alias, 'shard_1')
+
+    def test_admin_settles_payments_on_any_shard(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        first = make_payment(self.charge, self.resident, '100.00')
+        first.payment_proof.save('scan.txt', ContentFile(b'receipt'))
+        second = make_payment(self.charge, self.resident, '100.00')
+        self.move()
+        admin = User.objects.create_user(email='admin@example.com', password='x', role='ADMIN')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        self.assertEqual(client.get(f'/api/proofs/resident-payments/{first.pk}/').status_code, 200)
+        response = client.post(f'/api/syndic/payments/{first.pk}/confirm/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ResidentPayment.objects.using('shard_1').get(pk=first.pk).status, 'CONFIRMED')
+
+        response = client.post('/api/syndic/payments/bulk_reject/', {'payment_ids': [second.pk, 999999]}, format='json')
+        self.assertEqual(response.data['data']['processed'], 1)
+        self.assertEqual([r['payment_id'] for r in response.data['data']['results']], [second.pk, 999999])
+        self.assertEqual(ResidentPayment.objects.using('shard_1').get(pk=second.pk).status, 'REJECTED')
+
+    def test_failed_move_rolls_back(self):
+        immeuble = self.charge.appartement.immeuble
+        other = User.objects.create_user(email='other@example.com', password='x', role='SYNDIC')
+        mirror_users('shard_1', [other.pk])
+        Immeuble.objects.using('shard_1').create(pk=immeuble.pk, syndic=other, name='Taken', address='2 Rue B')
+
+        with self.assertRaises(CommandError):
+            self.move()
+        self.assertEqual(Charge.objects.using('default').count(), 1)
+        self.assertEqual(Charge.objects.using('shard_1').count(), 0)
+        shard = SyndicShard.objects.get(syndic=self.syndic)
+        self.assertEqual((shard.alias, shard.read_only), ('default', False))
+
+    def test_users_follow_their_shard(self):
+        self.move()
+
+        self.syndic.first_name = 'Karim'
+        self.syndic.save()
+        self.assertEqual(User.objects.using('shard_1').get(pk=self.syndic.pk).first_name, 'Karim')
+        new_resident = User.objects.create_user(
+            email='new@example.com', password='x', role='RESIDENT', created_by_syndic=self.syndic
+        )
+        self.assertTrue(User.objects.using('shard_1').filter(pk=new_resident.pk).exists())
+
+        self.syndic.delete()
+        self.assertEqual(Immeuble.objects.using('shard_1').count(), 0)
+        self.assertEqual(Charge.objects.using('shard_1').count(), 0)
+
+    def test_admin_totals_fan_out(self):
+        self.move()
+        other = User.objects.create_user(email='other@example.com', password='x', role='SYNDIC')
+        Immeuble.objects.create(syndic=other, name='Rif', address='3 Rue C')
+        admin = User.objects.create_user(email='admin@example.com', password='x', role='ADMIN')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        response = client.get('/api/admin/syndics/dashboard_stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['total_buildings'], 2)
+        self.assertEqual(response.data['data']['total_apartments'], 1)
+        self.assertEqual(response.data['data']['occupied_apartments'], 1)
+
+        response = client.get(f'/api/admin/syndics/{self.syndic.pk}/statistics/')
+        self.assertEqual(response.data['data']['overview']['total_buildings'], 1)
+
+
+class SettlementConcurrencyTests(TransactionTestCase):
+    """Hammer one charge from many threads and check the totals stay exact"""
+
+    THREADS = 16
+
+    def setUp(self):
+        self.charge, self.resident = make_charge(amount='1600.00')
+
+    def test_concurrent_confirms_are_exact(self):
+        payments = [make_payment(self.charge, self.resident, '100.00') for _ in range(self.THREADS)]
+
+        _, errors = run_concurrently(confirm_payment, [(p,) for p in payments])
+
+        self.assertEqual(errors, [])
+        self.charge.refresh_from_db()
+        self.assertEqual(self.charge.paid_amount, Decimal('1600.00'))
+        self.assertEqual(self.charge.status, 'PAID')
+
+    def test_concurrent_confirms_of_same_payment_apply_once(self):
+        payment = make_payment(self.charge, self.resident, '100.00')
+
+        results, errors = run_concurrently(
+            lambda: confirm_payment(ResidentPayment.objects.get(pk=payment.pk)),
+            [()] * self.THREADS
+        )
+
+        self.assertEqual(len(results), 1)
+        self.assertTrue(all(isinstance(e, ValueError) for e in errors))
+        self.charge.refresh_from_db()
+        self.assertEqual(self.charge.paid_amount, Decimal('100.00'))
+
+    def test_concurrent_pay_claims_remaining_once(self):
+        results, errors = run_concurrently(
+            submit_payment,
+            [(self.charge.id, self.resident, 'BANK_TRANSFER')] * self.THREADS
+        )
+
+        self.assertEqual(len(results), 1)
+        self.assertTrue(all(isinstance(e, ValueError) for e in errors))
+        self.assertEqual(ResidentPayment.objects.filter(charge=self.charge).count(), 1)
+
+    def test_concurrent_pay_and_confirm(self):
+        confirmed = [make_payment(self.charge, self.resident, '50.00') for _ in range(self.THREADS)]
+
+        def pay():
+            return submit_payment(self.charge.id, self.resident, 'BANK_TRANSFER')
+
+        _, errors = run_concurrently(
+            lambda p: confirm_payment(p) if p else pay(),
+            [(p,) for p in confirmed] + [(None,)] * 4
+        )
+
+        self.assertTrue(all(isinstance(e, ValueError) for e in errors))
+        self.charge.refresh_from_db()
+        self.assertEqual(self.charge.paid_amount, Decimal('800.00'))
+        self.assertEqual(self.charge.status, 'PARTIALLY_PAID')
+        pending = ResidentPayment.objects.filter(charge=self.charge, status='PENDING')
+        self.assertLessEqual(sum(p.amount for p in pending), Decimal('800.00'))
@@ -1,29 +1,131 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
 from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 
 
-class LoginRateThrottle(AnonRateThrottle):
+# ==========================
+# Shared sliding-window throttling
+# ==========================
+#
+# DRF's SimpleRateThrottle keeps a timestamp list per client in the cache:
+# every check reads, trims and rewrites the whole list, and with a per-process
+# cache each worker enforces its own limit. Here each client has one integer
+# counter per fixed window, incremented atomically in the shared cache
+# (THROTTLE_CACHE), and the limit applies to the sliding estimate
+#
+#     previous_window_count * (1 - elapsed_fraction) + current_window_count
+#
+# which smooths the burst a plain fixed window allows at its boundary. A check
+# is one INCR + EXPIRE + GET round trip on Redis, whatever the rate.
+
+
+def throttle_cache():
+    return caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+
+
+def _hit(cache, current_key, previous_key, ttl):
+    """Atomically count a hit; returns (current window count, previous window count)"""
+    if isinstance(cache, RedisCache):
+        client = cache._cache.get_client(current_key, write=True)
+        pipe = client.pipeline(transaction=False)
+        pipe.incr(cache.make_and_validate_key(current_key))
+        pipe.expire(cache.make_and_validate_key(current_key), ttl)
+        pipe.get(cache.make_and_validate_key(previous_key))
+        current, _, previous = pipe.execute()
+        return current, int(previous or 0)
+
+    # Memcached incr is atomic, LocMem's is under its lock
+    cache.add(current_key, 0, ttl)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:  # expired between add() and incr()
+        cache.add(current_key, 0, ttl)
+        current = cache.incr(current_key)
+    return current, cache.get(previous_key, 0)
+
+
+class SlidingWindowRateThrottle:
+    """
+    Mixin for SimpleRateThrottle subclasses (uses their rate, scope and
+    get_cache_key) that replaces the history list with window counters.
+    """
+
+    @property
+    def cache(self):
+        return throttle_cache()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, self.elapsed = divmod(self.now, self.duration)
+        current_key = f'{self.key}:{int(window)}'
+        self.current, self.previous = _hit(
+            self.cache, current_key, f'{self.key}:{int(window) - 1}', self.duration * 2
+        )
+
+        if self._estimate(self.current) > self.num_requests:
+            # A refused request does not use up quota
+            self.cache.decr(current_key)
+            self.current -= 1
+            return self.throttle_failure()
+        return True
+
+    def _estimate(self, current):
+        return self.previous * (1 - self.elapsed / self.duration) + current
+
+    def wait(self):
+        """Seconds until one more request fits under the sliding estimate"""
+        if self.current + 1 > self.num_requests:
+            # Only the next window can make room
+            return self.duration - self.elapsed
+        if not self.previous:
+            return 0
+        # The previous window's weight must decay enough to fit one request
+        room = self.num_requests - self.current - 1
+        decay_until = self.duration * (1 - room / self.previous)
+        return max(decay_until - self.elapsed, 0)
+
+
+class SharedAnonRateThrottle(SlidingWindowRateThrottle, AnonRateThrottle):
+    pass
+
+
+class SharedUserRateThrottle(SlidingWindowRateThrottle, UserRateThrottle):
+    pass
+
+
+class LoginRateThrottle(SharedAnonRateThrottle):
     """
     Throttle for login attempts to prevent brute force attacks
     """
     scope = 'login'
 
 
-class RegisterRateThrottle(AnonRateThrottle):
+class RegisterRateThrottle(SharedAnonRateThrottle):
     """
     Throttle for registration to prevent spam accounts
     """
     scope = 'register'
 
 
-class PasswordResetRateThrottle(AnonRateThrottle):
+class PasswordResetRateThrottle(SharedAnonRateThrottle):
     """
     Throttle for password reset requests
     """
+    scope = 'password_reset'
     rate = '3/hour'
 
 
-class PasswordChangeRateThrottle(UserRateThrottle):
+class PasswordChangeRateThrottle(SharedUserRateThrottle):
     """
     Throttle for password change attempts
     """
-    rate = '5/hour'
\ No newline at end of file
+    scope = 'password_change'
+    rate = '5/hour'
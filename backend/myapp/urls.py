@@ -17,6 +17,8 @@ from .views import (
     admin_dashboard,
     syndic_dashboard,
     resident_dashboard,
+    revenue_analytics,
+    aging_analytics,
     ImmeubleViewSet,
     AppartementViewSet,
     ResidentViewSet,
@@ -28,6 +30,9 @@ from .views import (
     ResidentPaymentViewSet,
     ResidentChargeViewSet,
     SyndicPaymentViewSet,
+    payment_proof,
+    resident_payment_proof,
+    UploadSessionViewSet,
 ) 
 
 router = DefaultRouter()
@@ -61,6 +66,9 @@ router.register(
     basename="syndic-payments"
 )
 
+# Resumable proof uploads (any authenticated user, sessions are per user)
+router.register(r'uploads', UploadSessionViewSet, basename='upload-session')
+
 
 
 urlpatterns = [
@@ -79,6 +87,14 @@ urlpatterns = [
     path('syndic/dashboard/', syndic_dashboard, name='syndic_dashboard'),
     path('resident/dashboard/', resident_dashboard, name='resident_dashboard'),
     
+    # Reporting (syndics see their own data; revenue also serves admins)
+    path('analytics/revenue/', revenue_analytics, name='revenue_analytics'),
+    path('analytics/aging/', aging_analytics, name='aging_analytics'),
+    
+    # Payment proof downloads (ownership checked, file sent by the front server)
+    path('proofs/payments/<int:pk>/', payment_proof, name='payment-proof'),
+    path('proofs/resident-payments/<int:pk>/', resident_payment_proof, name='resident-payment-proof'),
+    
     path("chatbot/", include("chatbot.urls")),
 
     path('', include(router.urls)),
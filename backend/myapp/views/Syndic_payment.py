@@ -1,13 +1,25 @@
-from django.db import models
+import contextlib
+
+from django.core.exceptions import ValidationError
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from myapp.models import ResidentPayment, Payment, Subscription, SubscriptionPlan
+from myapp.admission import expensive
+from myapp.models import ResidentPayment, Payment, Subscription, SubscriptionPlan, UploadSession
 from myapp.permissions import IsAdminOrSyndic
 from myapp.serializers import PaymentSerializer
+from myapp.services.reconciliation_service import reconcile_statement
+from myapp.services.settlement_service import (
+    confirm_payment, reject_payment, reverse_payment, confirm_payments, reject_payments
+)
+from myapp.sharding import fan_out, shard_of, shards_of, sharding_enabled, using_shard
+
+
+BULK_PAYMENT_LIMIT = 1000
 
 
 class SyndicPaymentViewSet(viewsets.ModelViewSet):
@@ -15,8 +27,10 @@ class SyndicPaymentViewSet(viewsets.ModelViewSet):
     Admin and Syndic can:
     - List syndic subscription payments
     - Create new payments for subscriptions (syndic only)
-    - Confirm a payment (admin only)
-    - Reject a payment (admin only)
+    - Confirm a resident payment (settles the charge)
+    - Reject a resident payment
+    - Bulk confirm/reject resident payments
+    - Reconcile a bank statement against pending payments
     """
 
     serializer_class = PaymentSerializer
@@ -60,6 +74,7 @@ class SyndicPaymentViewSet(viewsets.ModelViewSet):
         notes = request.data.get('notes', '')
         rib = request.data.get('rib', '')
         payment_proof = request.FILES.get('payment_proof')
+        upload_id = request.data.get('upload_id')
 
         if not subscription_id or not amount or not payment_method:
             return Response({
@@ -67,6 +82,21 @@ class SyndicPaymentViewSet(viewsets.ModelViewSet):
                 'message': 'Subscription ID, amount, and payment method are required'
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        # Large proofs can be sent beforehand through the resumable upload API
+        if upload_id and not payment_proof:
+            try:
+                upload = UploadSession.objects.filter(
+                    pk=upload_id, user=request.user, status='COMPLETED'
+                ).first()
+            except ValidationError:
+                upload = None
+            if upload is None:
+                return Response({
+                    'success': False,
+                    'message': 'Upload not found or not completed'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            payment_proof = upload.file_name
+
         try:
             # Get subscription - ensure it belongs to the current syndic
             try:
@@ -135,29 +165,25 @@ class SyndicPaymentViewSet(viewsets.ModelViewSet):
     # -----------------------------
     @action(detail=True, methods=["post"])
     def confirm(self, request, pk=None):
-        payment = self.get_object()
-
-        if payment.status != "PENDING":
+        try:
+            with self._payment_shard(pk):
+                payment = self._get_resident_payment(pk)
+                charge = confirm_payment(payment)
+        except ValueError as e:
             return Response(
-                {"message": "Only pending payments can be confirmed"},
+                {"message": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        payment.status = "CONFIRMED"
-        payment.confirmed_at = timezone.now()
-        payment.save()
-
-        # Update charge status if this is a resident payment
-        if hasattr(payment, 'charge'):
-            self._update_charge_status(payment.charge)
-
         return Response(
             {
                 "success": True,
                 "message": "Payment confirmed successfully",
                 "data": {
                     "payment_id": payment.id,
+                    "charge_id": charge.id,
                     "payment_status": payment.status,
+                    "charge_status": charge.status,
                 }
             },
             status=status.HTTP_200_OK
@@ -168,19 +194,18 @@ class SyndicPaymentViewSet(viewsets.ModelViewSet):
     # -----------------------------
     @action(detail=True, methods=["post"])
     def reject(self, request, pk=None):
-        payment = self.get_object()
         reason = request.data.get("reason")
 
-        if payment.status != "PENDING":
+        try:
+            with self._payment_shard(pk):
+                payment = self._get_resident_payment(pk)
+                reject_payment(payment)
+        except ValueError as e:
             return Response(
-                {"message": "Only pending payments can be rejected"},
+                {"message": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        payment.status = "REJECTED"
-        payment.confirmed_at = timezone.now()
-        payment.save()
-
         return Response(
             {
                 "success": True,
@@ -195,26 +220,194 @@ class SyndicPaymentViewSet(viewsets.ModelViewSet):
         )
 
     # -----------------------------
-    # INTERNAL HELPER (CRITICAL)
+    # REVERSE A CONFIRMED PAYMENT
+    # -----------------------------
+    @action(detail=True, methods=["post"])
+    def reverse(self, request, pk=None):
+        """
+        Undo a confirmed payment (bounced transfer, confirmed by mistake)
+        POST /api/syndic/payments/{id}/reverse/
+        """
+        try:
+            with self._payment_shard(pk):
+                payment = self._get_resident_payment(pk)
+                charge = reverse_payment(payment)
+        except ValueError as e:
+            return Response(
+                {"message": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {
+                "success": True,
+                "message": "Payment reversed",
+                "data": {
+                    "payment_id": payment.id,
+                    "charge_id": charge.id,
+                    "payment_status": payment.status,
+                    "charge_status": charge.status,
+                }
+            },
+            status=status.HTTP_200_OK
+        )
+
+    # -----------------------------
+    # BULK CONFIRM / REJECT
     # -----------------------------
-    def _update_charge_status(self, charge):
+    @expensive
+    @action(detail=False, methods=["post"])
+    def bulk_confirm(self, request):
         """
-        Recalculate charge status based ONLY on CONFIRMED payments
+        Confirm many resident payments at once
+        POST /api/syndic/payments/bulk_confirm/
+        Body: {"payment_ids": [12, 13, 14]}
         """
+        return self._bulk_settle(request, confirm_payments, "confirmed")
 
-        confirmed_total = charge.payments.filter(
-            status="CONFIRMED"
-        ).aggregate(
-            total=models.Sum("amount")
-        )["total"] or 0
+    @expensive
+    @action(detail=False, methods=["post"])
+    def bulk_reject(self, request):
+        """
+        Reject many resident payments at once
+        POST /api/syndic/payments/bulk_reject/
+        Body: {"payment_ids": [12, 13, 14], "reason": "..."}
+        """
+        return self._bulk_settle(request, reject_payments, "rejected")
 
-        charge.paid_amount = confirmed_total
+    def _bulk_settle(self, request, settle, verb):
+        payment_ids = request.data.get("payment_ids")
 
-        if confirmed_total >= charge.amount:
-            charge.status = "PAID"
-        elif confirmed_total > 0:
-            charge.status = "PARTIALLY_PAID"
+        if not isinstance(payment_ids, list) or not payment_ids:
+            return Response({
+                "success": False,
+                "message": "payment_ids must be a non-empty list"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(payment_ids) > BULK_PAYMENT_LIMIT:
+            return Response({
+                "success": False,
+                "message": f"At most {BULK_PAYMENT_LIMIT} payments can be processed at once"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            payment_ids = list(dict.fromkeys(int(pk) for pk in payment_ids))
+        except (TypeError, ValueError):
+            return Response({
+                "success": False,
+                "message": "payment_ids must contain integers"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = self._settle_on_shards(settle, payment_ids)
+        except ValueError as e:
+            return Response({
+                "success": False,
+                "message": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        processed = sum(1 for r in results if r["success"])
+
+        return Response({
+            "success": True,
+            "message": f"{processed} of {len(results)} payments {verb}",
+            "data": {
+                "processed": processed,
+                "failed": len(results) - processed,
+                "reason": request.data.get("reason"),
+                "results": results,
+            }
+        }, status=status.HTTP_200_OK)
+
+    # -----------------------------
+    # BANK STATEMENT RECONCILIATION
+    # -----------------------------
+    @expensive
+    @action(detail=False, methods=["post"])
+    def reconcile(self, request):
+        """
+        Match an uploaded bank statement against pending payments
+        POST /api/syndic/payments/reconcile/
+        Multipart: statement=<file>, format=csv|mt940|camt (optional),
+                   dry_run=true (optional)
+
+        Syndics reconcile the resident payments addressed to them, admins
+        reconcile syndic subscription payments.
+        """
+        statement = request.FILES.get("statement")
+        if not statement:
+            return Response({
+                "success": False,
+                "message": "A statement file is required"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.user.is_admin:
+            scope = {"payments": Payment.objects.all()}
         else:
-            charge.status = "UNPAID"
+            scope = {"resident_payments": self._resident_payments()}
+
+        try:
+            result = reconcile_statement(
+                statement,
+                statement_format=request.data.get("format") or None,
+                auto_confirm=str(request.data.get("dry_run", "")).lower() != "true",
+                **scope
+            )
+        except (ValueError, SyntaxError) as e:
+            return Response({
+                "success": False,
+                "message": f"Could not read statement: {str(e)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "success": True,
+            "message": (
+                f"{result['summary']['exact']} exact matches, "
+                f"{result['summary']['review']} to review"
+            ),
+            "data": result
+        }, status=status.HTTP_200_OK)
+
+    # -----------------------------
+    # INTERNAL HELPERS
+    # -----------------------------
+    def _resident_payments(self):
+        """
+        Confirm/reject act on resident payments: any of them for admins,
+        only the ones addressed to the syndic otherwise
+        """
+        payments = ResidentPayment.objects.all()
+        if not self.request.user.is_admin:
+            payments = payments.filter(syndic=self.request.user)
+        return payments
+
+    def _get_resident_payment(self, pk):
+        return get_object_or_404(self._resident_payments(), pk=pk)
+
+    def _payment_shard(self, pk):
+        """
+        Route the block to the shard holding resident payment `pk`: syndic
+        requests already are on their shard, admin requests are on 'default'
+        """
+        if not self.request.user.is_admin:
+            return contextlib.nullcontext()
+        return using_shard(shard_of(ResidentPayment, pk))
+
+    def _settle_on_shards(self, settle, payment_ids):
+        """Bulk settle on the request's shard, or for admins on the shard of each payment"""
+        if not self.request.user.is_admin or not sharding_enabled():
+            return settle(self._resident_payments(), payment_ids)
+
+        located = shards_of(ResidentPayment, payment_ids)
+
+        def settle_on(alias):
+            ids = [pk for pk in payment_ids if located.get(pk) == alias]
+            if not ids:
+                return []
+            with using_shard(alias):
+                return settle(ResidentPayment.objects.all(), ids)
 
-        charge.save(update_fields=["paid_amount", "status"])
\ No newline at end of file
+        results = {result["payment_id"]: result for results in fan_out(settle_on) for result in results}
+        return [
+            results.get(pk) or {"payment_id": pk, "success": False, "message": "Payment not found"}
+            for pk in payment_ids
+        ]
@@ -74,6 +74,20 @@ from .Syndic_payment import (
     SyndicPaymentViewSet
 )
 
+from .uploads import (
+    UploadSessionViewSet
+)
+
+from .proofs import (
+    payment_proof,
+    resident_payment_proof
+)
+
+from .analytics import (
+    revenue_analytics,
+    aging_analytics
+)
+
 
 __all__ = [
     # Authentication views
@@ -90,6 +104,10 @@ __all__ = [
     'syndic_dashboard',
     'resident_dashboard',
     
+    # Analytics views
+    'revenue_analytics',
+    'aging_analytics',
+    
     # Admin management views
     'SyndicAdminViewSet',
     
@@ -114,6 +132,11 @@ __all__ = [
     'ResidentChargeViewSet',
     'SyndicPaymentViewSet',
     
+    # Proof uploads/downloads
+    'UploadSessionViewSet',
+    'payment_proof',
+    'resident_payment_proof',
+    
     # Chatbot views
     'chatbot_message',
 ]
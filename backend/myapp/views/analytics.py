@@ -0,0 +1,82 @@
+import csv
+from datetime import date
+
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from ..admission import expensive
+from ..permissions import IsAdminOrSyndic, IsSyndic
+from ..replicas import use_replica
+from ..services.analytics_service import AGING_BUCKETS, aging_report, revenue_series
+from .apparetments import Echo
+
+
+@expensive
+@api_view(['GET'])
+@permission_classes([IsAdminOrSyndic])
+@use_replica
+def revenue_analytics(request):
+    """
+    Billed, collected and outstanding amounts over time
+    GET /api/analytics/revenue/?granularity=day|week|month&start=YYYY-MM-DD&end=YYYY-MM-DD
+        &group_by=building|payment_method (admins: &syndic_id=, else every syndic)
+    """
+    params = request.query_params
+    try:
+        start = date.fromisoformat(params['start']) if params.get('start') else None
+        end = date.fromisoformat(params['end']) if params.get('end') else None
+        syndic_id = request.user.pk if request.user.is_syndic else params.get('syndic_id')
+        granularity = params.get('granularity', 'month')
+        group_by = params.get('group_by') or None
+        series = revenue_series(
+            syndic_id=int(syndic_id) if syndic_id else None,
+            start=start, end=end, granularity=granularity, group_by=group_by
+        )
+    except ValueError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': True,
+        'data': {
+            'granularity': granularity,
+            'group_by': group_by,
+            'series': series
+        }
+    })
+
+
+@expensive
+@api_view(['GET'])
+@permission_classes([IsSyndic])
+@use_replica
+def aging_analytics(request):
+    """
+    Outstanding amounts by days past due, per building and per resident
+    GET /api/analytics/aging/ (?output=csv streams one line per building and resident)
+    """
+    report = aging_report(request.user.pk)
+    if request.query_params.get('output') != 'csv':
+        return Response({
+            'success': True,
+            'data': report
+        })
+
+    columns = [key for key, _, _ in AGING_BUCKETS] + ['total']
+    writer = csv.writer(Echo())
+
+    def rows():
+        yield writer.writerow(['building', 'resident', 'email', *columns])
+        for row in report['rows']:
+            yield writer.writerow([
+                row['building_name'], row['resident_name'] or '', row['resident_email'] or '',
+                *(row[column] for column in columns),
+            ])
+
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="aging-{report["as_of"]}.csv"'
+    return response
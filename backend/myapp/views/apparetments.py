@@ -1,12 +1,24 @@
+import csv
+
+from django.http import StreamingHttpResponse
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q, Sum
 
+from ..admission import expensive
 from ..models import User, Immeuble, Appartement, Charge, Reclamation
+from ..projections import AppartementProjection
 from ..serializers import ImmeubleSerializer, AppartementSerializer, UserSerializer
 from ..permissions import IsSyndic
+from ..services.ledger_service import apartment_balance, iter_statement
+
+
+class Echo:
+    """File-like object whose write() just returns the line, for streaming csv"""
+    def write(self, value):
+        return value
 
 
 class AppartementViewSet(viewsets.ModelViewSet):
@@ -55,12 +67,12 @@ class AppartementViewSet(viewsets.ModelViewSet):
                 Q(immeuble__name__icontains=search)
             )
         
-        serializer = self.get_serializer(queryset, many=True)
+        data = AppartementProjection(self.get_serializer_context()).data(queryset)
         
         return Response({
             'success': True,
-            'data': serializer.data,
-            'count': queryset.count()
+            'data': data,
+            'count': len(data)
         })
     
     def create(self, request, *args, **kwargs):
@@ -106,10 +118,7 @@ class AppartementViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(apartment)
         
         # Get additional info
-        unpaid_charges = Charge.objects.filter(
-            appartement=apartment,
-            status__in=['UNPAID', 'OVERDUE', 'PARTIALLY_PAID']
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        unpaid_charges = apartment_balance(apartment.id)
         
         extra_info = {
             'unpaid_charges': float(unpaid_charges),
@@ -222,6 +231,33 @@ class AppartementViewSet(viewsets.ModelViewSet):
             'data': self.get_serializer(apartment).data
         })
     
+    @expensive
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        """
+        Stream the apartment account statement as CSV, oldest entry first
+        GET /api/syndic/apartments/{id}/statement/
+        """
+        apartment = self.get_object()
+        writer = csv.writer(Echo())
+
+        def rows():
+            yield writer.writerow(['date', 'entry', 'description', 'debit', 'credit', 'balance'])
+            for entry, running in iter_statement(apartment.id):
+                delta = entry.balance_delta
+                yield writer.writerow([
+                    entry.posted_at.date().isoformat(),
+                    entry.entry_type,
+                    entry.description,
+                    delta if delta > 0 else '',
+                    -delta if delta < 0 else '',
+                    running,
+                ])
+
+        response = StreamingHttpResponse(rows(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="statement-apt-{apartment.id}.csv"'
+        return response
+    
     def _check_apartment_limit(self):
         """Check if syndic can create more apartments based on subscription"""
         try:
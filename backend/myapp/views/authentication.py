@@ -3,7 +3,6 @@ from rest_framework.decorators import api_view, permission_classes, throttle_cla
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from ..serializers import (
@@ -14,6 +13,8 @@ from ..serializers import (
     LogoutSerializer
 )
 from ..permissions import IsAdmin, IsSyndic, IsResident
+from ..services.login_service import record_login
+from ..tokens import RefreshToken
 from ..throttling import (
     LoginRateThrottle, 
     RegisterRateThrottle, 
@@ -31,23 +32,21 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     throttle_classes = [LoginRateThrottle]
     
     def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
         try:
-            response = super().post(request, *args, **kwargs)
-            
-            # Log successful login
-            if response.status_code == 200:
-                email = request.data.get('email')
-                user = User.objects.get(email=email)
-                # You can log this to a login history table
-                
-            return response
-        except Exception as e:
+            serializer.is_valid(raise_exception=True)
+        except Exception:
             # Log failed login attempt
+            record_login(request, email=request.data.get('email'))
             return Response(
                 {'detail': 'Invalid credentials or account inactive.'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
+        # Log successful login (also sets last_login, see SIMPLE_JWT)
+        record_login(request, user=serializer.user)
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
+
 
 class RegisterView(generics.CreateAPIView):
     """
@@ -2,14 +2,19 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Q
-from django.db import transaction
+from django.db.models import Count, Sum, Q
+from django.db import router, transaction
 from django.utils import timezone
 from datetime import datetime
 
-from ..models import Charge, Appartement, Immeuble, ResidentPayment
+from ..models import Charge, Appartement, Immeuble, ResidentPayment, ArchivedCharge, ArchivedResidentPayment
+from ..admission import expensive
+from ..projections import ChargeProjection
 from ..serializers import ChargeSerializer
 from ..permissions import IsSyndic
+from ..services.ledger_service import post_charges, post_charge_adjustment
+from ..services.settlement_service import recalculate_charges
+from ..replicas import use_replica
 
 
 class ChargeViewSet(viewsets.ModelViewSet):
@@ -36,42 +41,56 @@ class ChargeViewSet(viewsets.ModelViewSet):
     # LIST
     # ------------------------------------------------------------------
     def list(self, request):
-        queryset = self.get_queryset()
+        """
+        GET /api/syndic/charges/ (?include_archived=true adds archived charges)
+        """
+        params = request.query_params
+        queryset = self._filter(self.get_queryset(), params)
+        projection = ChargeProjection(self.get_serializer_context())
+
+        if params.get('include_archived') == 'true':
+            archived = self._filter(
+                ArchivedCharge.objects.filter(appartement__immeuble__syndic=request.user), params
+            )
+            data = projection.rows(projection.union([queryset, archived]))
+        else:
+            data = projection.data(queryset)
+
+        return Response({
+            'success': True,
+            'count': len(data),
+            'data': data
+        })
 
-        status_filter = request.query_params.get('status')
+    def _filter(self, queryset, params):
+        """List filters; `queryset` is of Charge or ArchivedCharge"""
+        status_filter = params.get('status')
         if status_filter:
             queryset = queryset.filter(status=status_filter)
 
-        building_id = request.query_params.get('building_id')
+        building_id = params.get('building_id')
         if building_id:
             queryset = queryset.filter(appartement__immeuble_id=building_id)
 
-        apartment_id = request.query_params.get('apartment_id')
+        apartment_id = params.get('apartment_id')
         if apartment_id:
             queryset = queryset.filter(appartement_id=apartment_id)
 
-        overdue = request.query_params.get('overdue')
+        overdue = params.get('overdue')
         if overdue == 'true':
             queryset = queryset.filter(
                 status__in=['UNPAID', 'PARTIALLY_PAID'],
                 due_date__lt=timezone.now().date()
             )
 
-        search = request.query_params.get('search')
+        search = params.get('search')
         if search:
             queryset = queryset.filter(
                 Q(description__icontains=search) |
                 Q(appartement__number__icontains=search) |
                 Q(appartement__immeuble__name__icontains=search)
             )
-
-        serializer = self.get_serializer(queryset, many=True)
-
-        return Response({
-            'success': True,
-            'count': queryset.count(),
-            'data': serializer.data
-        })
+        return queryset
 
     # ------------------------------------------------------------------
     # CREATE CHARGE
@@ -87,7 +106,9 @@ class ChargeViewSet(viewsets.ModelViewSet):
 
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(status='UNPAID')
+        with transaction.atomic(using=router.db_for_write(Charge)):
+            charge = serializer.save(status='UNPAID')
+            post_charges([charge])
 
         return Response({
             'success': True,
@@ -128,9 +149,15 @@ class ChargeViewSet(viewsets.ModelViewSet):
     # ------------------------------------------------------------------
     def update(self, request, pk=None):
         charge = self.get_object()
+        old_amount = charge.amount
         serializer = self.get_serializer(charge, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic(using=router.db_for_write(Charge)):
+            charge = serializer.save()
+            if charge.amount != old_amount:
+                post_charge_adjustment(charge, old_amount)
+                recalculate_charges(Charge.objects.filter(pk=charge.pk))
+                charge.refresh_from_db()
 
         return Response({
             'success': True,
@@ -154,7 +181,11 @@ class ChargeViewSet(viewsets.ModelViewSet):
                 'message': 'Cannot delete a charge with payments'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        charge.delete()
+        with transaction.atomic(using=router.db_for_write(Charge)):
+            old_amount = charge.amount
+            charge.amount = 0
+            post_charge_adjustment(charge, old_amount)
+            charge.delete()
 
         return Response({
             'success': True,
@@ -164,6 +195,7 @@ class ChargeViewSet(viewsets.ModelViewSet):
     # ------------------------------------------------------------------
     # BULK CREATE
     # ------------------------------------------------------------------
+    @expensive
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
         building_id = request.data.get('building_id')
@@ -185,42 +217,30 @@ class ChargeViewSet(viewsets.ModelViewSet):
         due_date = datetime.strptime(due_date, '%Y-%m-%d').date()
         apartments = Appartement.objects.filter(immeuble_id=building_id)
 
-        with transaction.atomic():
-            for apartment in apartments:
-                Charge.objects.create(
+        with transaction.atomic(using=router.db_for_write(Charge)):
+            charges = Charge.objects.bulk_create([
+                Charge(
                     appartement=apartment,
                     description=description,
                     amount=apartment.monthly_charge,
                     due_date=due_date,
                     status='UNPAID'
                 )
+                for apartment in apartments
+            ])
+            post_charges(charges)
 
         return Response({
             'success': True,
-            'message': f'{apartments.count()} charges created successfully'
+            'message': f'{len(charges)} charges created successfully'
         }, status=status.HTTP_201_CREATED)
 
-    # ------------------------------------------------------------------
-    # RECALCULATE STATUS (INTERNAL)
-    # ------------------------------------------------------------------
-    def _recalculate_charge_status(self, charge):
-        confirmed_total = charge.payments.filter(
-            status='CONFIRMED'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-
-        if confirmed_total >= charge.amount:
-            charge.status = 'PAID'
-        elif confirmed_total > 0:
-            charge.status = 'PARTIALLY_PAID'
-        else:
-            charge.status = 'UNPAID'
-
-        charge.save(update_fields=['status'])
-
     # ------------------------------------------------------------------
     # STATISTICS
     # ------------------------------------------------------------------
+    @expensive
     @action(detail=False, methods=['get'])
+    @use_replica
     def statistics(self, request):
         queryset = self.get_queryset()
         today = timezone.now().date()
@@ -241,9 +261,21 @@ class ChargeViewSet(viewsets.ModelViewSet):
             ).aggregate(total=Sum('amount'))['total'] or 0
             unpaid_amount += max(charge.amount - paid, 0)
 
+        # Archived charges are all PAID
+        archived = {'count': 0, 'total': 0}
+        if request.query_params.get('include_archived') == 'true':
+            archived = ArchivedCharge.objects.filter(
+                appartement__immeuble__syndic=request.user
+            ).aggregate(count=Count('pk'), total=Sum('amount'))
+            total_amount += archived['total'] or 0
+            confirmed_payments += ArchivedResidentPayment.objects.filter(
+                charge__appartement__immeuble__syndic=request.user,
+                status='CONFIRMED'
+            ).aggregate(total=Sum('amount'))['total'] or 0
+
         stats = {
-            'total_charges': queryset.count(),
-            'paid': queryset.filter(status='PAID').count(),
+            'total_charges': queryset.count() + archived['count'],
+            'paid': queryset.filter(status='PAID').count() + archived['count'],
             'partially_paid': queryset.filter(status='PARTIALLY_PAID').count(),
             'unpaid': queryset.filter(status='UNPAID').count(),
             'overdue': queryset.filter(
@@ -9,12 +9,17 @@ from django.utils import timezone
 from datetime import timedelta
 from ..models import User, Subscription, Payment, Immeuble, Appartement, Reclamation, Reunion, Charge, ResidentProfile, ResidentPayment
 from ..serializers import ChargeSerializer
+from ..services.ledger_service import total_balance
+from ..admission import expensive
+from ..replicas import use_replica
+from ..conditional import collection_validators, not_modified, set_validators
 
 User = get_user_model()
 
 
 @api_view(['GET'])
 @permission_classes([IsAdmin])
+@use_replica
 def admin_dashboard(request):
     """
     Admin dashboard endpoint with complete statistics
@@ -172,8 +177,10 @@ def admin_dashboard(request):
     })
 
 
+@expensive
 @api_view(['GET'])
 @permission_classes([IsSyndic])
+@use_replica
 def syndic_dashboard(request):
     """
     Enhanced Syndic dashboard with comprehensive statistics
@@ -181,6 +188,24 @@ def syndic_dashboard(request):
     """
     syndic = request.user
     today = timezone.now().date()
+
+    # Every table the figures below are computed from; month and "urgent"
+    # cutoffs move with the date, upcoming reunions with the clock
+    etag, last_modified = collection_validators(
+        request,
+        Immeuble.objects.filter(syndic=syndic),
+        Appartement.objects.filter(immeuble__syndic=syndic),
+        User.objects.filter(role='RESIDENT', created_by_syndic=syndic),
+        Charge.objects.filter(appartement__immeuble__syndic=syndic),
+        Reunion.objects.filter(syndic=syndic, status='SCHEDULED', date_time__gt=timezone.now()),
+        Reclamation.objects.filter(appartement__immeuble__syndic=syndic),
+        Subscription.objects.filter(syndic_profile__user=syndic),
+        extra=[syndic.updated_at, today],
+    )
+    cached = not_modified(request, etag, last_modified)
+    if cached:
+        return cached
+
     current_month_start = timezone.make_aware(
         timezone.datetime.combine(today.replace(day=1), timezone.datetime.min.time())
     )
@@ -206,17 +231,15 @@ def syndic_dashboard(request):
     # RESIDENTS STATISTICS
     # ====================
     apartments = Appartement.objects.filter(immeuble__syndic=syndic)
-    total_residents = User.objects.filter(
-        role='RESIDENT',
-        appartements__in=apartments
-    ).distinct().count()
+    # Counted from the apartments: they live on the syndic's shard, with a
+    # copy of their residents
+    residents = apartments.filter(resident__role='RESIDENT').values('resident').distinct()
+    total_residents = residents.count()
     
     # Residents added this month
-    residents_this_month = User.objects.filter(
-        role='RESIDENT',
-        appartements__in=apartments,
-        created_at__gte=current_month_start
-    ).distinct().count()
+    residents_this_month = residents.filter(
+        resident__created_at__gte=current_month_start
+    ).count()
 
     # ==================== 
     # CHARGES STATISTICS
@@ -292,7 +315,7 @@ def syndic_dashboard(request):
         total=Sum('monthly_charge')
     )['total'] or 0
 
-    return Response({
+    return set_validators(Response({
         'success': True,
         'data': {
             'overview': {
@@ -314,7 +337,7 @@ def syndic_dashboard(request):
             'user': UserSerializer(syndic).data,
             'has_valid_subscription': syndic.has_valid_subscription
         }
-    })
+    }), etag, last_modified)
 
 @api_view(['GET'])
 @permission_classes([IsResident])
@@ -339,10 +362,8 @@ def resident_dashboard(request):
     # Charges for all resident apartments
     charges_qs = Charge.objects.filter(appartement__in=apartments)
 
-    # Total unpaid amount (UNPAID + PARTIALLY_PAID)
-    total_unpaid = charges_qs.filter(
-        status__in=['UNPAID', 'PARTIALLY_PAID']
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Outstanding balance across all apartments, read from the ledger
+    total_unpaid = total_balance(apartments)
 
     # Overdue charges count
     overdue_count = charges_qs.filter(
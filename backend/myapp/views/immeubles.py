@@ -8,6 +8,7 @@ from django.utils import timezone
 from ..models import User, Immeuble, Appartement
 from ..serializers import ImmeubleSerializer, AppartementSerializer, UserSerializer
 from ..permissions import IsSyndic
+from ..replicas import use_replica
 
 
 class ImmeubleViewSet(viewsets.ModelViewSet):
@@ -166,6 +167,7 @@ class ImmeubleViewSet(viewsets.ModelViewSet):
         return False
     
     @action(detail=False, methods=['get'])
+    @use_replica
     def statistics(self, request):
         """
         Get overall statistics for all buildings
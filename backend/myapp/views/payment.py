@@ -18,6 +18,7 @@ from ..serializers import (
     UserSerializer
 )
 from ..permissions import IsAdmin
+from ..replicas import use_replica
 
 
 # ============================================
@@ -559,6 +560,7 @@ class PaymentAdminViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=False, methods=['get'])
+    @use_replica
     def revenue_stats(self, request):
         """
         Get revenue statistics
@@ -575,22 +577,21 @@ class PaymentAdminViewSet(viewsets.ModelViewSet):
         if end_date:
             payments = payments.filter(payment_date__lte=end_date)
         
+        # Revenue by payment method, every valid method listed
+        by_method = dict.fromkeys((method for method, _ in Payment.PAYMENT_METHOD_CHOICES), 0)
+        by_method.update(
+            payments.order_by().values_list('payment_method').annotate(total=Sum('amount'))
+        )
+
         stats = {
-            'total_revenue': payments.aggregate(total=Sum('amount'))['total'] or 0,
+            'total_revenue': sum(by_method.values()),
             'total_payments': payments.count(),
-            'by_method': {},
+            'by_method': by_method,
             'pending_amount': Payment.objects.filter(
                 status='PENDING'
             ).aggregate(total=Sum('amount'))['total'] or 0
         }
         
-        # Revenue by payment method
-        for method in ['CASH', 'BANK_TRANSFER']:
-            amount = payments.filter(payment_method=method).aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            stats['by_method'][method] = amount
-        
         return Response({
             'success': True,
             'data': stats
@@ -0,0 +1,198 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied
+from rest_framework.permissions import AllowAny
+
+from ..conditional import etag_matches
+from ..models import Payment, ResidentPayment
+from ..proof_links import check_proof_signature
+from ..sharding import shard_of, tenant_db
+from ..services.preview_service import VARIANTS, preview_name
+
+
+CONTENT_HASH = re.compile(r'([0-9a-f]{64})(\.\w+)?$')
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK = 64 * 1024
+
+
+# ==========================
+# Protected file serving
+# ==========================
+#
+# Ownership is checked in Django, either on the authenticated user or through
+# the signed link the API handed out (see proof_links); the bytes are then
+# sent by the front server (nginx X-Accel-Redirect / Apache X-Sendfile) when
+# PROTECTED_MEDIA_SERVER is set. Without a proxy, FileResponse lets the WSGI
+# server use sendfile().
+
+def _etag(storage, name):
+    # Content-addressed names already are a strong validator
+    match = CONTENT_HASH.search(name)
+    if match:
+        return f'"{match.group(1)}"'
+    stat = os.stat(storage.path(name))
+    return f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def _parse_range(header, size):
+    """(start, end) inclusive for a single 'bytes=' range, None if absent, 'invalid' if unsatisfiable"""
+    match = RANGE_HEADER.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return 'invalid'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_CHUNK, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_protected_file(request, storage, name, download_name=None):
+    if not storage.exists(name):
+        return _not_found()
+
+    etag = _etag(storage, name)
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    server = getattr(settings, 'PROTECTED_MEDIA_SERVER', '')
+
+    if server == 'nginx':
+        # nginx serves the internal location itself, including Range requests
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.PROTECTED_MEDIA_PREFIX + quote(name)
+    elif server == 'apache':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = storage.path(name)
+    else:
+        size = storage.size(name)
+        if_range = request.META.get('HTTP_IF_RANGE')
+        byte_range = _parse_range(request.META.get('HTTP_RANGE'), size)
+        if if_range and if_range != etag:
+            byte_range = None
+
+        if byte_range == 'invalid':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(storage.path(name), start, end - start + 1),
+                status=206,
+                content_type=content_type,
+            )
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        else:
+            response = FileResponse(open(storage.path(name), 'rb'), content_type=content_type)
+
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = 'private, max-age=3600'
+    response['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(download_name or os.path.basename(name))}"
+    return response
+
+
+def _not_found():
+    return HttpResponse(status=404)
+
+
+def _serve_proof(request, fieldfile):
+    """Serve a proof, or one of its previews with ?variant=thumb|review"""
+    if not fieldfile:
+        return _not_found()
+    variant = request.query_params.get('variant')
+    if variant:
+        if variant not in VARIANTS:
+            return HttpResponse(status=400)
+        return serve_protected_file(request, fieldfile.storage, preview_name(fieldfile.name, variant))
+    return serve_protected_file(request, fieldfile.storage, fieldfile.name)
+
+
+def _signed_syndic(request, url_name, pk):
+    """
+    (True, syndic id) for a request holding a valid signed link, (False, None)
+    for an authenticated one without a signature
+    """
+    signature = request.query_params.get('signature')
+    if signature:
+        try:
+            return True, check_proof_signature(signature, url_name, pk, request.query_params.get('variant'))
+        except signing.BadSignature:
+            raise PermissionDenied('This link is invalid or has expired')
+    if not request.user.is_authenticated:
+        raise NotAuthenticated()
+    return False, None
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def resident_payment_proof(request, pk):
+    """
+    Download the proof of a resident payment (resident, its syndic or admin,
+    or anyone with a signed link from an API response)
+    GET /api/proofs/resident-payments/{id}/[?variant=thumb|review][&signature=...]
+    """
+    signed, syndic_id = _signed_syndic(request, 'resident-payment-proof', pk)
+    user = request.user
+    if syndic_id:
+        alias = tenant_db(syndic_id)
+    elif not signed and user.is_admin:
+        # Admin requests are routed to 'default'
+        try:
+            alias = shard_of(ResidentPayment, pk)
+        except ValueError:
+            return _not_found()
+    else:
+        alias = None
+    payments = ResidentPayment.objects.using(alias)
+    if not signed and not user.is_admin:
+        payments = payments.filter(Q(resident=user) | Q(syndic=user))
+    payment = get_object_or_404(payments, pk=pk)
+    return _serve_proof(request, payment.payment_proof)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def payment_proof(request, pk):
+    """
+    Download the proof of a syndic subscription payment (the syndic or admin,
+    or anyone with a signed link from an API response)
+    GET /api/proofs/payments/{id}/[?variant=thumb|review][&signature=...]
+    """
+    signed, _ = _signed_syndic(request, 'payment-proof', pk)
+    payments = Payment.objects.all()
+    user = request.user
+    if not signed and not user.is_admin:
+        payments = payments.filter(subscription__syndic_profile__user=user)
+    payment = get_object_or_404(payments, pk=pk)
+    return _serve_proof(request, payment.payment_proof)
@@ -5,9 +5,13 @@ from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q
 from django.utils import timezone
 
-from ..models import Reclamation, ReclamationStatusHistory
+from ..admission import expensive
+from ..conditional import collection_validators, not_modified, set_validators
+from ..models import Appartement, ArchivedReclamation, Immeuble, Reclamation, ReclamationStatusHistory, User
+from ..projections import ReclamationProjection
 from ..serializers import ReclamationSerializer
 from ..permissions import IsSyndic
+from ..replicas import use_replica
 
 
 # ==========================
@@ -87,12 +91,35 @@ class ReclamationViewSet(viewsets.ModelViewSet):
     # ==========================
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+        """?include_archived=true adds archived (long closed) reclamations"""
+        querysets = [self._filter(self.get_queryset(), request.query_params)]
+        if request.query_params.get('include_archived') == 'true':
+            querysets.append(self._filter(ArchivedReclamation.objects.filter(syndic=request.user), request.query_params))
+
+        etag, last_modified = collection_validators(
+            request,
+            *querysets,
+            Appartement.objects.filter(immeuble__syndic=request.user),
+            Immeuble.objects.filter(syndic=request.user),
+            *(User.objects.filter(pk__in=queryset.values('resident')) for queryset in querysets),
+        )
+        cached = not_modified(request, etag, last_modified)
+        if cached:
+            return cached
+
+        projection = ReclamationProjection(self.get_serializer_context())
+        data = projection.rows(projection.union(querysets)) if len(querysets) > 1 else projection.data(querysets[0])
+        return set_validators(Response({
+            'success': True,
+            'count': len(data),
+            'data': data
+        }), etag, last_modified)
 
-        status_filter = request.query_params.get('status')
-        priority = request.query_params.get('priority')
-        building_id = request.query_params.get('building_id')
-        search = request.query_params.get('search')
+    def _filter(self, queryset, params):
+        status_filter = params.get('status')
+        priority = params.get('priority')
+        building_id = params.get('building_id')
+        search = params.get('search')
 
         if status_filter:
             queryset = queryset.filter(status=status_filter)
@@ -109,13 +136,7 @@ class ReclamationViewSet(viewsets.ModelViewSet):
                 Q(content__icontains=search) |
                 Q(resident__email__icontains=search)
             )
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            'success': True,
-            'count': queryset.count(),
-            'data': serializer.data
-        })
+        return queryset
 
     def retrieve(self, request, *args, **kwargs):
         reclamation = self.get_object()
@@ -223,7 +244,9 @@ class ReclamationViewSet(viewsets.ModelViewSet):
     # Statistics
     # ==========================
 
+    @expensive
     @action(detail=False, methods=['get'])
+    @use_replica
     def statistics(self, request):
         queryset = self.get_queryset()
 
@@ -1,14 +1,15 @@
-from decimal import Decimal, InvalidOperation
-
 from django.utils import timezone
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from myapp.models import Charge, ResidentPayment
+from myapp.conditional import collection_validators, not_modified, set_validators
+from myapp.models import Appartement, ArchivedCharge, Charge, Immeuble
 from myapp.permissions import IsResident
+from myapp.projections import ChargeProjection
 from myapp.serializers import ChargeSerializer
+from myapp.services.settlement_service import submit_payment
 
 
 class ResidentChargeViewSet(viewsets.ReadOnlyModelViewSet):
@@ -33,6 +34,32 @@ class ResidentChargeViewSet(viewsets.ReadOnlyModelViewSet):
             return Charge.objects.none()
     
         return Charge.objects.filter(appartement__resident=user)
+
+    def list(self, request, *args, **kwargs):
+        """
+        GET /api/resident/charges/ (answers If-None-Match with 304 when unchanged;
+        ?include_archived=true adds archived charges)
+        """
+        user = request.user
+        querysets = [self.filter_queryset(self.get_queryset())]
+        if request.query_params.get('include_archived') == 'true':
+            querysets.append(self.filter_queryset(ArchivedCharge.objects.filter(appartement__resident=user)))
+
+        etag, last_modified = collection_validators(
+            request,
+            *querysets,
+            Appartement.objects.filter(resident=user),
+            Immeuble.objects.filter(appartements__resident=user),
+            extra=[user.updated_at, timezone.now().date()],  # is_overdue depends on today
+        )
+        cached = not_modified(request, etag, last_modified)
+        if cached:
+            return cached
+
+        projection = ChargeProjection(self.get_serializer_context())
+        values = projection.union(querysets) if len(querysets) > 1 else projection.values(querysets[0])
+        page = self.paginate_queryset(values)
+        return set_validators(self.get_paginated_response(projection.rows(page)), etag, last_modified)
     
     @action(detail=True, methods=['post'])
     def pay(self, request, pk=None):
@@ -56,12 +83,6 @@ class ResidentChargeViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
     
-        if charge.status == "PAID":
-            return Response(
-                {"success": False, "message": "This charge is already paid"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-    
         payment_method = request.data.get("payment_method")
         reference = request.data.get("reference")
     
@@ -72,31 +93,14 @@ class ResidentChargeViewSet(viewsets.ReadOnlyModelViewSet):
             )
     
         # Full remaining amount is paid (resident does not choose)
-        amount = charge.amount - charge.paid_amount
-    
-        if amount <= 0:
+        try:
+            payment = submit_payment(charge.id, user, payment_method, reference)
+        except ValueError as e:
             return Response(
-                {"success": False, "message": "No remaining amount to pay"},
+                {"success": False, "message": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
     
-        payment = ResidentPayment.objects.create(
-            resident=user,
-            syndic=charge.appartement.immeuble.syndic,
-            appartement=charge.appartement,
-            charge=charge,
-            amount=amount,
-            payment_method=payment_method,
-            reference=reference,
-            paid_at=timezone.now(),
-            status="PENDING",
-            notes=""
-        )
-    
-        # Update charge amounts (business consistency)
-        charge.paid_amount += amount
-        charge.save(update_fields="paid_amount")
-    
         return Response(
             {
                 "success": True,
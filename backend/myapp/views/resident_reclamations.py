@@ -6,8 +6,10 @@ from rest_framework import serializers
 from django.db.models import Q
 from django.utils import timezone
 
+from ..conditional import collection_validators, not_modified, set_validators
 from ..models import Reclamation, ReclamationStatusHistory, Appartement, Immeuble
 from ..permissions import IsResident
+from ..replicas import use_replica
 
 
 class ResidentReclamationSerializer(serializers.ModelSerializer):
@@ -116,12 +118,23 @@ class ResidentReclamationViewSet(viewsets.ModelViewSet):
                 Q(content__icontains=search)
             )
 
+        etag, last_modified = collection_validators(
+            request,
+            queryset,
+            Appartement.objects.filter(resident=request.user),
+            Immeuble.objects.filter(appartements__resident=request.user),
+            extra=[request.user.updated_at],
+        )
+        cached = not_modified(request, etag, last_modified)
+        if cached:
+            return cached
+
         serializer = self.get_serializer(queryset, many=True)
-        return Response({
+        return set_validators(Response({
             'success': True,
             'count': queryset.count(),
             'data': serializer.data
-        })
+        }), etag, last_modified)
 
     def retrieve(self, request, *args, **kwargs):
         reclamation = self.get_object()
@@ -149,6 +162,7 @@ class ResidentReclamationViewSet(viewsets.ModelViewSet):
     # ==========================
 
     @action(detail=False, methods=['get'])
+    @use_replica
     def statistics(self, request):
         queryset = self.get_queryset()
 
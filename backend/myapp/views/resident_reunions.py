@@ -4,8 +4,9 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 
+from ..conditional import collection_validators, not_modified, set_validators
 from ..models import Reunion, User, Immeuble, Appartement
-from ..serializers import ReunionSerializer
+from ..serializers import ReunionSerializer, sparse_queryset
 from ..permissions import IsResident
 
 class ResidentReunionViewSet(viewsets.ReadOnlyModelViewSet):
@@ -33,6 +34,25 @@ class ResidentReunionViewSet(viewsets.ReadOnlyModelViewSet):
             immeuble__in=resident_buildings,
             status='SCHEDULED'
         ).select_related('immeuble', 'syndic').order_by('date_time')
+
+    def _conditional_list(self, request, reunions):
+        """Serialize reunions, or answer 304 if the client's copy is current"""
+        etag, last_modified = collection_validators(
+            request,
+            reunions,
+            Immeuble.objects.filter(appartements__resident=request.user),
+        )
+        cached = not_modified(request, etag, last_modified)
+        if cached:
+            return cached
+
+        serializer = self.get_serializer(sparse_queryset(reunions, self.get_serializer()), many=True)
+        
+        return set_validators(Response({
+            'success': True,
+            'data': serializer.data,
+            'count': reunions.count()
+        }), etag, last_modified)
     
     def list(self, request, *args, **kwargs):
         """
@@ -43,15 +63,7 @@ class ResidentReunionViewSet(viewsets.ReadOnlyModelViewSet):
         
         # Filter upcoming meetings only
         today = timezone.now()
-        upcoming_reunions = queryset.filter(date_time__gte=today)
-        
-        serializer = self.get_serializer(upcoming_reunions, many=True)
-        
-        return Response({
-            'success': True,
-            'data': serializer.data,
-            'count': upcoming_reunions.count()
-        })
+        return self._conditional_list(request, queryset.filter(date_time__gte=today))
     
     def retrieve(self, request, *args, **kwargs):
         """
@@ -74,15 +86,7 @@ class ResidentReunionViewSet(viewsets.ReadOnlyModelViewSet):
         """
         queryset = self.get_queryset()
         today = timezone.now()
-        upcoming_reunions = queryset.filter(date_time__gte=today)
-        
-        serializer = self.get_serializer(upcoming_reunions, many=True)
-        
-        return Response({
-            'success': True,
-            'data': serializer.data,
-            'count': upcoming_reunions.count()
-        })
+        return self._conditional_list(request, queryset.filter(date_time__gte=today))
     
     @action(detail=False, methods=['get'])
     def past(self, request):
@@ -92,12 +96,4 @@ class ResidentReunionViewSet(viewsets.ReadOnlyModelViewSet):
         """
         queryset = self.get_queryset()
         today = timezone.now()
-        past_reunions = queryset.filter(date_time__lt=today)
-        
-        serializer = self.get_serializer(past_reunions, many=True)
-        
-        return Response({
-            'success': True,
-            'data': serializer.data,
-            'count': past_reunions.count()
-        })
+        return self._conditional_list(request, queryset.filter(date_time__lt=today))
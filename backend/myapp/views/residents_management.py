@@ -7,6 +7,7 @@ from django.db.models import Q, Sum
 from ..models import User, Immeuble, Appartement, Reclamation, Charge, ResidentProfile
 from ..serializers import UserSerializer, ResidentProfileSerializer, ResidentSerializer, ResidentUpdateSerializer
 from ..permissions import IsSyndic
+from ..services.ledger_service import total_balance
 
 class ResidentViewSet(viewsets.ModelViewSet):
     """
@@ -49,7 +50,10 @@ class ResidentViewSet(viewsets.ModelViewSet):
         # Filter by building
         building_id = request.query_params.get('building_id', None)
         if building_id:
-            queryset = queryset.filter(appartements__immeuble_id=building_id)
+            # Apartments may be on another database than users (sharding)
+            queryset = queryset.filter(pk__in=list(
+                Appartement.objects.filter(immeuble_id=building_id).values_list('resident_id', flat=True)
+            ))
         
         serializer = self.get_serializer(queryset, many=True)
         
@@ -101,14 +105,12 @@ class ResidentViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(resident)
         
         # Get apartments
-        apartments = Appartement.objects.filter(resident=resident, immeuble__syndic=request.user)
-        
-        # Get unpaid charges
-        unpaid_charges = Charge.objects.filter(
-            appartement__resident=resident,
-            appartement__immeuble__syndic=request.user,
-            status__in=['UNPAID', 'OVERDUE', 'PARTIALLY_PAID']
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        apartments = Appartement.objects.filter(
+            resident=resident, immeuble__syndic=request.user
+        ).select_related('immeuble')
+        
+        # Outstanding balance on those apartments, read from the ledger
+        unpaid_charges = total_balance(apartments)
         
         extra_info = {
             'apartments': [{'id': apt.id, 'number': apt.number, 'building': apt.immeuble.name} for apt in apartments],
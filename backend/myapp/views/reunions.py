@@ -5,7 +5,7 @@ from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 
 from ..models import Reunion, User, Immeuble
-from ..serializers import ReunionSerializer
+from ..serializers import ReunionSerializer, sparse_queryset
 from ..permissions import IsSyndic
 
 class ReunionViewSet(viewsets.ModelViewSet):
@@ -59,6 +59,7 @@ class ReunionViewSet(viewsets.ModelViewSet):
         elif filter_time == 'past':
             queryset = queryset.filter(date_time__lt=today)
         
+        queryset = sparse_queryset(queryset, self.get_serializer())
         serializer = self.get_serializer(queryset, many=True)
         
         return Response({
@@ -18,6 +18,7 @@ from ..serializers import (
     UserSerializer
 )
 from ..permissions import IsAdmin
+from ..replicas import use_replica
 
 
 class SubscriptionPlanAdminViewSet(viewsets.ModelViewSet):
@@ -635,6 +636,7 @@ class SubscriptionAdminViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @use_replica
     def dashboard_stats(self, request):
         """
         Get subscription statistics for dashboard
@@ -13,6 +13,8 @@ from ..models import (
 )
 from ..serializers import UserSerializer
 from ..permissions import IsAdmin
+from ..replicas import use_replica
+from ..sharding import fan_out, merge_counts, tenant_db
 
 
 class SyndicAdminViewSet(viewsets.ModelViewSet):
@@ -124,10 +126,11 @@ class SyndicAdminViewSet(viewsets.ModelViewSet):
         syndic = self.get_object()
         serializer = self.get_serializer(syndic)
         
-        # Get additional statistics
-        total_buildings = Immeuble.objects.filter(syndic=syndic).count()
-        total_apartments = Appartement.objects.filter(immeuble__syndic=syndic).count()
-        occupied_apartments = Appartement.objects.filter(
+        # Get additional statistics (from the syndic's shard)
+        db = tenant_db(syndic.pk)
+        total_buildings = Immeuble.objects.using(db).filter(syndic=syndic).count()
+        total_apartments = Appartement.objects.using(db).filter(immeuble__syndic=syndic).count()
+        occupied_apartments = Appartement.objects.using(db).filter(
             immeuble__syndic=syndic,
             resident__isnull=False
         ).count()
@@ -227,7 +230,7 @@ class SyndicAdminViewSet(viewsets.ModelViewSet):
         syndic = self.get_object()
         
         # Check if syndic has active buildings
-        if Immeuble.objects.filter(syndic=syndic).exists():
+        if Immeuble.objects.using(tenant_db(syndic.pk)).filter(syndic=syndic).exists():
             return Response({
                 'success': False,
                 'message': 'Cannot delete syndic with existing buildings. Please remove all buildings first.'
@@ -326,6 +329,7 @@ class SyndicAdminViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=True, methods=['get'])
+    @use_replica
     def statistics(self, request, pk=None):
         """
         Get detailed statistics for a syndic
@@ -333,8 +337,9 @@ class SyndicAdminViewSet(viewsets.ModelViewSet):
         """
         syndic = self.get_object()
         
-        buildings = Immeuble.objects.filter(syndic=syndic)
-        apartments = Appartement.objects.filter(immeuble__syndic=syndic)
+        db = tenant_db(syndic.pk)
+        buildings = Immeuble.objects.using(db).filter(syndic=syndic)
+        apartments = Appartement.objects.using(db).filter(immeuble__syndic=syndic)
         
         stats = {
             'overview': {
@@ -361,6 +366,7 @@ class SyndicAdminViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @use_replica
     def dashboard_stats(self, request):
         """
         Get overall statistics for all syndics
@@ -375,6 +381,17 @@ class SyndicAdminViewSet(viewsets.ModelViewSet):
             'inactive_syndics': total_syndics - active_syndics,
             'active_subscriptions': Subscription.objects.filter(status='ACTIVE').count(),
         }
+
+        # Buildings and apartments are summed over every shard, queried in parallel
+        def tenant_totals(db):
+            return {
+                'total_buildings': Immeuble.objects.using(db).count(),
+                **Appartement.objects.using(db).aggregate(
+                    total_apartments=Count('pk'),
+                    occupied_apartments=Count('resident'),
+                ),
+            }
+        stats.update(merge_counts(fan_out(tenant_totals)))
         
         return Response({
             'success': True,
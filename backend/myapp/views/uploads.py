@@ -0,0 +1,131 @@
+from django.core.exceptions import ValidationError
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from ..models import UploadSession
+from ..services.upload_service import (
+    OffsetMismatch, start_upload, append_chunk, complete_upload, max_chunk_size
+)
+
+
+def _session_data(session):
+    return {
+        'id': str(session.id),
+        'filename': session.filename,
+        'size': session.size,
+        'offset': session.received,
+        'status': session.status,
+        'chunk_size': max_chunk_size(),
+    }
+
+
+class UploadSessionViewSet(viewsets.ViewSet):
+    """
+    Resumable chunked upload of payment proofs:
+    - POST   /api/uploads/                      {filename, size}  -> session id
+    - PUT    /api/uploads/{id}/                 raw chunk, Upload-Offset header
+    - GET    /api/uploads/{id}/                 current offset (resume point)
+    - POST   /api/uploads/{id}/complete/        {target, payment_id, sha256}
+    """
+    permission_classes = [IsAuthenticated]
+
+    def _get_session(self, pk):
+        try:
+            return UploadSession.objects.get(pk=pk, user=self.request.user)
+        except (UploadSession.DoesNotExist, ValidationError):
+            return None
+
+    def _not_found(self):
+        return Response({
+            'success': False,
+            'message': 'Upload session not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    def _offset_conflict(self, error):
+        return Response({
+            'success': False,
+            'message': str(error),
+            'data': {'offset': error.expected}
+        }, status=status.HTTP_409_CONFLICT, headers={'Upload-Offset': str(error.expected)})
+
+    def create(self, request):
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'message': 'filename and a numeric size are required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            session = start_upload(request.user, request.data.get('filename') or 'proof', size)
+        except ValueError as e:
+            return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': 'Upload session created',
+            'data': _session_data(session)
+        }, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        session = self._get_session(pk)
+        if session is None:
+            return self._not_found()
+        return Response({
+            'success': True,
+            'data': _session_data(session)
+        }, headers={'Upload-Offset': str(session.received)})
+
+    def update(self, request, pk=None):
+        if self._get_session(pk) is None:
+            return self._not_found()
+        try:
+            offset = int(request.headers.get('Upload-Offset', request.query_params.get('offset')))
+            length = int(request.headers.get('Content-Length') or 0)
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'message': 'Upload-Offset header and Content-Length are required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            session = append_chunk(pk, request.user, offset, request.stream, length)
+        except OffsetMismatch as e:
+            return self._offset_conflict(e)
+        except ValueError as e:
+            return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': 'Chunk stored',
+            'data': _session_data(session)
+        }, headers={'Upload-Offset': str(session.received)})
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        if self._get_session(pk) is None:
+            return self._not_found()
+        try:
+            session, payment = complete_upload(
+                pk,
+                request.user,
+                target=request.data.get('target'),
+                payment_id=request.data.get('payment_id'),
+                sha256=request.data.get('sha256'),
+            )
+        except OffsetMismatch as e:
+            return self._offset_conflict(e)
+        except ValueError as e:
+            return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = _session_data(session)
+        data['sha256'] = session.sha256
+        data['payment_id'] = payment.id if payment else None
+        return Response({
+            'success': True,
+            'message': 'Upload completed',
+            'data': data
+        })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -70,6 +71,22 @@ SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,
 }
 
+# Loads the syndic subscription with the user at login
+AUTHENTICATION_BACKENDS = [
+    'myapp.backends.EmailBackend',
+]
+
+# Login history is buffered and written by a background thread every
+# LOGIN_HISTORY_FLUSH_INTERVAL seconds (0 = write during the request)
+LOGIN_HISTORY_FLUSH_INTERVAL = float(os.getenv('LOGIN_HISTORY_FLUSH_INTERVAL', '2'))
+LOGIN_HISTORY_BATCH_SIZE = int(os.getenv('LOGIN_HISTORY_BATCH_SIZE', '500'))
+
+# Revoked refresh tokens: seconds between incremental syncs of each worker's
+# Bloom filter (how long another worker's revocation may go unseen) and
+# between full rebuilds (drops expired JTIs)
+TOKEN_REVOCATION_SYNC_INTERVAL = float(os.getenv('TOKEN_REVOCATION_SYNC_INTERVAL', '1'))
+TOKEN_REVOCATION_REBUILD_INTERVAL = float(os.getenv('TOKEN_REVOCATION_REBUILD_INTERVAL', '3600'))
+
 # Use Argon2 for password hashing (more secure than default PBKDF2)
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.Argon2PasswordHasher',
@@ -86,6 +103,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'myapp.sharding.ShardMiddleware',
+    'myapp.admission.AdmissionControlMiddleware',
+    'myapp.replicas.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -99,8 +119,8 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'myapp.throttling.SharedAnonRateThrottle',
+        'myapp.throttling.SharedUserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',  # Anonymous users: 100 requests per hour
@@ -110,8 +130,49 @@ REST_FRAMEWORK = {
     },
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': [
+        'myapp.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'myapp.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Caches: 'shared' holds state every worker must agree on (throttle counters).
+# Without REDIS_URL it falls back to a per-process LocMem cache, which is only
+# correct with a single worker.
+REDIS_URL = os.getenv('REDIS_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'syndic',
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+}
+THROTTLE_CACHE = 'shared'
+
+# Admission control for @expensive views (slots are counted in the 'shared'
+# cache): concurrent requests per syndic and in total, waiters per syndic and
+# process, how long a request may wait for a slot before it is shed with
+# 429/503, and how long an idle slot counter lives (reclaims leaked slots)
+ADMISSION_TENANT_CONCURRENCY = int(os.getenv('ADMISSION_TENANT_CONCURRENCY', '2'))
+ADMISSION_TOTAL_CONCURRENCY = int(os.getenv('ADMISSION_TOTAL_CONCURRENCY', '8'))
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '4'))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '2'))
+ADMISSION_SLOT_TTL = int(os.getenv('ADMISSION_SLOT_TTL', '300'))
+
+# Raw Decimal values in API responses: float (default, same as DRF's encoder) or string
+JSON_DECIMAL_AS_STRING = os.getenv('JSON_DECIMAL_AS_STRING', 'False') == 'True'
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
@@ -119,7 +180,9 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,  # Rotate refresh token on use
     'BLACKLIST_AFTER_ROTATION': True,  # Blacklist old tokens
-    'UPDATE_LAST_LOGIN': True,
+    # last_login is written with the login history, off-request (services.login_service)
+    'UPDATE_LAST_LOGIN': False,
+    'TOKEN_REFRESH_SERIALIZER': 'myapp.serializers.TokenRefreshSerializer',
     
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
@@ -160,6 +223,15 @@ CORS_ALLOWED_ORIGINS = [
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+# Point at a stripe-mock style server (e.g. `manage.py stripe_mock`) for local load tests
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE')
+STRIPE_TIMEOUT = float(os.getenv('STRIPE_TIMEOUT', '10'))
+STRIPE_POOL_SIZE = int(os.getenv('STRIPE_POOL_SIZE', '20'))
+STRIPE_MAX_RETRIES = int(os.getenv('STRIPE_MAX_RETRIES', '3'))
+# Requests/second used by batch operations (Stripe allows 25 in test mode, 100 live)
+STRIPE_RATE_LIMIT = float(os.getenv('STRIPE_RATE_LIMIT', '25'))
+STRIPE_BREAKER_THRESHOLD = int(os.getenv('STRIPE_BREAKER_THRESHOLD', '5'))
+STRIPE_BREAKER_RESET = float(os.getenv('STRIPE_BREAKER_RESET', '30'))
 
 CORS_ALLOW_CREDENTIALS = True
 
@@ -257,9 +329,65 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # SQLite ignores SELECT ... FOR UPDATE; taking the write lock when a
+        # transaction opens gives settlement the same serialization instead
+        # of failing with "database is locked" on lock upgrade.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # File-backed test database so threaded tests get real locking
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+    # Read replica for reporting views (myapp.replicas). Locally it is a
+    # second connection to the same file; in tests it mirrors 'default'.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('DATABASE_REPLICA_NAME', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+    # Second tenant shard (myapp.sharding); create its tables with
+    # `manage.py migrate --database shard_1`
+    'shard_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('DATABASE_SHARD_1_NAME', BASE_DIR / 'shard_1.sqlite3'),
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            'NAME': BASE_DIR / 'test_shard_1.sqlite3',
+        },
+    },
 }
 
+# The shard router runs first: tenant models go to the tenant's shard, the
+# rest (and tenants on 'default') fall through to the replica router
+DATABASE_ROUTERS = ['myapp.sharding.ShardRouter', 'myapp.replicas.ReplicaRouter']
+
+# Aliases holding tenant data, e.g. DATABASE_SHARDS=default,shard_1 (empty =
+# everything on default). Syndics are placed with `manage.py move_syndic`.
+# Requires REDIS_URL: the shard map is cached in the 'shared' cache.
+# Each shard allocates tenant ids in its own block of SHARD_ID_BLOCK ids
+# picked by its position here, so only ever append new shards.
+DATABASE_SHARDS = [alias for alias in os.getenv('DATABASE_SHARDS', '').split(',') if alias]
+
+# Aliases @use_replica views may read from, e.g. DATABASE_REPLICAS=replica
+# (comma-separated; empty = every read on default)
+DATABASE_REPLICAS = [alias for alias in os.getenv('DATABASE_REPLICAS', '').split(',') if alias]
+# Skip a replica more than this many seconds behind (checked every REPLICA_LAG_CHECK_INTERVAL)
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '5'))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', '5'))
+# After a write, the user's reads stay on 'default' this long (read-your-writes)
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -289,6 +417,23 @@ STATICFILES_DIRS = [
 MEDIA_URL = 'payment_proofs/'
 MEDIA_ROOT = BASE_DIR / 'payment_proofs'
 
+# Proofs are only served through the /api/proofs/ endpoints, to the owner or
+# to holders of the signed links API responses carry (valid this many seconds)
+PROOF_LINK_MAX_AGE = int(os.getenv('PROOF_LINK_MAX_AGE', '3600'))
+
+# 'nginx' (X-Accel-Redirect) or 'apache' (X-Sendfile) hands the transfer to
+# the front server; empty serves from Django. For nginx, map the prefix to
+# MEDIA_ROOT in an `internal` location.
+PROTECTED_MEDIA_SERVER = os.getenv('PROTECTED_MEDIA_SERVER', '')
+PROTECTED_MEDIA_PREFIX = os.getenv('PROTECTED_MEDIA_PREFIX', '/protected-proofs/')
+
+# Background threads building proof thumbnails/review copies (see preview_service)
+PROOF_PREVIEW_WORKERS = int(os.getenv('PROOF_PREVIEW_WORKERS', '2'))
+
+# Resumable proof uploads (see upload_service)
+PROOF_UPLOAD_MAX_SIZE = int(os.getenv('PROOF_UPLOAD_MAX_SIZE', str(50 * 1024 * 1024)))
+PROOF_UPLOAD_MAX_CHUNK = int(os.getenv('PROOF_UPLOAD_MAX_CHUNK', str(8 * 1024 * 1024)))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
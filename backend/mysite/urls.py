@@ -43,6 +43,9 @@ urlpatterns = [
 
     # Chatbot URLs
     path('api/', include("chatbot.urls")),
+
+    # Payment gateway webhooks
+    path('api/payments/', include('payments.urls')),
     
     # Swagger URLs
     re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
@@ -50,7 +53,8 @@ urlpatterns = [
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
 
-# Serve static and media files during development
+# Serve static files during development. Payment proofs are never served
+# from here: they go through the /api/proofs/ endpoints (authenticated, or
+# with the signed links API responses carry)
 if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_URL)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_URL)
\ No newline at end of file
@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
 
 class PaymentGateway(ABC):
+    # Optional RateLimiter shared by every call of the batch helpers
+    rate_limiter = None
+
     @abstractmethod
     def process_payment(self, amount: float, currency: str, **kwargs) -> Dict:
         pass
@@ -11,5 +15,38 @@ class PaymentGateway(ABC):
         pass
     
     @abstractmethod
-    def refund_payment(self, payment_id: str, amount: Optional[float] = None) -> Dict:
-        pass
\ No newline at end of file
+    def refund_payment(self, payment_id: str, amount: Optional[float] = None,
+                       idempotency_key: Optional[str] = None) -> Dict:
+        pass
+
+    def _run_batch(self, call, items: List, max_workers: int) -> List[Dict]:
+        """Run call(item) over a bounded thread pool, throttled by rate_limiter; keeps order"""
+        def limited(item):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            return call(item)
+
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+            return list(pool.map(limited, items))
+
+    def get_payment_statuses(self, payment_ids: Iterable[str], max_workers: int = 8) -> Dict[str, Dict]:
+        """get_payment_status for many ids concurrently: {payment_id: result}"""
+        payment_ids = list(dict.fromkeys(payment_ids))
+        return dict(zip(payment_ids, self._run_batch(self.get_payment_status, payment_ids, max_workers)))
+
+    def refund_payments(self, refunds: Iterable[Tuple[str, Optional[float]]],
+                        max_workers: int = 8) -> Dict[str, Dict]:
+        """
+        Refund many (payment_id, amount) pairs concurrently: {payment_id: result}.
+        Idempotency keys are derived from the pair, so re-running a batch that
+        was interrupted never refunds twice.
+        """
+        refunds = list(dict(refunds).items())
+
+        def refund(item):
+            payment_id, amount = item
+            return self.refund_payment(payment_id, amount, idempotency_key=f'refund-{payment_id}-{amount or "full"}')
+
+        return dict(zip((payment_id for payment_id, _ in refunds), self._run_batch(refund, refunds, max_workers)))
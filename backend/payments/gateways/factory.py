@@ -1,13 +1,37 @@
+import threading
+
+from .mock_gateway import MockGateway
 from .stripe_gateway import StripeGateway
 
 class PaymentGatewayFactory:
+    """
+    Gateways are process-level singletons: their HTTP connection pool,
+    retry policy and circuit breaker are shared by every caller.
+    """
     _gateways = {
         'stripe': StripeGateway,
+        'mock': MockGateway,
     }
+    _instances = {}
+    _lock = threading.Lock()
     
     @classmethod
     def get_gateway(cls, gateway_name: str = 'stripe'):
-        gateway = cls._gateways.get(gateway_name.lower())
+        name = gateway_name.lower()
+        instance = cls._instances.get(name)
+        if instance is not None:
+            return instance
+
+        gateway = cls._gateways.get(name)
         if not gateway:
             raise ValueError(f"Payment gateway '{gateway_name}' is not supported")
-        return gateway()
\ No newline at end of file
+        with cls._lock:
+            if name not in cls._instances:
+                cls._instances[name] = gateway()
+            return cls._instances[name]
+
+    @classmethod
+    def reset(cls):
+        """Drop cached gateways (settings changed, tests)"""
+        with cls._lock:
+            cls._instances.clear()
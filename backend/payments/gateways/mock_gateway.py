@@ -0,0 +1,75 @@
+import random
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from .base import PaymentGateway
+from .resilience import RateLimiter
+
+
+class MockGateway(PaymentGateway):
+    """
+    In-process gateway for local throughput tests: every call sleeps
+    `latency` seconds and fails with probability `error_rate`. Intents are
+    kept in memory; `rate_limit` (requests/second) throttles batch calls.
+    """
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.0, rate_limit: Optional[float] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.intents = {}
+        self.refunds = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _simulate(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return random.random() >= self.error_rate
+
+    def add_intent(self, status: str = 'succeeded', amount: int = 10000, currency: str = 'mad') -> str:
+        payment_id = f'pi_{uuid.uuid4().hex[:24]}'
+        self.intents[payment_id] = {'status': status, 'amount': amount, 'currency': currency}
+        return payment_id
+
+    def process_payment(self, amount: float, currency: str = 'mad', **kwargs) -> Dict:
+        if not self._simulate():
+            return {'success': False, 'error': 'Simulated gateway error', 'status': 'failed'}
+        payment_id = self.add_intent('requires_payment_method', int(round(amount * 100)), currency)
+        return {
+            'success': True,
+            'payment_id': payment_id,
+            'client_secret': f'{payment_id}_secret',
+            'status': 'requires_payment_method',
+            'currency': currency.upper()
+        }
+
+    def get_payment_status(self, payment_id: str) -> Dict:
+        if not self._simulate():
+            return {'success': False, 'error': 'Simulated gateway error'}
+        intent = self.intents.get(payment_id)
+        if intent is None:
+            return {'success': False, 'error': f'No such payment_intent: {payment_id}'}
+        return {
+            'success': True,
+            'status': intent['status'],
+            'amount': intent['amount'] / 100,
+            'currency': intent['currency'].upper()
+        }
+
+    def refund_payment(self, payment_id: str, amount: Optional[float] = None,
+                       idempotency_key: Optional[str] = None) -> Dict:
+        if not self._simulate():
+            return {'success': False, 'error': 'Simulated gateway error'}
+        with self._lock:
+            if idempotency_key in self.refunds:
+                return self.refunds[idempotency_key]
+            if payment_id not in self.intents:
+                return {'success': False, 'error': f'No such payment_intent: {payment_id}'}
+            result = {'success': True, 'refund_id': f're_{uuid.uuid4().hex[:24]}', 'status': 'succeeded'}
+            if idempotency_key:
+                self.refunds[idempotency_key] = result
+            return result
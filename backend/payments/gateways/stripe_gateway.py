@@ -1,31 +1,123 @@
-import stripe
+import threading
+import uuid
+from decimal import Decimal
 from typing import Dict, Optional
+
+import requests
+import stripe
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+
 from .base import PaymentGateway
+from .resilience import CircuitBreaker, CircuitOpenError, RateLimiter, RetryPolicy
+
+
+def _is_transient(error: stripe.StripeError) -> bool:
+    """Network failures, rate limits, lock timeouts and 5xx are worth retrying"""
+    should_retry = (error.headers or {}).get('stripe-should-retry')
+    if should_retry is not None:
+        return should_retry == 'true'
+    if isinstance(error, (stripe.APIConnectionError, stripe.RateLimitError)):
+        return True
+    return (error.http_status or 0) >= 500 or error.code == 'lock_timeout'
+
 
 class StripeGateway(PaymentGateway):
+    """
+    Stripe gateway meant to be used as a process-wide singleton (see
+    PaymentGatewayFactory): one StripeClient over one keep-alive requests
+    session, so connections are pooled across calls and threads.
+
+    Every call goes through _call(): transient errors are retried with
+    exponential backoff, reusing the same idempotency key so a retried
+    create can never charge or refund twice, and a circuit breaker makes
+    calls fail fast while Stripe is degraded.
+    """
+
     def __init__(self):
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-
-     self.currency_multipliers = {
-         'mad': 100,  # 1 MAD = 100 centimes
-         'usd': 100,  
-         'eur': 100,  
-     }
-    
+        self.currency_multipliers = {
+            'mad': 100,  # 1 MAD = 100 centimes
+            'usd': 100,
+            'eur': 100,
+        }
+        self.retry = RetryPolicy(
+            max_retries=getattr(settings, 'STRIPE_MAX_RETRIES', 3),
+            base_delay=getattr(settings, 'STRIPE_RETRY_BASE_DELAY', 0.25),
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=getattr(settings, 'STRIPE_BREAKER_THRESHOLD', 5),
+            reset_timeout=getattr(settings, 'STRIPE_BREAKER_RESET', 30.0),
+        )
+        # Client-side cap so batch operations stay under Stripe's rate limit
+        self.rate_limiter = RateLimiter(getattr(settings, 'STRIPE_RATE_LIMIT', 25))
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self) -> stripe.StripeClient:
+        # Built on first use so importing/instantiating needs no API key
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._build_client()
+        return self._client
+
+    def _build_client(self) -> stripe.StripeClient:
+        pool_size = getattr(settings, 'STRIPE_POOL_SIZE', 20)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        api_base = getattr(settings, 'STRIPE_API_BASE', None)
+        return stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            http_client=stripe.RequestsClient(
+                timeout=getattr(settings, 'STRIPE_TIMEOUT', 10),
+                session=session,
+            ),
+            # Retries are handled by _call so they share the breaker
+            max_network_retries=0,
+            base_addresses={'api': api_base} if api_base else None,
+        )
+
+    def _call(self, operation, params=None, idempotency_key=None):
+        self.breaker.before_call()
+        options = {'idempotency_key': idempotency_key} if idempotency_key else None
+        attempt = 0
+        while True:
+            try:
+                result = operation(params, options) if params is not None else operation(options=options)
+            except stripe.StripeError as e:
+                if not _is_transient(e):
+                    # Stripe answered (card declined, bad request...): it is healthy
+                    self.breaker.record_success()
+                    raise
+                if attempt >= self.retry.max_retries:
+                    self.breaker.record_failure()
+                    raise
+                self.retry.wait(attempt)
+                attempt += 1
+            else:
+                self.breaker.record_success()
+                return result
+
     def _get_amount(self, amount: float, currency: str) -> int:
         """Convert amount to the smallest currency unit."""
         multiplier = self.currency_multipliers.get(currency.lower(), 100)
-        return int(amount * multiplier)
-    
-    
+        return int((Decimal(str(amount)) * multiplier).quantize(Decimal('1')))
+
     def process_payment(self, amount: float, currency: str = 'mad', **kwargs) -> Dict:
         try:
-            payment_intent = stripe.PaymentIntent.create(
-                amount=self._get_amount(amount, currency),
-                currency=currency.lower(),
-                payment_method_types=['card'],
-                metadata=kwargs.get('metadata', {})
+            payment_intent = self._call(
+                self.client.v1.payment_intents.create,
+                {
+                    'amount': self._get_amount(amount, currency),
+                    'currency': currency.lower(),
+                    'payment_method_types': ['card'],
+                    'metadata': kwargs.get('metadata', {}),
+                },
+                idempotency_key=kwargs.get('idempotency_key') or str(uuid.uuid4()),
             )
             return {
                 'success': True,
@@ -34,43 +126,51 @@ class StripeGateway(PaymentGateway):
                 'status': payment_intent.status,
                 'currency': currency.upper()
             }
-        except stripe.error.StripeError as e:
+        except (stripe.StripeError, CircuitOpenError) as e:
             return {
                 'success': False,
                 'error': str(e),
                 'status': 'failed'
             }
+
     def get_payment_status(self, payment_id: str) -> Dict:
         try:
-            payment_intent = stripe.PaymentIntent.retrieve(payment_id)
+            payment_intent = self._call(
+                lambda options: self.client.v1.payment_intents.retrieve(payment_id, options=options)
+            )
             return {
                 'success': True,
                 'status': payment_intent.status,
                 'amount': payment_intent.amount / 100,
                 'currency': payment_intent.currency.upper()
             }
-        except stripe.error.StripeError as e:
+        except (stripe.StripeError, CircuitOpenError) as e:
             return {
                 'success': False,
                 'error': str(e)
             }
-    
-    def refund_payment(self, payment_id: str, amount: Optional[float] = None) -> Dict:
+
+    def refund_payment(self, payment_id: str, amount: Optional[float] = None,
+                       idempotency_key: Optional[str] = None) -> Dict:
         try:
             refund_params = {
                 'payment_intent': payment_id,
             }
             if amount:
-                refund_params['amount'] = int(amount * 100)
-                
-            refund = stripe.Refund.create(**refund_params)
+                refund_params['amount'] = self._get_amount(amount, 'mad')
+
+            refund = self._call(
+                self.client.v1.refunds.create,
+                refund_params,
+                idempotency_key=idempotency_key or str(uuid.uuid4()),
+            )
             return {
                 'success': True,
                 'refund_id': refund.id,
                 'status': refund.status
             }
-        except stripe.error.StripeError as e:
+        except (stripe.StripeError, CircuitOpenError) as e:
             return {
                 'success': False,
                 'error': str(e)
-            }
\ No newline at end of file
+            }
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.gateways.mock_gateway import MockGateway
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare serial vs batched status polling against the in-process mock "
+        "gateway (simulated latency, errors and rate limit)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--latency', type=float, default=0.05)
+        parser.add_argument('--error-rate', type=float, default=0.02)
+        parser.add_argument('--rate-limit', type=float, default=100, help='Requests per second (0 for none)')
+
+    def handle(self, *args, **options):
+        gateway = MockGateway(
+            latency=options['latency'],
+            error_rate=options['error_rate'],
+            rate_limit=options['rate_limit'] or None,
+        )
+        ids = [gateway.add_intent() for _ in range(options['payments'])]
+
+        start = time.perf_counter()
+        serial = [gateway.get_payment_status(pk) for pk in ids]
+        self._report('serial', len(ids), time.perf_counter() - start, serial)
+
+        start = time.perf_counter()
+        batch = gateway.get_payment_statuses(ids, max_workers=options['workers']).values()
+        self._report(f"batch ({options['workers']} workers)", len(ids), time.perf_counter() - start, batch)
+
+    def _report(self, label, count, elapsed, results):
+        errors = sum(1 for r in results if not r['success'])
+        self.stdout.write(f"{label:<22} {elapsed:7.2f}s  {count / elapsed:8.1f} req/s  errors {errors}")
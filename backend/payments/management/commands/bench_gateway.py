@@ -0,0 +1,60 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from payments.gateways.factory import PaymentGatewayFactory
+from payments.gateways.stripe_gateway import StripeGateway
+from payments.mock_stripe import start_mock_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure gateway latency/throughput against the local Stripe mock, "
+        "comparing the shared singleton with a fresh client per call"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--latency', type=float, default=0.005, help='Mock server latency in seconds')
+        parser.add_argument('--api-base', help='Use an already running mock instead of an in-process one')
+
+    def handle(self, *args, **options):
+        server = None
+        api_base = options['api_base']
+        if not api_base:
+            server, api_base = start_mock_server(latency=options['latency'])
+
+        try:
+            with override_settings(STRIPE_API_BASE=api_base, STRIPE_SECRET_KEY='sk_test_bench'):
+                PaymentGatewayFactory.reset()
+                shared = lambda: PaymentGatewayFactory.get_gateway('stripe')
+                self._run('fresh client per call', StripeGateway, options)
+                self._run('shared singleton', shared, options)
+                PaymentGatewayFactory.reset()
+        finally:
+            if server:
+                server.shutdown()
+
+    def _run(self, label, get_gateway, options):
+        def one(i):
+            start = time.perf_counter()
+            result = get_gateway().process_payment(100, 'mad', metadata={'bench': str(i)})
+            return time.perf_counter() - start, result['success']
+
+        get_gateway().process_payment(1, 'mad')  # warm up
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            samples = list(pool.map(one, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(s[0] * 1000 for s in samples)
+        failures = sum(1 for s in samples if not s[1])
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f"{label:<24} {len(samples) / elapsed:8.1f} req/s  "
+            f"p50 {statistics.median(latencies):6.2f} ms  p95 {p95:6.2f} ms  failures {failures}"
+        )
@@ -0,0 +1,27 @@
+import threading
+
+from django.core.management.base import BaseCommand
+
+from payments.mock_stripe import start_mock_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stripe-mock style server. Start the app with "
+        "STRIPE_API_BASE=http://127.0.0.1:<port> to send gateway calls to it"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests answered with a 500')
+
+    def handle(self, *args, **options):
+        server, base_url = start_mock_server(
+            port=options['port'], latency=options['latency'], failure_rate=options['failure_rate']
+        )
+        self.stdout.write(self.style.SUCCESS(f"Mock Stripe listening on {base_url} (Ctrl+C to stop)"))
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
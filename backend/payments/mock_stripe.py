@@ -0,0 +1,142 @@
+"""
+Minimal stripe-mock style server for local latency/throughput tests.
+
+Implements just the endpoints StripeGateway uses (create/retrieve
+PaymentIntent, create Refund) with keep-alive HTTP/1.1, idempotency key
+replay, configurable latency and injected 5xx failures.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+def _form_to_dict(body):
+    """Decode Stripe's form encoding: metadata[key]=v, payment_method_types[0]=card"""
+    data = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        match = re.match(r'^(\w+)\[(\w*)\]$', key)
+        if not match:
+            data[key] = value
+        elif match.group(2).isdigit() or match.group(2) == '':
+            data.setdefault(match.group(1), []).append(value)
+        else:
+            data.setdefault(match.group(1), {})[match.group(2)] = value
+    return data
+
+
+class MockStripeState:
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fail_next = 0
+        self.lock = threading.Lock()
+        self.payment_intents = {}
+        self.idempotent_responses = {}
+        self.requests = []
+
+    def should_fail(self):
+        with self.lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+        return self.failure_rate and random.random() < self.failure_rate
+
+
+class MockStripeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without this, Nagle plus
+    # delayed ACKs add ~40ms to every response on a kept-alive connection
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, error_type, message):
+        self._send(status, {'error': {'type': error_type, 'message': message}})
+
+    def _handle(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length else ''
+        key = self.headers.get('Idempotency-Key')
+        self.state.requests.append((method, self.path, key))
+
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        if self.state.should_fail():
+            return self._error(500, 'api_error', 'Injected failure')
+        if key and key in self.state.idempotent_responses:
+            return self._send(*self.state.idempotent_responses[key])
+
+        status, payload = self._route(method, self.path.split('?')[0], _form_to_dict(body))
+        if key and method == 'POST':
+            self.state.idempotent_responses[key] = (status, payload)
+        self._send(status, payload)
+
+    def _route(self, method, path, data):
+        if method == 'POST' and path == '/v1/payment_intents':
+            pk = f'pi_{uuid.uuid4().hex[:24]}'
+            intent = {
+                'id': pk,
+                'object': 'payment_intent',
+                'amount': int(data.get('amount', 0)),
+                'currency': data.get('currency', 'mad'),
+                'status': 'requires_payment_method',
+                'client_secret': f'{pk}_secret_{uuid.uuid4().hex[:16]}',
+                'metadata': data.get('metadata', {}),
+            }
+            with self.state.lock:
+                self.state.payment_intents[pk] = intent
+            return 200, intent
+
+        match = re.match(r'^/v1/payment_intents/(\w+)$', path)
+        if method == 'GET' and match:
+            intent = self.state.payment_intents.get(match.group(1))
+            if intent is None:
+                return 404, {'error': {'type': 'invalid_request_error', 'message': 'No such payment_intent'}}
+            return 200, intent
+
+        if method == 'POST' and path == '/v1/refunds':
+            intent = self.state.payment_intents.get(data.get('payment_intent'))
+            if intent is None:
+                return 404, {'error': {'type': 'invalid_request_error', 'message': 'No such payment_intent'}}
+            return 200, {
+                'id': f're_{uuid.uuid4().hex[:24]}',
+                'object': 'refund',
+                'amount': int(data.get('amount', intent['amount'])),
+                'payment_intent': intent['id'],
+                'status': 'succeeded',
+            }
+
+        return 404, {'error': {'type': 'invalid_request_error', 'message': f'Unrecognized request URL ({path})'}}
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+def start_mock_server(host='127.0.0.1', port=0, latency=0.0, failure_rate=0.0):
+    """Start the server on a daemon thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), MockStripeHandler)
+    server.daemon_threads = True
+    server.state = MockStripeState(latency=latency, failure_rate=failure_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
@@ -1,3 +1,38 @@
 from django.db import models
 
-# Create your models here.
+
+class WebhookEvent(models.Model):
+    """
+    Raw Stripe webhook event, stored as received and applied later by the
+    `process_webhooks` worker. The unique event_id makes redeliveries no-ops.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PROCESSED', 'Processed'),
+        ('IGNORED', 'Ignored'),
+        ('FAILED', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    # Id of the Stripe object the event is about (payment intent id)
+    object_id = models.CharField(max_length=255, blank=True, db_index=True)
+    # Stripe's `created` timestamp, used to order events delivered out of order
+    created = models.BigIntegerField()
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Webhook Event'
+        verbose_name_plural = 'Webhook Events'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='webhook_status_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.status})"
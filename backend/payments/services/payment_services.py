@@ -1,14 +1,121 @@
+from django.utils import timezone
+
+from myapp.models import Payment, ResidentPayment
+from myapp.services.settlement_service import confirm_payments, reject_payments, reverse_payment
+from myapp.sharding import shards, using_shard
+
 from ..gateways.factory import PaymentGatewayFactory
 
+# Gateway intent status -> Payment status; anything else stays as it is
+PAYMENT_STATUS_MAP = {
+    'succeeded': 'COMPLETED',
+    'canceled': 'FAILED',
+}
+
+BULK_UPDATE_BATCH = 500
+
+# Only these can still move on the gateway's say; a refunded or completed
+# payment keeps its status whatever its (succeeded/canceled) intent reads
+REFRESHABLE_STATUSES = {
+    Payment: ('PENDING', 'FAILED'),
+    ResidentPayment: ('PENDING',),
+}
+
+
 class PaymentService:
-    def __init__(self):
-        self.gateway = PaymentGatewayFactory.get_gateway('stripe')
-    
+    def __init__(self, gateway=None):
+        self.gateway = gateway or PaymentGatewayFactory.get_gateway('stripe')
+
     def create_payment_intent(self, amount, currency='mad', **metadata):
         return self.gateway.process_payment(amount, currency, metadata=metadata)
-    
+
     def get_payment_status(self, payment_id):
         return self.gateway.get_payment_status(payment_id)
-    
+
     def create_refund(self, payment_id, amount=None):
-        return self.gateway.refund_payment(payment_id, amount)
\ No newline at end of file
+        return self.gateway.refund_payment(payment_id, amount)
+
+    def refresh_payment_statuses(self, payments, max_workers=8):
+        """
+        Poll the gateway for every unsettled payment of the queryset (Payment
+        or ResidentPayment) whose reference is a gateway intent id, concurrently,
+        and write the new statuses back in bulk. Resident payments are read
+        on every shard and confirmed/rejected through the settlement service
+        on their own.
+        """
+        # Resident payments live on their syndic's shard: read every shard
+        if payments.model is ResidentPayment:
+            aliases = shards()
+            querysets = [(alias, payments.using(alias)) for alias in aliases]
+        else:
+            querysets = [(None, payments)]
+        located = {
+            payment: alias
+            for alias, queryset in querysets
+            for payment in queryset.filter(
+                status__in=REFRESHABLE_STATUSES[payments.model]
+            ).exclude(reference__isnull=True).exclude(reference='')
+        }
+        rows = list(located)
+        results = self.gateway.get_payment_statuses([p.reference for p in rows], max_workers=max_workers)
+
+        summary = {'checked': len(rows), 'updated': 0, 'errors': {}}
+        changed = []
+        for payment in rows:
+            result = results[payment.reference]
+            if not result['success']:
+                summary['errors'][payment.id] = result['error']
+                continue
+            new_status = PAYMENT_STATUS_MAP.get(result['status'])
+            if new_status and new_status != payment.status:
+                changed.append((payment, new_status))
+
+        if payments.model is ResidentPayment:
+            for alias in aliases:
+                with using_shard(alias):
+                    scope = ResidentPayment.objects.all()
+                    confirmed = [p.id for p, s in changed if s == 'COMPLETED' and located[p] == alias]
+                    rejected = [p.id for p, s in changed if s == 'FAILED' and located[p] == alias]
+                    results = confirm_payments(scope, confirmed) + reject_payments(scope, rejected)
+                    summary['updated'] += sum(1 for r in results if r['success'])
+        else:
+            for payment, new_status in changed:
+                payment.status = new_status
+            Payment.objects.bulk_update([p for p, s in changed], ['status'], batch_size=BULK_UPDATE_BATCH)
+            summary['updated'] = len(changed)
+        return summary
+
+    def refund_payments(self, payments, max_workers=8):
+        """
+        Fully refund every settled payment of the queryset concurrently.
+        Payments become REFUNDED in one bulk_update; confirmed resident
+        payments are reversed so their charge and ledger follow.
+        """
+        is_resident = payments.model is ResidentPayment
+        settled = 'CONFIRMED' if is_resident else 'COMPLETED'
+        rows = list(payments.filter(status=settled).exclude(reference__isnull=True).exclude(reference=''))
+        results = self.gateway.refund_payments(((p.reference, None) for p in rows), max_workers=max_workers)
+
+        summary = {'requested': len(rows), 'refunded': 0, 'errors': {}}
+        refunded = []
+        note = f"\nRefunded on {timezone.now().date()}"
+        for payment in rows:
+            result = results[payment.reference]
+            if not result['success']:
+                summary['errors'][payment.id] = result['error']
+                continue
+            if is_resident:
+                try:
+                    reverse_payment(payment)
+                except ValueError as e:
+                    summary['errors'][payment.id] = str(e)
+                    continue
+            else:
+                payment.status = 'REFUNDED'
+                payment.notes = f"{payment.notes}{note} ({result['refund_id']})"
+            refunded.append(payment)
+
+        if not is_resident:
+            Payment.objects.bulk_update(refunded, ['status', 'notes'], batch_size=BULK_UPDATE_BATCH)
+        summary['refunded'] = len(refunded)
+        return summary
@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from myapp.models import Payment, ResidentPayment
+from myapp.services.settlement_service import confirm_payments
+from myapp.sharding import shards, using_shard
+
+from ..models import WebhookEvent
+
+
+# ==========================
+# Stripe webhook processing
+# ==========================
+#
+# Events are stored by the webhook endpoint and applied here in batches.
+# Stripe does not guarantee delivery order, so each batch is reduced to one
+# outcome per payment intent, success outranking failure, and every write is
+# a conditional UPDATE: a stale `payment_failed` can never undo a payment.
+# Resident payments live on their syndic's shard, so their outcomes are
+# applied on every shard in turn (each in its own transaction; a batch
+# retried after a partial failure finds those payments settled already).
+
+OUTCOMES = {
+    'payment_intent.succeeded': 'succeeded',
+    'payment_intent.payment_failed': 'failed',
+}
+
+FAILED_NOTE = '\nCard payment failed at Stripe'
+
+
+def _metadata_id(event, key):
+    value = (event.payload['data']['object'].get('metadata') or {}).get(key)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def reduce_outcomes(events):
+    """{intent_id: (outcome, event)} keeping success, then the newest event"""
+    outcomes = {}
+    for event in events:
+        outcome = OUTCOMES[event.event_type]
+        rank = (outcome == 'succeeded', event.created, event.pk)
+        current = outcomes.get(event.object_id)
+        if current is None or rank > current[0]:
+            outcomes[event.object_id] = (rank, outcome, event)
+    return {intent: (outcome, event) for intent, (rank, outcome, event) in outcomes.items()}
+
+
+def _targets(items, model_key):
+    """Q matching payments of the given intents by metadata id or reference"""
+    ids = {_metadata_id(event, model_key) for intent, event in items} - {None}
+    return Q(pk__in=ids) | Q(reference__in=[intent for intent, event in items])
+
+
+def _apply_resident_outcomes(succeeded, failed):
+    for alias in shards():
+        with using_shard(alias):
+            if succeeded:
+                resident_ids = list(ResidentPayment.objects.filter(
+                    _targets(succeeded, 'resident_payment_id'), status='PENDING'
+                ).values_list('id', flat=True))
+                if resident_ids:
+                    confirm_payments(ResidentPayment.objects.all(), resident_ids)
+            if failed:
+                # A failed intent can still be retried by the resident, so the
+                # payment stays PENDING for the syndic to decide
+                ResidentPayment.objects.filter(
+                    _targets(failed, 'resident_payment_id'), status='PENDING'
+                ).exclude(notes__endswith=FAILED_NOTE).update(notes=Concat(F('notes'), Value(FAILED_NOTE)))
+
+
+def apply_outcomes(outcomes):
+    succeeded = [(intent, event) for intent, (outcome, event) in outcomes.items() if outcome == 'succeeded']
+    failed = [(intent, event) for intent, (outcome, event) in outcomes.items() if outcome == 'failed']
+
+    _apply_resident_outcomes(succeeded, failed)
+    if succeeded:
+        Payment.objects.filter(
+            _targets(succeeded, 'payment_id'), status__in=['PENDING', 'FAILED']
+        ).update(status='COMPLETED')
+    if failed:
+        Payment.objects.filter(
+            _targets(failed, 'payment_id'), status='PENDING'
+        ).update(status='FAILED')
+
+
+def _process(events):
+    handled = [e for e in events if e.event_type in OUTCOMES]
+    ignored = [e.pk for e in events if e.event_type not in OUTCOMES]
+    now = timezone.now()
+
+    with transaction.atomic():
+        apply_outcomes(reduce_outcomes(handled))
+        WebhookEvent.objects.filter(pk__in=[e.pk for e in handled]).update(
+            status='PROCESSED', processed_at=now, attempts=F('attempts') + 1, error=''
+        )
+        WebhookEvent.objects.filter(pk__in=ignored).update(status='IGNORED', processed_at=now)
+
+
+def process_pending(batch_size=500):
+    """
+    Apply the oldest PENDING events in one transaction. If the batch fails,
+    events are retried one by one so a single bad event is marked FAILED
+    without blocking the rest. Returns the number of events handled.
+    """
+    events = list(WebhookEvent.objects.filter(status='PENDING').order_by('id')[:batch_size])
+    if not events:
+        return 0
+
+    try:
+        _process(events)
+    except Exception:
+        for event in events:
+            try:
+                _process([event])
+            except Exception as e:
+                WebhookEvent.objects.filter(pk=event.pk).update(
+                    status='FAILED', attempts=F('attempts') + 1, error=str(e)[:2000]
+                )
+    return len(events)
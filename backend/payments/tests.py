@@ -1,3 +1,317 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import time
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from myapp.models import Charge, Payment, ResidentPayment, Subscription
+from myapp.services.settlement_service import confirm_payment
+from myapp.services.shard_service import move_syndic
+from myapp.tests import make_charge, make_payment, subscribe
+
+from .gateways.factory import PaymentGatewayFactory
+from .gateways.mock_gateway import MockGateway
+from .gateways.resilience import CircuitBreaker, RateLimiter
+from .mock_stripe import start_mock_server
+from .models import WebhookEvent
+from .services.payment_services import PaymentService
+from .services.webhook_processor import process_pending
+
+
+class StripeGatewayTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server, cls.api_base = start_mock_server()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.settings_override = override_settings(
+            STRIPE_API_BASE=self.api_base,
+            STRIPE_SECRET_KEY='sk_test_mock',
+            STRIPE_MAX_RETRIES=2,
+            STRIPE_BREAKER_THRESHOLD=2,
+        )
+        self.settings_override.enable()
+        PaymentGatewayFactory.reset()
+        self.gateway = PaymentGatewayFactory.get_gateway('stripe')
+        self.gateway.retry._sleep = lambda seconds: None
+        self.server.state.requests.clear()
+        self.server.state.fail_next = 0
+
+    def tearDown(self):
+        PaymentGatewayFactory.reset()
+        self.settings_override.disable()
+
+    def test_gateway_is_a_singleton(self):
+        self.assertIs(PaymentGatewayFactory.get_gateway('STRIPE'), self.gateway)
+
+    def test_payment_roundtrip(self):
+        created = self.gateway.process_payment(150.10, 'mad', metadata={'charge': '7'})
+        self.assertTrue(created['success'])
+
+        status = self.gateway.get_payment_status(created['payment_id'])
+        self.assertEqual(status['amount'], 150.10)
+        self.assertTrue(self.gateway.refund_payment(created['payment_id'])['success'])
+
+    def test_transient_errors_are_retried_with_same_idempotency_key(self):
+        self.server.state.fail_next = 2
+        intents_before = len(self.server.state.payment_intents)
+
+        result = self.gateway.process_payment(100, 'mad')
+
+        self.assertTrue(result['success'])
+        keys = [key for method, path, key in self.server.state.requests]
+        self.assertEqual(len(keys), 3)
+        self.assertEqual(len(set(keys)), 1)
+        self.assertEqual(len(self.server.state.payment_intents), intents_before + 1)
+
+    def test_client_errors_are_not_retried(self):
+        result = self.gateway.get_payment_status('pi_missing')
+
+        self.assertFalse(result['success'])
+        self.assertEqual(len(self.server.state.requests), 1)
+        self.assertEqual(self.gateway.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_breaker_opens_and_fails_fast(self):
+        self.server.state.fail_next = 6
+        for _ in range(2):
+            self.assertFalse(self.gateway.process_payment(100, 'mad')['success'])
+        self.assertEqual(self.gateway.breaker.state, CircuitBreaker.OPEN)
+
+        sent = len(self.server.state.requests)
+        result = self.gateway.process_payment(100, 'mad')
+        self.assertFalse(result['success'])
+        self.assertIn('temporarily unavailable', result['error'])
+        self.assertEqual(len(self.server.state.requests), sent)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def test_half_open_allows_one_trial(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        now[0] = 10
+        breaker.before_call()
+        with self.assertRaises(Exception):
+            breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+def signed_event(event_id, event_type, intent_id, created, metadata=None, secret='whsec_test', timestamp=None):
+    payload = json.dumps({
+        'id': event_id,
+        'type': event_type,
+        'created': created,
+        'data': {'object': {'id': intent_id, 'object': 'payment_intent', 'metadata': metadata or {}}},
+    })
+    timestamp = timestamp or int(time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return payload, f't={timestamp},v1={signature}'
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+class StripeWebhookTests(TestCase):
+    url = '/api/payments/webhooks/stripe/'
+
+    def setUp(self):
+        self.charge, self.resident = make_charge()
+        self.payment = make_payment(self.charge, self.resident, '1000.00')
+        ResidentPayment.objects.filter(pk=self.payment.pk).update(reference='pi_1')
+
+    def deliver(self, *args, **kwargs):
+        payload, signature = signed_event(*args, **kwargs)
+        return self.client.post(
+            self.url, payload, content_type='application/json', HTTP_STRIPE_SIGNATURE=signature
+        )
+
+    def test_bad_signature_is_rejected(self):
+        payload, signature = signed_event('evt_1', 'payment_intent.succeeded', 'pi_1', 1, secret='other')
+        response = self.client.post(
+            self.url, payload, content_type='application/json', HTTP_STRIPE_SIGNATURE=signature
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_stale_signature_is_rejected(self):
+        payload, signature = signed_event(
+            'evt_1', 'payment_intent.succeeded', 'pi_1', 1, timestamp=int(time.time()) - 3600
+        )
+        response = self.client.post(
+            self.url, payload, content_type='application/json', HTTP_STRIPE_SIGNATURE=signature
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_redeliveries_are_stored_once_and_processing_is_deferred(self):
+        for _ in range(3):
+            self.assertEqual(self.deliver('evt_1', 'payment_intent.succeeded', 'pi_1', 100).status_code, 200)
+
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'PENDING')
+
+        self.assertEqual(process_pending(), 1)
+        self.payment.refresh_from_db()
+        self.charge.refresh_from_db()
+        self.assertEqual(self.payment.status, 'CONFIRMED')
+        self.assertEqual(self.charge.status, 'PAID')
+        self.assertEqual(WebhookEvent.objects.get().status, 'PROCESSED')
+
+    def test_late_failure_does_not_undo_success(self):
+        self.deliver('evt_2', 'payment_intent.succeeded', 'pi_1', 200)
+        self.deliver('evt_1', 'payment_intent.payment_failed', 'pi_1', 100)
+        process_pending(batch_size=1)
+        process_pending(batch_size=1)
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'CONFIRMED')
+        self.assertNotIn('failed', self.payment.notes)
+
+    def test_metadata_id_and_unhandled_types(self):
+        ResidentPayment.objects.filter(pk=self.payment.pk).update(reference='')
+        self.deliver('evt_1', 'payment_intent.succeeded', 'pi_x', 100,
+                     metadata={'resident_payment_id': str(self.payment.pk)})
+        self.deliver('evt_2', 'charge.refunded', 'ch_1', 100)
+
+        process_pending()
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'CONFIRMED')
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt_2').status, 'IGNORED')
+
+
+class BatchOperationTests(TestCase):
+
+    def setUp(self):
+        self.gateway = MockGateway(latency=0)
+        self.service = PaymentService(self.gateway)
+        self.charge, self.resident = make_charge()
+
+    def resident_payment(self, amount, intent_status, status='PENDING'):
+        payment = make_payment(self.charge, self.resident, amount, status=status)
+        payment.reference = self.gateway.add_intent(intent_status)
+        payment.save(update_fields=['reference'])
+        return payment
+
+    def test_batch_status_keeps_ids_and_dedupes(self):
+        ids = [self.gateway.add_intent() for _ in range(5)]
+
+        results = self.gateway.get_payment_statuses(ids + ids[:2], max_workers=3)
+
+        self.assertEqual(list(results), ids)
+        self.assertEqual(self.gateway.calls, 5)
+
+    def test_rate_limiter_spaces_batch_calls(self):
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        self.gateway.rate_limiter = RateLimiter(10, burst=1, clock=lambda: now[0], sleep=sleep)
+        self.gateway.get_payment_statuses([self.gateway.add_intent() for _ in range(4)], max_workers=1)
+
+        self.assertAlmostEqual(now[0], 0.3)
+
+    def test_refresh_settles_resident_payments(self):
+        paid = self.resident_payment('600.00', 'succeeded')
+        canceled = self.resident_payment('100.00', 'canceled')
+        waiting = self.resident_payment('100.00', 'processing')
+
+        summary = self.service.refresh_payment_statuses(ResidentPayment.objects.all())
+
+        self.assertEqual(summary, {'checked': 3, 'updated': 2, 'errors': {}})
+        statuses = dict(ResidentPayment.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[paid.id], 'CONFIRMED')
+        self.assertEqual(statuses[canceled.id], 'REJECTED')
+        self.assertEqual(statuses[waiting.id], 'PENDING')
+        self.charge.refresh_from_db()
+        self.assertEqual(self.charge.paid_amount, Decimal('600.00'))
+
+    def test_refresh_leaves_settled_subscription_payments_alone(self):
+        subscription = Subscription.objects.get(syndic_profile__user=subscribe(self.charge.appartement.immeuble.syndic))
+
+        def subscription_payment(intent_status, status):
+            return Payment.objects.create(
+                subscription=subscription, amount=Decimal('100.00'), status=status,
+                reference=self.gateway.add_intent(intent_status)
+            )
+
+        paid = subscription_payment('succeeded', 'PENDING')
+        retried = subscription_payment('succeeded', 'FAILED')
+        refunded = subscription_payment('succeeded', 'REFUNDED')
+        completed = subscription_payment('canceled', 'COMPLETED')
+
+        summary = self.service.refresh_payment_statuses(Payment.objects.all())
+
+        self.assertEqual(summary, {'checked': 2, 'updated': 2, 'errors': {}})
+        statuses = dict(Payment.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[paid.id], 'COMPLETED')
+        self.assertEqual(statuses[retried.id], 'COMPLETED')
+        self.assertEqual(statuses[refunded.id], 'REFUNDED')
+        self.assertEqual(statuses[completed.id], 'COMPLETED')
+
+    def test_refund_reverses_and_reruns_are_idempotent(self):
+        payment = self.resident_payment('400.00', 'succeeded')
+        confirm_payment(payment)
+
+        summary = self.service.refund_payments(ResidentPayment.objects.all())
+        self.assertEqual(summary['refunded'], 1)
+        payment.refresh_from_db()
+        self.charge.refresh_from_db()
+        self.assertEqual(payment.status, 'REJECTED')
+        self.assertEqual(self.charge.paid_amount, Decimal('0'))
+
+        self.gateway.refund_payments([(payment.reference, None)])
+        self.assertEqual(len(self.gateway.refunds), 1)
+
+
+@override_settings(DATABASE_SHARDS=['default', 'shard_1'])
+class ShardedPaymentTests(TransactionTestCase):
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.gateway = MockGateway(latency=0)
+        self.charge, self.resident = make_charge()
+        syndic = self.charge.appartement.immeuble.syndic
+        self.resident.created_by_syndic = syndic
+        self.resident.save()
+        self.payment = make_payment(self.charge, self.resident, '1000.00')
+        self.reference = self.gateway.add_intent('succeeded')
+        ResidentPayment.objects.filter(pk=self.payment.pk).update(reference=self.reference)
+        move_syndic(syndic.pk, 'shard_1', grace=0, source_delay=0)
+
+    def assert_settled_on_shard(self):
+        self.assertEqual(ResidentPayment.objects.using('shard_1').get(pk=self.payment.pk).status, 'CONFIRMED')
+        self.assertEqual(Charge.objects.using('shard_1').get(pk=self.charge.pk).status, 'PAID')
+
+    def test_webhook_settles_payment_of_moved_syndic(self):
+        payload, _ = signed_event('evt_1', 'payment_intent.succeeded', self.reference, 100)
+        WebhookEvent.objects.create(
+            event_id='evt_1', event_type='payment_intent.succeeded', object_id=self.reference,
+            created=100, payload=json.loads(payload)
+        )
+
+        process_pending()
+
+        self.assertEqual(WebhookEvent.objects.get().status, 'PROCESSED')
+        self.assert_settled_on_shard()
+
+    def test_refresh_reads_every_shard(self):
+        summary = PaymentService(self.gateway).refresh_payment_statuses(ResidentPayment.objects.all())
+
+        self.assertEqual(summary, {'checked': 1, 'updated': 1, 'errors': {}})
+        self.assert_settled_on_shard()
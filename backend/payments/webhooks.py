@@ -1,31 +1,44 @@
+import json
+
+import stripe
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .models import WebhookEvent
+
+
 @csrf_exempt
 @require_POST
 def stripe_webhook(request):
+    """
+    Fast-ack ingestion: verify the signature, store the event and return 200.
+    Redelivered events hit the unique event_id and are ignored by the same
+    INSERT; the `process_webhooks` worker applies stored events later.
+    """
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
+        stripe.WebhookSignature.verify_header(
+            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET,
+            # Same replay window construct_event enforces
+            tolerance=stripe.Webhook.DEFAULT_TOLERANCE
         )
-    except ValueError as e:
+        event = json.loads(payload)
+        data_object = event['data']['object']
+        stored = WebhookEvent(
+            event_id=event['id'],
+            event_type=event['type'],
+            object_id=data_object.get('id') or '',
+            created=event.get('created') or 0,
+            payload=event,
+        )
+    except stripe.SignatureVerificationError:
         return HttpResponse(status=400)
-    except stripe.error.SignatureVerificationError as e:
+    except (ValueError, KeyError, TypeError, AttributeError):
         return HttpResponse(status=400)
-    
-    # Handle the event
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
-        amount = payment_intent['amount'] / 100  # Convert from centimes to MAD
-        currency = payment_intent['currency'].upper()
-        # Handle successful payment
-        # TODO: Update your database with the payment details
-        print(f"Payment of {amount} {currency} succeeded")
-        
-    elif event['type'] == 'payment_intent.payment_failed':
-        payment_intent = event['data']['object']
-        # Handle failed payment
-        error = payment_intent.get('last_payment_error', {})
-        print(f"Payment failed: {error.get('message')}")
-    
-    return HttpResponse(status=200)
\ No newline at end of file
+
+    WebhookEvent.objects.bulk_create([stored], ignore_conflicts=True)
+    return HttpResponse(status=200)